@@ -0,0 +1,37 @@
+"""
+Benchmarks for read_gdpr.py and export_to_csv.py
+"""
+import pytest
+from pydantic import parse_obj_as
+from ucmaxl import AXLHelper
+
+from export_to_csv import export_table
+from read_gdpr import LearnedPattern, normalize, unique_patterns, write_csv
+
+
+@pytest.fixture(scope='module')
+def learned(cluster) -> list[LearnedPattern]:
+    patterns = parse_obj_as(list[LearnedPattern], cluster.tables['remoteroutingpattern'])
+    for pattern in patterns:
+        pattern.route_string = 'route.string'
+    # duplicate everything to exercise the duplicate detection
+    return patterns * 2
+
+
+@pytest.mark.benchmark(group='gdpr')
+def bench_normalize_unique(benchmark, learned):
+    patterns = benchmark(lambda: list(unique_patterns(normalize(learned))))
+    assert len(patterns) == len(set((p.route_string, p.pattern) for p in patterns))
+
+
+@pytest.mark.benchmark(group='gdpr')
+def bench_write_csv(benchmark, learned, tmp_path):
+    written = benchmark(write_csv, learned, str(tmp_path / 'read_gdpr.csv'))
+    assert written == len(learned)
+
+
+@pytest.mark.benchmark(group='gdpr')
+def bench_export_table(benchmark, axl_server, cluster, tmp_path):
+    with axl_server.bind(AXLHelper(ucm_host='ucm', auth=('axl', 'secret'), verify=False)) as axl:
+        records = benchmark.pedantic(export_table, args=(axl, 'enduser', str(tmp_path / 'enduser.csv')), rounds=5)
+    assert records == len(cluster.users)
@@ -0,0 +1,61 @@
+"""
+Benchmarks for the Webex user provisioning in main.py against a fake Webex API
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from wxc_sdk.as_rest import AsRestSession
+
+import main
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.mapping import user_locations
+
+main.load_environment()
+
+
+@pytest.fixture(scope='module')
+def users(ucm_reader):
+    return [user for user in ucm_reader.user.list()
+            if user.mailid and user.telephoneNumber.startswith('+1408')]
+
+
+@pytest.fixture(scope='module')
+def all_users(ucm_reader):
+    return [user for user in ucm_reader.user.list() if user.mailid]
+
+
+@pytest.fixture(scope='module')
+def locations(ucm_reader, all_users):
+    return user_locations(all_users, ucm_reader.phone.list())
+
+
+def provision(cluster, users, readonly: bool, locations: dict[str, str] = None) -> FakeWebexServer:
+    async def run():
+        # fresh org for each round so that all users need to be provisioned
+        async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as server:
+            with patch.object(AsRestSession, 'BASE', server.url), patch.object(main, 'READONLY', readonly):
+                await main.user_provisioning(users=list(users), user_locations=locations)
+        return server
+
+    return asyncio.run(run())
+
+
+@pytest.mark.benchmark(group='provisioning')
+def bench_provisioning_readonly(benchmark, cluster, users):
+    server = benchmark.pedantic(provision, args=(cluster, users, True), rounds=3)
+    # people are read once for the diff
+    assert server.requests['GET /v1/people'] == 1
+    assert 'POST /v1/people' not in server.requests
+
+
+@pytest.mark.benchmark(group='provisioning')
+def bench_provisioning(benchmark, cluster, users):
+    server = benchmark.pedantic(provision, args=(cluster, users, False), rounds=3)
+    assert server.requests['POST /v1/people'] == min(len(users), main.TEST_USERS_TO_PROVISION)
+
+
+@pytest.mark.benchmark(group='provisioning')
+def bench_provisioning_multi_location(benchmark, cluster, all_users, locations):
+    server = benchmark.pedantic(provision, args=(cluster, all_users, False, locations), rounds=3)
+    assert server.requests['POST /v1/people'] == min(len(all_users), main.TEST_USERS_TO_PROVISION)
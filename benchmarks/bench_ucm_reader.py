@@ -0,0 +1,40 @@
+"""
+Benchmarks for reading UCM objects via AXL
+"""
+import pytest
+
+from ucm_reader import Phone
+
+
+@pytest.mark.benchmark(group='ucm_reader')
+def bench_list_users(benchmark, ucm_reader, cluster):
+    users = benchmark.pedantic(ucm_reader.user.list, kwargs=dict(refresh=True), rounds=5)
+    assert len(users) == len(cluster.users)
+
+
+@pytest.mark.benchmark(group='ucm_reader')
+def bench_list_phones(benchmark, ucm_reader, cluster):
+    # listPhone responses are bigger: this includes the paged requests after the 'Query request too large' fault
+    phones = benchmark.pedantic(ucm_reader.phone.list, kwargs=dict(refresh=True), rounds=3)
+    assert len(phones) == len(cluster.phones)
+
+
+@pytest.mark.benchmark(group='ucm_reader')
+def bench_tags(benchmark):
+    tags = benchmark(lambda: list(Phone.tags()))
+    assert 'name' in tags
+
+
+@pytest.mark.benchmark(group='ucm_reader')
+def bench_lazy_details(benchmark, ucm_reader):
+    phones = ucm_reader.phone.list()[:100]
+
+    def fresh_phones():
+        # new objects for each round so that details are read again
+        return ([Phone.parse_obj(obj_api=ucm_reader.phone, obj=phone.dict(by_alias=True)) for phone in phones],), {}
+
+    def read_lines(fresh):
+        return [phone.lines for phone in fresh]
+
+    lines = benchmark.pedantic(read_lines, setup=fresh_phones, rounds=5)
+    assert all(lines)
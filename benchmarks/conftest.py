@@ -0,0 +1,35 @@
+"""
+Fixtures shared by the benchmarks: fake AXL server with a synthetic cluster and UCM users read from that server
+"""
+import os
+
+import pytest
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+# read by main.load_environment()
+for key in ('AXL_HOST', 'AXL_USER', 'AXL_PASSWORD', 'WEBEX_ACCESS_TOKEN', 'GMAIL_ID'):
+    os.environ.setdefault(key, 'benchmark')
+# each round provisions to a fresh org: don't persist the Webex inventory
+os.environ.setdefault('WEBEX_INVENTORY_PATH', '')
+
+# size of the synthetic cluster
+USERS = int(os.getenv('BENCHMARK_USERS', '5000'))
+
+
+@pytest.fixture(scope='session')
+def cluster() -> SyntheticCluster:
+    return SyntheticCluster(users=USERS, learned_patterns=USERS)
+
+
+@pytest.fixture(scope='session')
+def axl_server(cluster) -> FakeAXLServer:
+    with FakeAXLServer(cluster) as server:
+        yield server
+
+
+@pytest.fixture(scope='session')
+def ucm_reader(axl_server) -> UCMReader:
+    with UCMReader(host='ucm', user='axl', password='secret', address=axl_server.url) as reader:
+        yield reader
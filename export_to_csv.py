@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 """
-usage: export_to_csv.py [-h] [--host HOST] [--user USER] [--password PASSWORD] table
+usage: export_to_csv.py [-h] [--host HOST] [--user USER] [--password PASSWORD] [--profile PATH]
+                        [--profile-interval MS]
+                        table
 
 Dump a table from UCM to CSV
 
@@ -12,29 +14,57 @@ options:
   --host HOST          AXl host
   --user USER          AXL user
   --password PASSWORD  AXL password
+  --profile PATH       record a profile of the run and write it to PATH (collapsed stack format)
+  --profile-interval MS
+                       also sample the Python stacks every MS milliseconds
 """
 import csv
 import logging
 import os
 import sys
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 
 from dotenv import load_dotenv
 from ucmaxl import AXLHelper
 
+from migrationapi import add_export_arguments
+from ucm_reader.metrics import instrument_axl, metrics
+from ucm_reader.profiling import instrument_profiling, profiler
+from ucm_reader.retry import sql_query
+from ucm_reader.wsdl import axl_helper
 
-def main():
+
+def export_table(axl: AXLHelper, table: str, csv_name: str = None) -> int:
+    """
+    Read all records of a table and write them to a CSV file
+    :param axl: AXL helper to use for the SQL query
+    :param table: table name
+    :param csv_name: path of the CSV file; default: <table>.csv
+    :return: number of records written
+    """
+    with profiler.span('fetch'):
+        r = sql_query(axl, f'select * from {table}')
+    csv_name = csv_name or f'{table}.csv'
+    with profiler.span('write'), open(csv_name, mode='w', newline='') as output:
+        # take keys of 1st record as field names
+        writer = csv.DictWriter(output, fieldnames=list(r[0]))
+        writer.writeheader()
+        list(map(writer.writerow, r))
+    return len(r)
+
+
+def main(args: Namespace = None):
+    """
+    :param args: parsed arguments (see migrationapi.add_export_arguments); default: parse command line
+    """
     logging.basicConfig(level=logging.INFO)
     logging.getLogger('zeep.wsdl.wsdl').setLevel(logging.INFO)
     logging.getLogger('zeep.xsd.schema').setLevel(logging.INFO)
 
-    parser = ArgumentParser(description='Dump a table from UCM to CSV')
-    parser.add_argument('table', type=str,
-                        help='table name')
-    parser.add_argument('--host', type=str, help='AXl host')
-    parser.add_argument('--user', type=str, help='AXL user')
-    parser.add_argument('--password', type=str, help='AXL password')
-    args = parser.parse_args()
+    if args is None:
+        parser = ArgumentParser(description='Dump a table from UCM to CSV')
+        add_export_arguments(parser)
+        args = parser.parse_args()
 
     load_dotenv()
     axl_host = args.host or os.getenv('AXL_HOST')
@@ -44,15 +74,16 @@ def main():
         print('AXL host, AXL user, and AXL password all need to be provided either as parameter or in environment '
               '(AXL_HOST, AXL_USER, AXL_PASSWORD)', file=sys.stderr)
         exit(1)
-    with AXLHelper(ucm_host=axl_host, auth=(axl_user, axl_pass), verify=False) as axl:
-        r = axl.sql_query(f'select * from {args.table}')
+    profiler.configure(args)
+    with axl_helper(ucm_host=axl_host, auth=(axl_user, axl_pass), verify=False) as axl:
+        instrument_axl(axl.service)
+        instrument_profiling(axl.service)
         csv_name = f'{args.table}.csv'
-        with open(csv_name, mode='w', newline='') as output:
-            # take keys of 1st record as field names
-            writer = csv.DictWriter(output, fieldnames=list(r[0]))
-            writer.writeheader()
-            list(map(writer.writerow, r))
-            print(f'wrote {len(r)} records to {csv_name}')
+        records = export_table(axl, args.table, csv_name)
+        print(f'wrote {records} records to {csv_name}')
+    if metrics_path := os.getenv('METRICS_PATH'):
+        metrics.write(metrics_path)
+    profiler.stop()
 
 
 if __name__ == '__main__':
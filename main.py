@@ -1,33 +1,93 @@
 #!/usr/bin/env python
 import asyncio
-import datetime
 import logging
 import os
 import random
 import time
+from argparse import ArgumentParser, Namespace
 from collections import defaultdict
+from functools import lru_cache, partial
+from itertools import chain
 from typing import List, Optional
 
 from dotenv import load_dotenv
-from wxc_sdk.all_types import License, Location, Person, PhoneNumber
+from wxc_sdk.all_types import License, Location, Person
 from wxc_sdk.as_api import AsWebexSimpleApi
-from wxc_sdk.people import PhoneNumberType
-from wxc_sdk.telephony import NumberListPhoneNumber, NumberOwner
-
-from ucm_reader import UCMReader
+from wxc_sdk.telephony import NumberOwner, OwnerType
+
+from migrationapi import add_provision_arguments
+from provisioning.devices import PhoneOwner, phone_owners, webex_mac, webex_model
+from provisioning.diff import UPDATES, Action, DesiredUser, PlanEntry, diff, summary, with_work_number
+from provisioning.inventory import WebexInventory
+from provisioning.mapping import phone_location, user_locations as map_user_locations
+from provisioning.metrics import instrument_webex
+from provisioning.projection import DEVICE_CALLS, USER_CALLS, Task, latencies_from_metrics, load_latencies, project
+from provisioning.report import FAIL, SKIP, SUCCESS, RunReport
+from provisioning.rules import DEFAULT_RULES, MappingRules, Rule, load_rules
+from provisioning.scheduler import FairScheduler, adapt_webex
+from ucm_reader import UCMInventory, UCMReader
 from ucm_reader import User
+from ucm_reader.concurrency import AdaptiveLimit
+from ucm_reader.metrics import metrics
+from ucm_reader.numbers import NumberPlan
+from ucm_reader.profiling import profiler
 
 # number of test users to provision
 TEST_USERS_TO_PROVISION = 60
 
-# number of parallel user provisioning tasks
+# number of parallel user provisioning tasks; initial number if ADAPTIVE_CONCURRENCY is set
 PARALLEL_TASKS = 10
 
+# adapt the number of parallel tasks to Webex rate limiting (429) between 1 and MAX_PARALLEL_TASKS
+ADAPTIVE_CONCURRENCY = True
+MAX_PARALLEL_TASKS = 50
+
+# maximum number of parallel user provisioning tasks per location
+PARALLEL_TASKS_PER_LOCATION = 4
+
+# rate limit (requests per second) to assume when projecting the wall time of a run; None: no rate limit
+WEBEX_RATE_LIMIT: Optional[float] = None
+
+# Webex location for users if no mapping is given
+DEFAULT_LOCATION = 'SJC'
+
+# users are mapped to the Webex location with the name of the UCM location ('location') or device pool
+# ('device_pool') of their phones
+LOCATION_SOURCE = 'location'
+
+# UCM location (or device pool) name -> Webex location name for names which differ
+LOCATION_MAP: dict[str, str] = dict()
+
+# also migrate the phones of the users
+MIGRATE_DEVICES = True
+
+# attributes of users and phones needed for provisioning; list calls only read these to get smaller responses
+USER_FIELDS = ('userid', 'mailid', 'telephoneNumber', 'primaryExtension', 'firstName', 'lastName')
+PHONE_FIELDS = ('name', 'model', 'ownerUserName', 'locationName', 'devicePoolName')
+
+# users of a migration wave: either AXL search criteria (listUser: firstName, lastName, userid, department; '%' as
+# wildcard), for example {'department': 'Sales%'}, or a SQL predicate on the enduser table, for example
+# "telephonenumber like '+1408%'"; both empty: all users
+USER_SEARCH: dict[str, str] = dict()
+USER_WHERE: Optional[str] = None
+
+# read complete lists with concurrent prefix searches
+SHARDED_LISTS = False
+
 # don't actually provision users
 READONLY = True
 
 TIMESTAMP_IN_USER_EMAILS = False
 
+# country code of numbers in national format and E.164 prefixes for the extensions of UCM locations, for example
+# {'SJC': '+1408555'}; used to compare and map numbers in any format
+COUNTRY_CODE = '1'
+SITE_PREFIXES: dict[str, str] = dict()
+
+# YAML file with rules for email, display name, extension, DID and location (see provisioning.rules and
+# 'mapping_rules.yml (sample)'); None: default rules
+MAPPING_RULES: Optional[str] = None
+
 log = logging.getLogger(__name__)
 
 
@@ -41,13 +101,25 @@ def from_env(key: str) -> str:
     return value
 
 
-# get some info from environment variables .. load .env file 1st
-load_dotenv()
-AXL_HOST = from_env('AXL_HOST')
-AXL_USER = from_env('AXL_USER')
-AXL_PASSWORD = from_env('AXL_PASSWORD')
-WEBEX_TOKEN = from_env('WEBEX_ACCESS_TOKEN')
-GMAIL_ID = from_env('GMAIL_ID')
+# settings from environment variables, see load_environment()
+AXL_HOST: Optional[str] = None
+AXL_USER: Optional[str] = None
+AXL_PASSWORD: Optional[str] = None
+WEBEX_TOKEN: Optional[str] = None
+GMAIL_ID: Optional[str] = None
+
+
+def load_environment():
+    """
+    Get some info from environment variables .. load .env file 1st
+    """
+    global AXL_HOST, AXL_USER, AXL_PASSWORD, WEBEX_TOKEN, GMAIL_ID
+    load_dotenv()
+    AXL_HOST = from_env('AXL_HOST')
+    AXL_USER = from_env('AXL_USER')
+    AXL_PASSWORD = from_env('AXL_PASSWORD')
+    WEBEX_TOKEN = from_env('WEBEX_ACCESS_TOKEN')
+    GMAIL_ID = from_env('GMAIL_ID')
 
 
 async def get_calling_licenses(*, api: AsWebexSimpleApi) -> list[License]:
@@ -84,45 +156,69 @@ def allocate_calling_license(*, calling_license_list: list[License]) -> Optional
     return license_with_available_allocation
 
 
+@lru_cache
+def configured_plan(country_code: str, site_prefixes: tuple[tuple[str, str], ...]) -> NumberPlan:
+    """
+    Number plan created once per configuration
+    """
+    return NumberPlan(country_code=country_code, site_prefixes=dict(site_prefixes))
+
+
+def number_plan() -> NumberPlan:
+    """
+    Number plan to normalize UCM numbers to E.164: COUNTRY_CODE and SITE_PREFIXES
+    """
+    return configured_plan(COUNTRY_CODE, tuple(sorted(SITE_PREFIXES.items())))
+
+
+@lru_cache
+def compiled_rules(rules_path: Optional[str], gmail_id: Optional[str], timestamp_in_emails: bool,
+                   plan: NumberPlan = None) -> MappingRules:
+    """
+    Mapping rules compiled once per configuration
+    """
+    rules = load_rules(rules_path) if rules_path else DEFAULT_RULES
+    if timestamp_in_emails and not (rules_path and rules.email):
+        # add a timestamp so that the email addresses are unique
+        rules = rules.copy(update=dict(email=[Rule(source='mailid', match=r'^(?P<mail_user>[^@]*)',
+                                                   template='{gmail_id}+{timestamp}-{mail_user}@gmail.com')]))
+    return MappingRules(rules, constants=dict(gmail_id=gmail_id), number_plan=plan)
+
+
+def mapping_rules() -> MappingRules:
+    """
+    Rules mapping UCM users to Webex attributes: MAPPING_RULES or the default rules
+    Here we create dummy email addresses under a given GMAIL address, use the last four digits of the user's phone
+    number as extension and the phone number in E.164 (w/o +1 for NANP numbers) as DID
+    """
+    return compiled_rules(MAPPING_RULES, GMAIL_ID, TIMESTAMP_IN_USER_EMAILS, number_plan())
+
+
 def webex_email(*, user: User):
     """
     For a given UCM user determine the email address be used in Webex Calling
-    Here we create dummy email addresses under a given GMAIL address
-    In reality one would use the actual email address of the UCM user
     :param user: UCM user
     :return: email address
     """
-    time_stamp = datetime.datetime.utcnow().strftime('%Y%m%d%H')
-    # get the user portion of the email
-    email_user = user.mailid.split('@')[0]
-    # now construct an email address to be used in Webex. We add a timestamp so that they are unique
-    if TIMESTAMP_IN_USER_EMAILS:
-        email = f'{GMAIL_ID}+{time_stamp}-{email_user}@gmail.com'
-    else:
-        email = f'{GMAIL_ID}+{email_user}@gmail.com'
-    return email
+    return mapping_rules().email(user)
 
 
 def webex_display_name(*, user: User):
     """
     For a given UCM user determine the display name to be used in Webex Calling
-    Here we simply take the concatenation of first and last name
     :param user: UCM user
     :return: display name
     """
-    display_name = f'{user.firstName} {user.lastName}'
-    return display_name
+    return mapping_rules().display_name(user)
 
 
 def webex_extension(*, user: User) -> str:
     """
     For a given UCM user determine the extension to be used in Webex Calling
-    Here we simply take the last four digit of the user's phone number
     :param user: UCM user
-    :return: four digit extension
+    :return: extension
     """
-    # last four digits
-    return user.telephoneNumber.strip()[-4:]
+    return mapping_rules().extension(user)
 
 
 def webex_did(*, user: User) -> str:
@@ -131,169 +227,369 @@ def webex_did(*, user: User) -> str:
     :param user: UCM user
     :return: DID
     """
-    r = user.telephoneNumber
-    if r.startswith('+1'):
-        r = r[2:]
-    return r
+    return mapping_rules().did(user)
+
+
+def max_parallel_tasks() -> int:
+    return MAX_PARALLEL_TASKS if ADAPTIVE_CONCURRENCY else PARALLEL_TASKS
+
+
+def webex_limit(api: AsWebexSimpleApi) -> Optional[AdaptiveLimit]:
+    """
+    Adaptive limit for the number of parallel provisioning tasks fed by the requests of the given API
+    :return: None if ADAPTIVE_CONCURRENCY is not set
+    """
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    limit = AdaptiveLimit('webex', initial=PARALLEL_TASKS, maximum=MAX_PARALLEL_TASKS)
+    adapt_webex(api, limit)
+    return limit
 
 
-async def user_provisioning(*, users: List[User]):
+def skip_reason(entry: PlanEntry) -> str:
+    """
+    Reason to count skipped users by in the run report; w/o TNs, extensions and names
+    """
+    if entry.unavailable_tn:
+        return 'TN not available'
+    if entry.reason.startswith('extension'):
+        return 'extension assigned to somebody else'
+    return entry.reason
+
+
+async def user_provisioning(*, users: List[User], user_locations: dict[str, str] = None,
+                            dry_run: bool = False, report: RunReport = None,
+                            person_ids: dict[str, str] = None) -> list[PlanEntry]:
     """
     Provision a bunch of UCM users in Webex Calling
     :param users: list of UCM users
-    :return:
+    :param user_locations: Webex location name by UCM userid; default: all users in DEFAULT_LOCATION. Users missing
+        in the mapping are not provisioned
+    :param dry_run: only compute the plan; nothing is provisioned
+    :param report: run report to record stages, outcomes and latencies in
+    :param person_ids: if set then the Webex person id of each user which is up to date, updated or created is added
+        (by userid), for example to assign devices w/o looking up the owners again
+    :return: plan entries of users to create or update
     """
+    report = report or RunReport()
+    person_ids = dict() if person_ids is None else person_ids
 
-    async def provision_single_user(location: Location,
-                                    user: User):
+    async def provision_single_user(entry: PlanEntry):
         """
-        Provision a single Webex calling user
-        :param location: Webex calling location to assign the user to
-        :param user: UCM user information
+        Create or update a single Webex calling user
+        :param entry: plan entry with the desired state of the user and the changes to apply
         :return:
         """
-        email = webex_email(user=user)
-        people_list = await api.people.list(email=email)
-        if people_list:
-            log.info(f'{user.mailid}: user exists')
-            return
-        log.info(f'{user.mailid}: user does not exist')
-
-        # check if the phone number of the user is available
-        user_webex_did = webex_did(user=user)
-        user_tn_plus_e164 = user.telephoneNumber
-        if next((tn for tn in available_tns if tn.phone_number == user_tn_plus_e164), None) is None:
-            log.info(f'{user.mailid}: TN {user_tn_plus_e164} is not available for provisioning in Webex Calling. '
-                     f'Make sure the number has been added and is not assigned yet.')
-            return
-
-        user_extension = webex_extension(user=user)
-        owner = owners.get(location.location_id, dict()).get(user_extension, None)
-        owner: Optional[NumberOwner]
-        if owner:
-            log.info(f'{user.mailid}: extension {user_extension} is not available for provisioning in Webex Calling. '
-                     f'Extension assigned to {owner.owner_type}: {owner.first_name} {owner.last_name}.')
-            return
-
+        desired = entry.desired
+        user = desired.user
         if READONLY:
-            log.info(f'{user.mailid}: Skipping provisioning b/c READONLY is set to True')
+            log.info(f'{user.mailid}: Skipping {entry.action.value} b/c READONLY is set to True')
+            report.outcome(user.userid, SKIP, 'READONLY')
             return
-
-        calling_license = allocate_calling_license(calling_license_list=calling_licenses)
-        if calling_license is None:
-            log.info(f'{user.mailid}: no calling license allocation available')
-            return
-
-        log.info(f'{user.mailid}: creating user')
-        start = time.perf_counter()
-        settings = Person(emails=[email],
-                          display_name=webex_display_name(user=user),
-                          first_name=user.firstName,
-                          last_name=user.lastName)
-        new_user = await api.people.create(settings=settings)
-        log.info(f'{user.mailid}: creating user took {(time.perf_counter() - start) * 1000:.3f} ms')
-        log.info(f'{user.mailid}: created user, id: {new_user.person_id}')
-        licenses = new_user.licenses
-        licenses.append(calling_license.license_id)
-
-        # now we still need to add the calling license to the user and set the extension and DID
-        phone_numbers = [PhoneNumber(number_type=PhoneNumberType.work, value=user_webex_did)]
-        log.info(f'{user.mailid}: adding calling license ({calling_license.name}) and extension {user_extension}')
+        try:
+            await provision_user(entry)
+        except Exception as e:
+            report.outcome(user.userid, FAIL, e.__class__.__name__, str(e))
+            raise
+
+    async def provision_user(entry: PlanEntry):
+        desired = entry.desired
+        user = desired.user
+        person = entry.person
+        calling_license = None
+        if person is None or 'licenses' in entry.changes:
+            calling_license = allocate_calling_license(calling_license_list=calling_licenses)
+            if calling_license is None:
+                log.info(f'{user.mailid}: no calling license allocation available')
+                report.outcome(user.userid, SKIP, 'no calling license')
+                return
+
+        if person is None:
+            log.info(f'{user.mailid}: creating user')
+            start = time.perf_counter()
+            settings = Person(emails=[desired.email],
+                              display_name=mappings[user.userid].display_name,
+                              first_name=user.firstName,
+                              last_name=user.lastName)
+            with report.timer('people.create'):
+                person = await api.people.create(settings=settings)
+            log.info(f'{user.mailid}: creating user took {(time.perf_counter() - start) * 1000:.3f} ms')
+            log.info(f'{user.mailid}: created user, id: {person.person_id}')
+            person_ids[user.userid] = person.person_id
+        else:
+            log.info(f'{user.mailid}: updating {", ".join(entry.changes)}')
+        # a new user needs everything; for an existing user only the attributes which differ are changed
+        changes = entry.changes if entry.person is not None else UPDATES
+        log.info(f'{user.mailid}: setting {", ".join(changes)}: calling license, extension {desired.extension} and '
+                 f'TN {desired.phone_number}')
         start = time.perf_counter()
-        # update user
-        new_user.extension = user_extension
-        new_user.location_id = location.location_id
-        new_user.licenses = licenses
-        phone_numbers = phone_numbers
-        settings = Person(person_id=new_user.person_id,
-                          display_name=new_user.display_name,
-                          first_name=new_user.first_name,
-                          last_name=new_user.last_name,
-                          extension=user_extension,
-                          location_id=location.location_id,
-                          licenses=licenses,
-                          phone_numbers=phone_numbers)
-        updated = await api.people.update(person=settings, calling_data=True)
+        # update user: the PUT expects all details; start from the current details of the person
+        settings = person.copy(deep=True)
+        if 'licenses' in changes:
+            settings.licenses = list(person.licenses or []) + [calling_license.license_id]
+        if 'location_id' in changes:
+            settings.location_id = desired.location_id
+        if 'extension' in changes:
+            settings.extension = desired.extension
+        if 'phone_numbers' in changes:
+            # other numbers of the person (mobile, ...) are kept
+            settings.phone_numbers = with_work_number(person.phone_numbers, mappings[user.userid].did)
+        with report.timer('people.update'):
+            updated = await api.people.update(person=settings, calling_data=True)
         if updated.errors:
-            log.warning(f'{user.mailid}: errors: '
-                        f'{", ".join(f"{error}/{code_and_reason.code}({code_and_reason.reason})" for error, code_and_reason in updated.errors.items())}')
+            errors = ", ".join(f"{error}/{code_and_reason.code}({code_and_reason.reason})"
+                               for error, code_and_reason in updated.errors.items())
+            log.warning(f'{user.mailid}: errors: {errors}')
+            report.outcome(user.userid, FAIL, 'errors in calling data', errors)
+            # cached numbers might be outdated
+            inventory.invalidate(desired.location_id)
+        else:
+            report.outcome(user.userid, SUCCESS, 'created' if entry.person is None else 'updated')
+            inventory.assign(desired.location_id, phone_number=desired.phone_number, extension=desired.extension,
+                             owner=NumberOwner(owner_id=person.person_id, owner_type=OwnerType.people,
+                                               first_name=person.first_name, last_name=person.last_name))
         log.info(
-            f'{user.mailid}: adding calling license and extension took {(time.perf_counter() - start) * 1000:.3f} ms')
-        log.info(f'{user.mailid}: added calling license and extension, phone numbers: {updated.phone_numbers}')
+            f'{user.mailid}: setting calling license and extension took {(time.perf_counter() - start) * 1000:.3f} ms')
+        log.info(f'{user.mailid}: set calling license and extension, phone numbers: {updated.phone_numbers}')
+
+    if user_locations is None:
+        user_locations = {user.userid: DEFAULT_LOCATION for user in users}
+    users = [user for user in users if user.userid in user_locations]
+    location_names = sorted(set(user_locations[user.userid] for user in users))
 
     # provision the users
     async with AsWebexSimpleApi(tokens=WEBEX_TOKEN,
-                                concurrent_requests=PARALLEL_TASKS) as api:
+                                concurrent_requests=max_parallel_tasks()) as api:
+        instrument_webex(api)
+        limit = webex_limit(api)
+        inventory = WebexInventory.from_env(api)
         start = time.perf_counter()
+        report.begin('prepare', count=len(users))
 
         # get calling license
-        # get get_locations starting with 'SJC'
-        # get TNs. TNs are +E.164
-        calling_licenses, locations, numbers = await asyncio.gather(
+        # get the locations we want to put our users in
+        calling_licenses, *locations = await asyncio.gather(
             get_calling_licenses(api=api),
-            api.locations.list(name='SJC'),
-            api.telephony.phone_numbers()
+            *[inventory.location(name) for name in location_names]
         )
         calling_licenses: list[License]
-        locations: list[Location]
-        numbers: list[NumberListPhoneNumber]
-
-        available_tns = [tn for tn in numbers
-                         if tn.owner is None]
+        locations: list[Optional[Location]]
 
         log.info(f'Got {len(calling_licenses)} calling licenses with '
                  f'{sum(lic.total_units - lic.consumed_units for lic in calling_licenses)} available allocations')
 
-        # extension_owners by location and extension
-        owners: dict[str, dict[str, NumberOwner]] = defaultdict(dict)
-        for extension in (tn for tn in numbers if tn.extension):
-            owners[extension.location.location_id][extension.extension]=extension.owner
-
-        # We are looking for a location 'SJC' that's where we want to put our users
-        sjc_location = next((location
-                             for location in locations
-                             if location.name == 'SJC'), None)
-        if sjc_location is None:
-            log.info('Failed to get location "SJC"')
-            return
-        log.info(f'location "SJC", id: {sjc_location.location_id}')
-
-        # try to figure out which phone numbers are missing
-        available_tn_set = set(tn.phone_number for tn in available_tns)
-        missing_user_tns = set(user.telephoneNumber for user in users
-                               if user.telephoneNumber not in available_tn_set)
+        locations_by_name: dict[str, Location] = dict()
+        for name, location in zip(location_names, locations):
+            if location is None:
+                log.info(f'Failed to get location "{name}"')
+                continue
+            log.info(f'location "{name}", id: {location.location_id}')
+            locations_by_name[name] = location
+        for user in users:
+            if user_locations[user.userid] not in locations_by_name:
+                report.outcome(user.userid, SKIP, 'location not found', user_locations[user.userid])
+        users = [user for user in users
+                 if user_locations[user.userid] in locations_by_name]
+        if not users:
+            log.info('Nothing left to do (no users in existing locations)')
+            report.end()
+            return []
+
+        # current state of the org: people with calling data and TNs and extensions of all locations (cached).
+        # TNs are +E.164
+        location_ids = [location.location_id for location in locations_by_name.values()]
+        people, *_ = await asyncio.gather(api.people.list(calling_data=True),
+                                          *[inventory.numbers(location_id) for location_id in location_ids])
+        # TNs in +E.164; numbers which can't be normalized with the number plan aren't guessed
+        plan_numbers = number_plan()
+        phone_numbers = {user.userid: plan_numbers.normalize(user.telephoneNumber) for user in users}
+        for user in users:
+            if phone_numbers[user.userid] is None:
+                log.info(f'{user.userid}: skipping, phone number "{user.telephoneNumber}" can\'t be normalized')
+                report.outcome(user.userid, SKIP, 'number not normalizable', user.telephoneNumber)
+        users = [user for user in users if phone_numbers[user.userid] is not None]
+        # Webex attributes of all users in one pass
+        mappings = dict(zip((user.userid for user in users), mapping_rules().apply(users)))
+        # users w/o a value for one of the targets can't be provisioned
+        unmapped = {userid: [target for target, value in mapping._asdict().items() if value is None]
+                    for userid, mapping in mappings.items()}
+        for user in users:
+            if unmapped[user.userid]:
+                log.info(f'{user.userid}: skipping, no mapping rule matched for {", ".join(unmapped[user.userid])}')
+                report.outcome(user.userid, SKIP, 'no mapping rule matched', ', '.join(unmapped[user.userid]))
+        users = [user for user in users if not unmapped[user.userid]]
+        desired = [DesiredUser(user=user, email=mappings[user.userid].email,
+                               phone_number=phone_numbers[user.userid],
+                               extension=mappings[user.userid].extension,
+                               location_id=locations_by_name[user_locations[user.userid]].location_id)
+                   for user in users]
+
+        report.begin('plan', count=len(desired))
+
+        def make_plan() -> list[PlanEntry]:
+            return diff(desired, people,
+                        numbers={location_id: inventory.numbers_cached(location_id) for location_id in location_ids},
+                        calling_license_ids=(lic.license_id for lic in calling_licenses), number_plan=plan_numbers)
+
+        plan = make_plan()
+
+        # try to figure out which phone numbers are missing; cached numbers might be outdated
+        missing_tns: dict[str, set[str]] = defaultdict(set)
+        for entry in plan:
+            if entry.unavailable_tn:
+                missing_tns[entry.desired.location_id].add(entry.unavailable_tn)
+        confirmed = await asyncio.gather(*[inventory.confirm_available(location_id, tns)
+                                           for location_id, tns in missing_tns.items()])
+        if any(confirmed):
+            plan = make_plan()
+        missing_user_tns = set(entry.unavailable_tn for entry in plan if entry.unavailable_tn)
         if missing_user_tns:
             log.info(f'missing TNs: {", ".join(tn for tn in sorted(missing_user_tns))}')
             log.info(f'{len(missing_user_tns)} users with missing TNs:')
             log.info('\n'.join(
                 f'  {user.firstName} {user.lastName} ({user.mailid}): {user.telephoneNumber}' for user in users
-                if user.telephoneNumber in missing_user_tns))
-
-        # filter out users where the TN is missing
-        users = [user for user in users
-                 if user.telephoneNumber not in missing_user_tns]
-        if not users:
+                if phone_numbers[user.userid] in missing_user_tns))
+        for entry in plan:
+            if entry.action is Action.update or entry.reason == 'up to date':
+                person_ids[entry.desired.user.userid] = entry.person.person_id
+            if entry.action is Action.skip:
+                report.outcome(entry.desired.user.userid, SKIP, skip_reason(entry), entry.reason)
+                if not entry.unavailable_tn:
+                    log.debug(f'{entry.desired.user.mailid}: skipping, {entry.reason}')
+        log.info(f'plan: {", ".join(f"{action.value}: {count}" for action, count in summary(plan).items())}')
+
+        # only users which need to be created or updated
+        plan = [entry for entry in plan if entry.action is not Action.skip]
+        if not plan:
             log.info('Nothing left to do (no users)')
-            return
+            report.end()
+            return []
 
         # b/c we only have limited licenses we pick some random users
-        random.shuffle(users)
-        users = users[:TEST_USERS_TO_PROVISION]
-        users.sort(key=lambda u: f'{u.lastName:40}/{u.firstName:40}{u.mailid}')
+        random.shuffle(plan)
+        for entry in plan[TEST_USERS_TO_PROVISION:]:
+            report.outcome(entry.desired.user.userid, SKIP, 'not selected (TEST_USERS_TO_PROVISION)')
+        plan = plan[:TEST_USERS_TO_PROVISION]
+        plan.sort(key=lambda e: f'{e.desired.user.lastName:40}/{e.desired.user.firstName:40}{e.desired.user.mailid}')
+        report.end()
+        if dry_run:
+            inventory.save()
+            return plan
+
+        # Prepare provisioning tasks: one queue per location, locations are served round-robin
+        scheduler = FairScheduler(concurrency=max_parallel_tasks(), per_key=PARALLEL_TASKS_PER_LOCATION,
+                                  limit=limit)
+        for entry in plan:
+            scheduler.add(user_locations[entry.desired.user.userid], partial(provision_single_user, entry))
+        for name in locations_by_name:
+            log.info(f'location "{name}": '
+                     f'{sum(user_locations[entry.desired.user.userid] == name for entry in plan)} users')
+
+        # execute all tasks and gather results
+        try:
+            with report.stage('provision users', count=len(plan)):
+                results = await scheduler.run(return_exceptions=False)
+        finally:
+            inventory.save()
+        stop = time.perf_counter()
+        log.info(f'Time to process {len(scheduler)} user provisioning tasks: {(stop - start) * 1000:.3f}ms')
 
-        # Prepare list of provisioning tasks
-        tasks = [provision_single_user(location=sjc_location,
-                                       user=user)
-                 for user in users]
+        for entry, result in zip(plan, results):
+            if isinstance(result, Exception):
+                log.info(f'Provisioning of user {entry.desired.user.mailid} failed: {result}')
+        return plan
+
+
+async def device_provisioning(*, owners: List[PhoneOwner], user_locations: dict[str, str] = None,
+                              report: RunReport = None, person_ids: dict[str, str] = None):
+    """
+    Provision the phones of UCM users as Webex Calling devices owned by the Webex users
+    :param owners: UCM phones with their UCM users; users need to be provisioned already
+    :param user_locations: Webex location name by UCM userid, used to schedule devices fairly across locations
+    :param report: run report to record the stage and the outcome per device in
+    :param person_ids: Webex person id by UCM userid, see user_provisioning(); default: people are read once and
+        matched by email
+    :return:
+    """
+    report = report or RunReport()
+    user_locations = user_locations or dict()
 
-        # schedule all tasks for execution and gather results
-        results = await asyncio.gather(*tasks, return_exceptions=False)
+    async def provision_single_device(owner: PhoneOwner):
+        """
+        Provision a single device
+        """
+        phone, user = owner
+        mac = webex_mac(phone)
+        if mac is None:
+            log.info(f'{phone.name}: device name is not based on a MAC address')
+            report.outcome(phone.name, SKIP, 'device name w/o MAC address')
+            return
+        person_id = person_ids.get(user.userid)
+        if person_id is None:
+            log.info(f'{phone.name}: user {user.mailid} does not exist')
+            report.outcome(phone.name, SKIP, 'owner not in Webex', user.userid)
+            return
+        devices = await api.devices.list(person_id=person_id)
+        if any(device.mac and device.mac.upper() == mac for device in devices):
+            log.info(f'{phone.name}: device exists')
+            report.outcome(phone.name, SKIP, 'device exists')
+            return
+        if phone.speeddials:
+            log.info(f'{phone.name}: {len(phone.speeddials.speeddial)} speed dials not migrated')
+        if READONLY:
+            log.info(f'{phone.name}: Skipping provisioning b/c READONLY is set to True')
+            report.outcome(phone.name, SKIP, 'READONLY')
+            return
+        device = await api.devices.create_by_mac_address(mac=mac, person_id=person_id, model=webex_model(phone))
+        log.info(f'{phone.name}: created device for {user.mailid}, id: {device.device_id}')
+        report.outcome(phone.name, SUCCESS, 'device created')
+
+    if not owners:
+        log.info('Nothing to do (no devices)')
+        return
+    async with AsWebexSimpleApi(tokens=WEBEX_TOKEN,
+                                concurrent_requests=max_parallel_tasks()) as api:
+        instrument_webex(api)
+        limit = webex_limit(api)
+        start = time.perf_counter()
+        if person_ids is None:
+            # one read of all people instead of a lookup per device
+            people = await api.people.list()
+            by_email = {email.lower(): person.person_id for person in people for email in person.emails or []}
+            person_ids = {user.userid: person_id for _, user in owners
+                          if (person_id := by_email.get(webex_email(user=user).lower()))}
+        # same bounded executor as for the users: adaptive number of devices in total and at most
+        # PARALLEL_TASKS_PER_LOCATION devices per location
+        scheduler = FairScheduler(concurrency=max_parallel_tasks(), per_key=PARALLEL_TASKS_PER_LOCATION,
+                                  limit=limit)
+        for owner in owners:
+            scheduler.add(user_locations.get(owner.user.userid, DEFAULT_LOCATION),
+                          partial(provision_single_device, owner))
+        with report.stage('provision devices', count=len(owners)):
+            results = await scheduler.run(return_exceptions=True)
         stop = time.perf_counter()
-        log.info(f'Time to process {len(tasks)} user provisioning tasks: {(stop - start) * 1000:.3f}ms')
+        log.info(f'Time to process {len(scheduler)} device provisioning tasks: {(stop - start) * 1000:.3f}ms')
 
-        for user, result in zip(users, results):
+        for owner, result in zip(owners, results):
             if isinstance(result, Exception):
-                log.info(f'Provisioning of user {user.mailid} failed: {result}')
+                log.info(f'Provisioning of device {owner.phone.name} failed: {result}')
+                report.outcome(owner.phone.name, FAIL, result.__class__.__name__, str(result))
+
+
+def plan_tasks(*, plan: List[PlanEntry], owners: List[PhoneOwner], user_locations: dict[str, str]) -> list[Task]:
+    """
+    Webex API calls of the tasks of a provisioning run
+    :param plan: plan entries of users to create or update
+    :param owners: phones to migrate; devices are assumed to not exist yet
+    :param user_locations: Webex location name by UCM userid
+    :return: tasks
+    """
+    tasks = [Task(key=user_locations.get(entry.desired.user.userid, DEFAULT_LOCATION),
+                  calls=USER_CALLS[entry.action.value])
+             for entry in plan]
+    tasks.extend(Task(key=user_locations.get(owner.user.userid, DEFAULT_LOCATION), calls=DEVICE_CALLS)
+                 for owner in owners)
+    return tasks
 
 
 async def validate_access_token():
@@ -312,50 +608,133 @@ and put that token in your .env file in the main directory.""")
             exit(1)
 
 
-def main():
+def main(args: Namespace = None):
+    """
+    :param args: parsed arguments (see migrationapi.add_provision_arguments); default: parse command line
+    """
+    if args is None:
+        parser = ArgumentParser(description='Provision UCM users in Webex Calling')
+        add_provision_arguments(parser)
+        args = parser.parse_args()
+    profiler.configure(args)
+    load_environment()
+    report = RunReport()
+
     asyncio.run(validate_access_token())
     if READONLY:
         log.info(
             f'If you actually want this script to create users then you need to set READONLY to False in {__file__}')
     log.info('Preparing UCMReader...')
-    with UCMReader(host=AXL_HOST, user=AXL_USER, password=AXL_PASSWORD) as ucm_reader:
+    # AXL_CHECKPOINT_PATH: directory for page level checkpoints so that an aborted extraction can be resumed
+    with UCMReader(host=AXL_HOST, user=AXL_USER, password=AXL_PASSWORD,
+                   checkpoint=os.getenv('AXL_CHECKPOINT_PATH') or None) as ucm_reader:
         # get all users from UCM
+        report.begin('read UCM')
         log.info('Getting users from UCM...')
-        users = ucm_reader.user.list()
+        users = ucm_reader.user.list(fields=USER_FIELDS, search=USER_SEARCH or None, where=USER_WHERE,
+                                     sharded=SHARDED_LISTS)
+        # .. and phones to determine the location of users
+        log.info('Getting phones from UCM...')
+        phones = ucm_reader.phone.list(fields=PHONE_FIELDS, sharded=SHARDED_LISTS)
+        report.end(count=len(users) + len(phones))
 
         # Let's check for consistent phone numbers and primary extensions
+        report.begin('transform', count=len(users))
+        profiler.begin('transform')
         users_ok = []
         users_nok = []
+        normalize = number_plan().normalize
         for user in users:
             # user ok if
             # - user has a mail id
             # - the primary extension is set
             # - the pattern on the primary extension exists
-            # - the primary extension pattern matches the user's phone number in +E.164; strip leading '\'
+            # - the primary extension pattern and the user's phone number are the same number in E.164; numbers in
+            #   any format ('\+14085551234', '4085551234', ...)
             if user.mailid and \
                     user.primaryExtension and \
                     user.primaryExtension.pattern and \
-                    user.primaryExtension.pattern.strip('\\') == user.telephoneNumber:
+                    (e164 := normalize(user.primaryExtension.pattern)) and \
+                    e164 == normalize(user.telephoneNumber):
                 users_ok.append(user)
             else:
                 users_nok.append(user)
-
-        # group users by 1st five characters of their phone number
-        users_per_npa = defaultdict(list)
+                report.outcome(user.userid, SKIP, 'inconsistent mail id, primary extension or phone number',
+                               f'{user.primaryExtension and user.primaryExtension.pattern}/{user.telephoneNumber}')
+
+        # map users to Webex locations
+        # location rules for all UCM location (or device pool) names; LOCATION_MAP has precedence
+        location_map = mapping_rules().location_map(name for phone in phones
+                                                    if (name := phone_location(phone, LOCATION_SOURCE)))
+        location_map.update(LOCATION_MAP)
+        user_locations = map_user_locations(users_ok, phones, source=LOCATION_SOURCE, location_map=location_map)
+        users_per_location = defaultdict(list)
         for user in users_ok:
-            users_per_npa[user.telephoneNumber[:5]].append(user)
-        for npa in users_per_npa:
-            log.info(f'NPA {npa}: {len(users_per_npa[npa])} users')
-
-        # let's focus on users in NPA 408
-        users = users_per_npa['+1408']
+            users_per_location[user_locations.get(user.userid)].append(user)
+        for location in sorted(users_per_location, key=lambda loc: loc or ''):
+            log.info(f'location {location or "(no phone)"}: {len(users_per_location[location])} users')
+        for user in users_per_location.get(None, []):
+            report.outcome(user.userid, SKIP, 'no phone')
+        users = [user for user in users_ok if user.userid in user_locations]
+        profiler.end()
+        report.end()
+
+        owners = []
+        if MIGRATE_DEVICES:
+            # phones of the users to migrate and phones w/o owner (which might have a user associated to a line)
+            # with lines and speed dials; details are read concurrently in batches
+            log.info('Getting phone details from UCM...')
+            report.begin('read phone details')
+            ucm_inventory = UCMInventory(ucm_reader, user_fields=USER_FIELDS, phone_fields=PHONE_FIELDS,
+                                         number_plan=number_plan())
+            phones = list(chain.from_iterable(ucm_inventory.phones_of(user.userid) for user in users))
+            # the owner is checked on the phone so that a migration wave doesn't need to read all users
+            phones.extend(phone for phone in ucm_reader.phone.list(fields=PHONE_FIELDS)
+                          if not (phone.ownerUserName and phone.ownerUserName.value))
+            skipped = []
+            owners = list(phone_owners(ucm_reader.phone.details(phones), users, skipped=skipped))
+            for phone, reason in skipped:
+                if reason == 'owner not in wave':
+                    report.outcome(phone.name, SKIP, 'device owner not in wave', phone.ownerUserName.value)
+            report.end(count=len(phones))
+            log.info(f'{len(owners)} phones to migrate')
 
     # we want to use asyncio to be able to provision multiple users "in parallel" b/c a single transaction
     # can take a while...
-    asyncio.run(user_provisioning(users=users))
-
-
-if __name__ == '__main__':
+    if getattr(args, 'plan', False):
+        # dry run: only compute the plan and project the wall time of the real run
+        plan = asyncio.run(user_provisioning(users=users, user_locations=user_locations, dry_run=True,
+                                             report=report))
+        latencies = load_latencies(args.latencies) if args.latencies else dict()
+        # latencies measured in this run are more current
+        latencies.update(latencies_from_metrics(metrics))
+        projection = project(plan_tasks(plan=plan, owners=owners, user_locations=user_locations),
+                             latencies=latencies)
+        for line in projection.report(concurrency=PARALLEL_TASKS, per_key=PARALLEL_TASKS_PER_LOCATION,
+                                      rate_limit=WEBEX_RATE_LIMIT):
+            log.info(line)
+    else:
+        with profiler.span('provision'):
+            person_ids = dict()
+            asyncio.run(user_provisioning(users=users, user_locations=user_locations, report=report,
+                                          person_ids=person_ids))
+            asyncio.run(device_provisioning(owners=owners, user_locations=user_locations, report=report,
+                                            person_ids=person_ids))
+
+    # which calls dominate the wall time?
+    for line in chain(metrics.summary('axl_operation_seconds'), metrics.summary('webex_request_seconds')):
+        log.info(line)
+    if metrics_path := os.getenv('METRICS_PATH'):
+        metrics.write(metrics_path)
+    # stages, outcomes, latencies and request rates of the run
+    for line in report.summary():
+        log.info(line)
+    if report_path := os.getenv('RUN_REPORT_PATH'):
+        report.write(report_path)
+    profiler.stop()
+
+
+def setup_logging():
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
 
@@ -383,4 +762,7 @@ if __name__ == '__main__':
     logging.getLogger('wxc_sdk.as_rest').setLevel(logging.DEBUG)  # set this to DEBUG for REST message details
     logging.getLogger('wxc_sdk.as_api').setLevel(logging.DEBUG)
 
+
+if __name__ == '__main__':
+    setup_logging()
     main()
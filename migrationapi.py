@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+usage: migrationapi [-h] {provision,gdpr,export} ...
+
+UCM to Webex Calling migration tools
+
+positional arguments:
+  {provision,gdpr,export}
+    provision           provision UCM users in Webex Calling (main.py)
+    gdpr                read learned patterns from UCM and write them to CSV (read_gdpr.py)
+    export              dump a table from UCM to CSV (export_to_csv.py)
+
+options:
+  -h, --help            show this help message and exit
+
+Heavy dependencies (zeep, wxc_sdk, pydantic models) are only imported by the subcommand which needs them: parsing the
+command line (and --help) only needs the standard library.
+"""
+import sys
+from argparse import ArgumentParser, Namespace
+
+from ucm_reader.profiling import add_profile_arguments
+
+
+def add_provision_arguments(parser: ArgumentParser):
+    parser.add_argument('--plan', action='store_true',
+                        help='dry run: compute the provisioning plan and project wall time and API calls w/o '
+                             'provisioning anything')
+    parser.add_argument('--latencies', type=str, metavar='PATH',
+                        help='JSON metrics of a previous run (METRICS_PATH) with Webex API latencies to use for the '
+                             'projection')
+    add_profile_arguments(parser)
+
+
+def add_gdpr_arguments(parser: ArgumentParser):
+    parser.add_argument('--max-expansion', type=int, metavar='N',
+                        help='skip and report learned patterns which would expand to more than N patterns '
+                             '(default: 1000)')
+    parser.add_argument('--max-keys', type=int, metavar='N',
+                        help='keep at most N pattern keys in memory for the duplicate detection; beyond that keys '
+                             'spill to a temporary file (default: 1000000)')
+    add_profile_arguments(parser)
+
+
+def add_export_arguments(parser: ArgumentParser):
+    parser.add_argument('table', type=str,
+                        help='table name')
+    parser.add_argument('--host', type=str, help='AXl host')
+    parser.add_argument('--user', type=str, help='AXL user')
+    parser.add_argument('--password', type=str, help='AXL password')
+    add_profile_arguments(parser)
+
+
+def provision(args: Namespace):
+    import main
+    main.setup_logging()
+    main.main(args)
+
+
+def gdpr(args: Namespace):
+    import read_gdpr
+    read_gdpr.main(args)
+
+
+def export(args: Namespace):
+    import export_to_csv
+    export_to_csv.main(args)
+
+
+def build_parser() -> ArgumentParser:
+    parser = ArgumentParser(prog='migrationapi', description='UCM to Webex Calling migration tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, add_arguments, command, help_text in (
+            ('provision', add_provision_arguments, provision, 'provision UCM users in Webex Calling (main.py)'),
+            ('gdpr', add_gdpr_arguments, gdpr, 'read learned patterns from UCM and write them to CSV (read_gdpr.py)'),
+            ('export', add_export_arguments, export, 'dump a table from UCM to CSV (export_to_csv.py)')):
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        add_arguments(subparser)
+        subparser.set_defaults(func=command)
+    return parser
+
+
+def main(argv: list[str] = None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
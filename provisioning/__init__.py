@@ -0,0 +1,3 @@
+"""
+Helpers for provisioning UCM users and devices in Webex Calling
+"""
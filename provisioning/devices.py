@@ -0,0 +1,74 @@
+"""
+Join UCM phones to their users for the migration of devices to Webex Calling.
+
+Phones are streamed from :meth:`ucm_reader.phone.PhoneApi.details` (lines and speed dials are read with concurrent
+getPhone calls in batches) and joined to users with a hash index on the userid: a phone belongs to its owner
+(ownerUserName) or, for phones without owner, to the first known end user associated with one of its lines. Phones of
+an owner who isn't one of the users are skipped. Both sides are read once and the join is a single pass over the phones.
+"""
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple, Optional
+
+from ucm_reader import Phone, User
+
+__all__ = ['PhoneOwner', 'phone_owners', 'webex_mac', 'webex_model']
+
+log = logging.getLogger(__name__)
+
+# UCM model -> Webex device model for models where the Webex name isn't simply 'DMS <UCM model>'
+MODEL_MAP: dict[str, str] = dict()
+
+MAC_NAME = re.compile(r'SEP([0-9A-F]{12})', re.IGNORECASE)
+
+
+class PhoneOwner(NamedTuple):
+    phone: Phone
+    user: User
+
+
+def phone_owners(phones: Iterable[Phone], users: Iterable[User],
+                 skipped: list[tuple[Phone, str]] = None) -> Iterator[PhoneOwner]:
+    """
+    Join phones to users
+
+    :param phones: phones; for phones w/o owner the lines are accessed which requires details to be read
+    :param users: users to join to; phones of other users are skipped
+    :param skipped: if set then skipped phones are appended with the reason: 'owner not in wave' for phones owned by
+        somebody else, 'no known owner' for phones w/o owner and w/o one of the users on a line
+    :return: generator yielding phones with their user in the order of the phones
+    """
+    users_by_id = {user.userid: user for user in users}
+    skipped_phones = 0
+    for phone in phones:
+        owner = phone.ownerUserName and phone.ownerUserName.value
+        if owner:
+            # the owner wins over users on the lines: the phone is never assigned to somebody else
+            user = users_by_id.get(owner)
+            reason = 'owner not in wave'
+        else:
+            user = next((users_by_id[userid] for userid in phone.associated_users() if userid in users_by_id), None)
+            reason = 'no known owner'
+        if user is None:
+            skipped_phones += 1
+            if skipped is not None:
+                skipped.append((phone, reason))
+            continue
+        yield PhoneOwner(phone=phone, user=user)
+    log.debug(f'{skipped_phones} phones w/o owner to migrate')
+
+
+def webex_mac(phone: Phone) -> Optional[str]:
+    """
+    MAC address of a phone from the device name; None for devices not named SEP<MAC>
+    """
+    m = MAC_NAME.fullmatch(phone.name or '')
+    return m and m.group(1).upper()
+
+
+def webex_model(phone: Phone) -> str:
+    """
+    Webex device model for the model of a UCM phone
+    """
+    return MODEL_MAP.get(phone.model, f'DMS {phone.model}')
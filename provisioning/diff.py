@@ -0,0 +1,164 @@
+"""
+Diff between the desired state of UCM users in Webex Calling and the actual state of the Webex org.
+
+Instead of discovering the state of each user with individual API calls during provisioning the state of the org is
+read once (people with calling data and the numbers of the locations) and compared to the desired state of the users:
+
+* desired users (:class:`DesiredUser`) and Webex people are sorted by email and merge-joined,
+* TNs and extensions are looked up in hash indexes built from the numbers of the locations,
+* the result is a plan with one :class:`PlanEntry` per user: create the user, update the user (only the attributes
+  which differ) or skip the user (up to date or a conflict prevents provisioning).
+
+Incremental migration waves only need to act on the (small) set of created and updated users.
+"""
+import logging
+from collections import Counter
+from collections.abc import Iterable
+from enum import Enum
+from typing import NamedTuple, Optional
+
+from wxc_sdk.people import Person, PhoneNumber, PhoneNumberType
+from wxc_sdk.telephony import NumberListPhoneNumber, NumberOwner
+
+from ucm_reader import User
+from ucm_reader.numbers import NumberPlan
+
+__all__ = ['Action', 'UPDATES', 'DesiredUser', 'PlanEntry', 'with_work_number', 'diff', 'summary']
+
+log = logging.getLogger(__name__)
+
+
+class Action(str, Enum):
+    create = 'create'
+    update = 'update'
+    skip = 'skip'
+
+
+#: attributes of a person which are set for a user; updates only change the ones which differ
+UPDATES = ('location_id', 'licenses', 'extension', 'phone_numbers')
+
+
+class DesiredUser(NamedTuple):
+    """
+    Desired state of a UCM user in Webex Calling
+    """
+    user: User
+    email: str
+    #: +E.164
+    phone_number: str
+    extension: str
+    location_id: str
+
+
+class PlanEntry(NamedTuple):
+    action: Action
+    desired: DesiredUser
+    #: existing Webex person
+    person: Optional[Person] = None
+    #: attributes to update, see UPDATES
+    changes: tuple[str, ...] = ()
+    #: why the user is skipped
+    reason: Optional[str] = None
+    #: TN which is missing or assigned to somebody else
+    unavailable_tn: Optional[str] = None
+
+
+def with_work_number(phone_numbers: Optional[list[PhoneNumber]], tn: str) -> list[PhoneNumber]:
+    """
+    Phone numbers of a person with a TN as work number. The TN replaces the primary work number (or the first work
+    number); all other numbers (mobile, other work numbers, ...) are kept
+
+    :param phone_numbers: current phone numbers of the person
+    :param tn: TN to set
+    :return: new list of phone numbers
+    """
+    phone_numbers = list(phone_numbers or [])
+    work = [i for i, n in enumerate(phone_numbers) if n.number_type == PhoneNumberType.work]
+    if not work:
+        return phone_numbers + [PhoneNumber(number_type=PhoneNumberType.work, value=tn)]
+    i = next((i for i in work if phone_numbers[i].primary), work[0])
+    phone_numbers[i] = PhoneNumber(number_type=PhoneNumberType.work, value=tn, primary=phone_numbers[i].primary)
+    return phone_numbers
+
+
+def email_key(email: str) -> str:
+    return email.lower()
+
+
+def owner_str(owner: NumberOwner) -> str:
+    return f'{owner.owner_type}: {owner.first_name} {owner.last_name}'
+
+
+def diff(desired: Iterable[DesiredUser], people: Iterable[Person],
+         numbers: dict[str, list[NumberListPhoneNumber]], calling_license_ids: Iterable[str],
+         number_plan: NumberPlan) -> list[PlanEntry]:
+    """
+    Compute the plan to get from the current state of a Webex org to the desired state of the users
+
+    :param desired: desired state of the users
+    :param people: Webex people; need to be read with calling data
+    :param numbers: numbers by location id for all locations of the desired users
+    :param calling_license_ids: ids of Webex Calling licenses
+    :param number_plan: plan to normalize the phone numbers of people to E.164 (NANP numbers are 10D on the people API)
+    :return: plan entries in the order of the desired users
+    """
+    calling_license_ids = set(calling_license_ids)
+    normalize = number_plan.normalize
+    by_tn: dict[str, NumberListPhoneNumber] = dict()
+    by_extension: dict[tuple[str, str], NumberListPhoneNumber] = dict()
+    for location_id, location_numbers in numbers.items():
+        for number in location_numbers:
+            if number.phone_number:
+                by_tn[number.phone_number] = number
+            if number.extension:
+                by_extension[(location_id, number.extension)] = number
+
+    def plan_user(d: DesiredUser, person: Optional[Person]) -> PlanEntry:
+        person_id = person and person.person_id
+        # TN has to exist and can't be assigned to somebody else
+        number = by_tn.get(d.phone_number)
+        if number is None or number.owner is not None and number.owner.owner_id != person_id:
+            reason = f'TN {d.phone_number} not available' + (f', assigned to {owner_str(number.owner)}'
+                                                             if number is not None else '')
+            return PlanEntry(Action.skip, d, person, reason=reason, unavailable_tn=d.phone_number)
+        number = by_extension.get((d.location_id, d.extension))
+        if number is not None and number.owner is not None and number.owner.owner_id != person_id:
+            return PlanEntry(Action.skip, d, person,
+                             reason=f'extension {d.extension} assigned to {owner_str(number.owner)}')
+        if person is None:
+            return PlanEntry(Action.create, d)
+        if person.location_id and person.location_id != d.location_id:
+            return PlanEntry(Action.skip, d, person, reason='calling user in other location')
+        changes = []
+        if person.location_id != d.location_id:
+            changes.append('location_id')
+        if not calling_license_ids.intersection(person.licenses or []):
+            changes.append('licenses')
+        if person.extension != d.extension:
+            changes.append('extension')
+        if d.phone_number not in set(normalize(n.value) for n in person.phone_numbers or []):
+            changes.append('phone_numbers')
+        if not changes:
+            return PlanEntry(Action.skip, d, person, reason='up to date')
+        return PlanEntry(Action.update, d, person, changes=tuple(changes))
+
+    # merge join of desired users and people on email
+    desired = list(desired)
+    people_by_email = sorted(((email_key(email), person) for person in people for email in person.emails or []),
+                             key=lambda pair: pair[0])
+    plan: dict[str, PlanEntry] = dict()
+    i = 0
+    for d in sorted(desired, key=lambda d: email_key(d.email)):
+        key = email_key(d.email)
+        while i < len(people_by_email) and people_by_email[i][0] < key:
+            i += 1
+        person = people_by_email[i][1] if i < len(people_by_email) and people_by_email[i][0] == key else None
+        plan[d.user.userid] = plan_user(d, person)
+    return [plan[d.user.userid] for d in desired]
+
+
+def summary(plan: Iterable[PlanEntry]) -> Counter:
+    """
+    Number of plan entries by action
+    """
+    return Counter(entry.action for entry in plan)
@@ -0,0 +1,337 @@
+"""
+Offline stand-in for the parts of the Webex REST API used for user provisioning.
+
+:class:`FakeWebexServer` is an aiohttp server which serves licenses, locations, phone numbers, people and devices
+from a :class:`WebexOrg`. To point wxc_sdk to the fake server set the base URL of the REST session:
+
+    async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as server:
+        with patch.object(AsRestSession, 'BASE', server.url):
+            await user_provisioning(users=users)
+
+Optionally the server adds a fixed latency to each request and enforces a rate limit by answering with 429 and a
+Retry-After header like Webex does.
+"""
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Any, Optional
+
+from aiohttp import web
+
+__all__ = ['webex_id', 'WebexOrg', 'FakeWebexServer']
+
+log = logging.getLogger(__name__)
+
+ORG_UUID = '9e6a1f6a-7f1c-4b43-a6b3-0a1d5c2f0e11'
+
+# page size if the request doesn't have a max parameter
+DEFAULT_PAGE_SIZE = 100
+
+
+def webex_id(kind: str, obj_uuid: str = None) -> str:
+    """
+    Webex ID as used by the public APIs: base64 encoded ciscospark URI
+    """
+    obj_uuid = obj_uuid or str(uuid.uuid4())
+    return base64.b64encode(f'ciscospark://us/{kind}/{obj_uuid}'.encode()).decode().rstrip('=')
+
+
+class WebexOrg:
+    """
+    Data of a Webex organization: plain dictionaries in the JSON format of the Webex APIs
+    """
+
+    def __init__(self):
+        self.org_id = webex_id('ORGANIZATION', ORG_UUID)
+        self.licenses: list[dict[str, Any]] = []
+        self.locations: list[dict[str, Any]] = []
+        self.numbers: list[dict[str, Any]] = []
+        self.people: list[dict[str, Any]] = []
+        self.devices: list[dict[str, Any]] = []
+
+    def add_license(self, name: str, total_units: int, consumed_units: int = 0) -> dict[str, Any]:
+        lic = dict(id=webex_id('LICENSE'), name=name, totalUnits=total_units, consumedUnits=consumed_units)
+        self.licenses.append(lic)
+        return lic
+
+    def add_location(self, name: str) -> dict[str, Any]:
+        location = dict(id=webex_id('LOCATION'), name=name, orgId=self.org_id,
+                        address=dict(address1='Main Street 1', city=name, country='US'))
+        self.locations.append(location)
+        return location
+
+    def add_number(self, location: dict[str, Any], phone_number: str = None, extension: str = None,
+                   owner: dict[str, Any] = None) -> dict[str, Any]:
+        number = dict(phoneNumber=phone_number, extension=extension, state='ACTIVE', phoneNumberType='PRIMARY',
+                      mainNumber=False, tollFreeNumber=False,
+                      location=dict(id=location['id'], name=location['name']))
+        if owner:
+            number['owner'] = owner
+        self.numbers.append(number)
+        return number
+
+    @classmethod
+    def for_cluster(cls, cluster, licenses: int = None) -> 'WebexOrg':
+        """
+        Org prepared for the migration of the users of a SyntheticCluster: one location per UCM location and all
+        user TNs are available in the location of the user
+
+        :param cluster: :class:`ucm_reader.fake_axl.SyntheticCluster`
+        :param licenses: number of Webex Calling professional licenses; default: one per user
+        """
+        org = cls()
+        licenses = len(cluster.users) if licenses is None else licenses
+        org.add_license('Webex Calling - Professional', total_units=licenses)
+        org.add_license('Messaging', total_units=len(cluster.users) * 2)
+        locations = dict()
+        for i, user in enumerate(cluster.users):
+            site, _ = cluster.site(i)
+            if site not in locations:
+                locations[site] = org.add_location(site)
+            org.add_number(locations[site], phone_number=user['telephoneNumber'])
+        return org
+
+    def person(self, person_id: str) -> dict[str, Any]:
+        person = next((p for p in self.people if p['id'] == person_id), None)
+        if person is None:
+            raise web.HTTPNotFound(**error_response(f'Person not found: {person_id}'))
+        return person
+
+
+def error_response(message: str) -> dict[str, Any]:
+    return dict(text=json.dumps(dict(message=message, errors=[dict(description=message)],
+                                     trackingId=f'FAKE_{uuid.uuid4()}')),
+                content_type='application/json')
+
+
+class FakeWebexServer:
+    """
+    aiohttp server emulating the Webex REST APIs for licenses, locations, telephony numbers, people and devices
+    """
+
+    def __init__(self, org: WebexOrg = None, *, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 rate_limit: float = None):
+        """
+
+        :param org: organization data; default: empty organization
+        :param host: address to listen on
+        :param port: port to listen on; 0: pick a free port
+        :param latency: processing time in seconds added to each request
+        :param rate_limit: if set, maximum number of requests per second. Requests above the rate limit are answered
+            with 429
+        """
+        self.org = org or WebexOrg()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.rate_limit = rate_limit
+        #: number of requests by "METHOD path"
+        self.requests: dict[str, int] = dict()
+        #: number of requests answered with 429
+        self.throttled = 0
+        self._bucket = (rate_limit or 0.0, time.monotonic())
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}/v1'
+
+    async def start(self) -> 'FakeWebexServer':
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes([web.get('/v1/licenses', self.list_licenses),
+                        web.get('/v1/locations', self.list_locations),
+                        web.get('/v1/telephony/config/numbers', self.list_numbers),
+                        web.get('/v1/people', self.list_people),
+                        web.post('/v1/people', self.create_person),
+                        web.get('/v1/people/{person_id}', self.person_details),
+                        web.put('/v1/people/{person_id}', self.update_person),
+                        web.delete('/v1/people/{person_id}', self.delete_person),
+                        web.get('/v1/devices', self.list_devices),
+                        web.post('/v1/devices', self.create_device)])
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # get the actual port if we asked for any free port
+        self.port = self._runner.addresses[0][1]
+        log.debug(f'fake Webex server listening on {self.url}')
+        return self
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _take_token(self) -> float:
+        """
+        Token bucket for rate limiting
+
+        :return: 0 if the request can be processed, else number of seconds to wait
+        """
+        if not self.rate_limit:
+            return 0
+        tokens, last = self._bucket
+        now = time.monotonic()
+        tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+        if tokens < 1:
+            self._bucket = (tokens, now)
+            return (1 - tokens) / self.rate_limit
+        self._bucket = (tokens - 1, now)
+        return 0
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Callable):
+        resource = request.match_info.route.resource
+        key = f'{request.method} {resource.canonical if resource else request.path}'
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if wait := self._take_token():
+            self.throttled += 1
+            return web.json_response(dict(message='Too many requests'), status=429,
+                                     headers={'Retry-After': str(max(1, round(wait)))})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    @staticmethod
+    def _page(request: web.Request, items: list[dict[str, Any]], item_key: str = 'items') -> web.Response:
+        """
+        RFC5988 pagination with start and max parameters
+        """
+        start = int(request.query.get('start', 0))
+        page_size = int(request.query.get('max', DEFAULT_PAGE_SIZE))
+        headers = dict()
+        if start + page_size < len(items):
+            next_url = request.url.update_query(start=str(start + page_size), max=str(page_size))
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return web.json_response({item_key: items[start:start + page_size]}, headers=headers)
+
+    async def list_licenses(self, request: web.Request) -> web.Response:
+        return self._page(request, self.org.licenses)
+
+    async def list_locations(self, request: web.Request) -> web.Response:
+        locations = self.org.locations
+        if name := request.query.get('name'):
+            locations = [loc for loc in locations if name.lower() in loc['name'].lower()]
+        if location_id := request.query.get('id'):
+            locations = [loc for loc in locations if loc['id'] == location_id]
+        return self._page(request, locations)
+
+    async def list_numbers(self, request: web.Request) -> web.Response:
+        query = request.query
+        filters: list[Callable[[dict[str, Any]], bool]] = []
+        if location_id := query.get('locationId'):
+            filters.append(lambda n: n['location']['id'] == location_id)
+        if phone_number := query.get('phoneNumber'):
+            filters.append(lambda n: n['phoneNumber'] == phone_number)
+        if extension := query.get('extension'):
+            filters.append(lambda n: n['extension'] == extension)
+        if (available := query.get('available')) is not None:
+            filters.append(lambda n: (n.get('owner') is None) == (available == 'true'))
+        if owner_type := query.get('ownerType'):
+            filters.append(lambda n: n.get('owner', dict()).get('type') == owner_type)
+        if owner_id := query.get('ownerId'):
+            filters.append(lambda n: n.get('owner', dict()).get('id') == owner_id)
+        numbers = [n for n in self.org.numbers if all(f(n) for f in filters)]
+        return self._page(request, numbers, item_key='phoneNumbers')
+
+    async def list_people(self, request: web.Request) -> web.Response:
+        people = self.org.people
+        if email := request.query.get('email'):
+            people = [p for p in people if email.lower() in (e.lower() for e in p['emails'])]
+        if display_name := request.query.get('displayName'):
+            people = [p for p in people if p['displayName'].lower().startswith(display_name.lower())]
+        if id_list := request.query.get('id'):
+            ids = set(id_list.split(','))
+            people = [p for p in people if p['id'] in ids]
+        return self._page(request, people)
+
+    async def person_details(self, request: web.Request) -> web.Response:
+        return web.json_response(self.org.person(request.match_info['person_id']))
+
+    async def create_person(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        emails = data.get('emails') or []
+        if any(email in p['emails'] for email in emails for p in self.org.people):
+            raise web.HTTPConflict(**error_response('User already exists'))
+        person = dict(id=webex_id('PEOPLE'), emails=emails, displayName=data.get('displayName'),
+                      firstName=data.get('firstName'), lastName=data.get('lastName'), orgId=self.org.org_id,
+                      licenses=[lic['id'] for lic in self.org.licenses if not lic['name'].startswith('Webex Calling')],
+                      created=time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()), type='person')
+        self.org.people.append(person)
+        return web.json_response(person)
+
+    async def update_person(self, request: web.Request) -> web.Response:
+        person = self.org.person(request.match_info['person_id'])
+        data = await request.json()
+        location_id = data.get('locationId') or person.get('locationId')
+        location = next((loc for loc in self.org.locations if loc['id'] == location_id), None)
+        # only work numbers are TNs of the org; mobile numbers etc. aren't checked
+        for number in (n for n in data.get('phoneNumbers') or [] if n.get('type') == 'work'):
+            e164 = number['value'] if number['value'].startswith('+') else f'+1{number["value"]}'
+            tn = next((n for n in self.org.numbers if n['phoneNumber'] == e164), None)
+            if tn is None or (tn.get('owner') and tn['owner']['id'] != person['id']):
+                raise web.HTTPBadRequest(**error_response(f'Phone number {e164} is not available'))
+            self._assign(tn, person, data)
+        extension = data.get('extension')
+        if extension and location and not any(n['extension'] == extension and n['location']['id'] == location_id
+                                               for n in self.org.numbers):
+            self._assign(self.org.add_number(location, extension=extension), person, data)
+        self._consume_licenses(set(data.get('licenses') or []) - set(person.get('licenses') or []))
+        person.update((k, v) for k, v in data.items() if k != 'id')
+        return web.json_response(person)
+
+    async def delete_person(self, request: web.Request) -> web.Response:
+        person = self.org.person(request.match_info['person_id'])
+        self.org.people.remove(person)
+        for number in self.org.numbers:
+            if number.get('owner', dict()).get('id') == person['id']:
+                number.pop('owner')
+        return web.Response(status=204)
+
+    async def list_devices(self, request: web.Request) -> web.Response:
+        devices = self.org.devices
+        if person_id := request.query.get('personId'):
+            devices = [d for d in devices if d.get('personId') == person_id]
+        if mac := request.query.get('mac'):
+            devices = [d for d in devices if d['mac'] == mac.upper()]
+        return self._page(request, devices)
+
+    async def create_device(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        mac = (data.get('mac') or '').upper()
+        if any(d['mac'] == mac for d in self.org.devices):
+            raise web.HTTPConflict(**error_response(f'Device with MAC {mac} already exists'))
+        person = self.org.person(data['personId']) if data.get('personId') else None
+        device = dict(id=webex_id('DEVICE'), displayName=data.get('model'), orgId=self.org.org_id,
+                      capabilities=['xapi'], permissions=[], connectionStatus='disconnected',
+                      product=data.get('model'), type='phone', tags=[], mac=mac, sipUrls=[],
+                      created=time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()))
+        if person is not None:
+            device['personId'] = person['id']
+        if data.get('workspaceId'):
+            device['workspaceId'] = data['workspaceId']
+        self.org.devices.append(device)
+        return web.json_response(device)
+
+    @staticmethod
+    def _assign(number: dict[str, Any], person: dict[str, Any], data: dict[str, Any]):
+        number['owner'] = dict(id=person['id'], type='PEOPLE', firstName=data.get('firstName'),
+                               lastName=data.get('lastName'))
+        if data.get('extension'):
+            number['extension'] = data['extension']
+
+    def _consume_licenses(self, license_ids: Iterable[str]):
+        for license_id in license_ids:
+            lic = next((lic for lic in self.org.licenses if lic['id'] == license_id), None)
+            if lic is not None:
+                lic['consumedUnits'] += 1
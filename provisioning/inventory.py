@@ -0,0 +1,247 @@
+"""
+Cached inventory of Webex Calling phone numbers per location.
+
+Provisioning needs the numbers (available TNs and extension owners) of the locations users are provisioned to. Instead
+of pulling all numbers of the org on every run :class:`WebexInventory`
+
+* reads numbers only for the locations needed (server-side filter on the location id),
+* persists the numbers between runs (JSON in ~/.cache/migrationapi/webex_inventory.json; the location can be changed
+  with the WEBEX_INVENTORY_PATH environment variable, an empty value disables persistence),
+* reuses persisted numbers of a location for max_age seconds and re-reads a location once it gets stale,
+* confirms numbers missing in (or assigned according to) a persisted entry with targeted server-side queries before
+  concluding that they are not available; only if many numbers need to be confirmed the location is re-read,
+* records assignments made during provisioning so that the cache stays current without re-reading.
+
+Licenses are not cached: the list is short and the consumed units change with every assignment.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+from pydantic import Field
+from wxc_sdk.as_api import AsWebexSimpleApi
+from wxc_sdk.base import ApiModel
+from wxc_sdk.common import IdAndName
+from wxc_sdk.locations import Location
+from wxc_sdk.telephony import NumberListPhoneNumber, NumberOwner
+
+__all__ = ['LocationNumbers', 'WebexInventory']
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'migrationapi', 'webex_inventory.json')
+
+# default for the time in seconds for which persisted numbers of a location are used
+MAX_AGE = 3600.0
+
+# if more numbers than this need to be confirmed then the location is re-read
+MAX_CONFIRMATIONS = 20
+
+
+class LocationNumbers(ApiModel):
+    """
+    Numbers of one location
+    """
+    location_id: str
+    #: time when the numbers were read (epoch)
+    fetched: float
+    numbers: list[NumberListPhoneNumber] = Field(default_factory=list)
+
+
+class InventoryData(ApiModel):
+    """
+    Persisted inventory: numbers by location id. Location ids are unique across orgs
+    """
+    locations: dict[str, LocationNumbers] = Field(default_factory=dict)
+
+
+class WebexInventory:
+    """
+    Phone numbers of Webex Calling locations read on demand and cached across runs
+    """
+
+    def __init__(self, api: AsWebexSimpleApi, path: Optional[str] = DEFAULT_PATH, max_age: float = MAX_AGE):
+        """
+
+        :param api: API to use
+        :param path: path of the JSON file to persist the inventory; None: no persistence
+        :param max_age: time in seconds persisted numbers of a location are used w/o reading them again
+        """
+        self.api = api
+        self.path = path
+        self.max_age = max_age
+        self._data = self._load()
+        # time when this inventory was created: numbers read after this are considered current
+        self._created = time.time()
+        # indices by location id: numbers by TN and by extension
+        self._by_tn: dict[str, dict[str, NumberListPhoneNumber]] = dict()
+        self._by_extension: dict[str, dict[str, NumberListPhoneNumber]] = dict()
+
+    @classmethod
+    def from_env(cls, api: AsWebexSimpleApi) -> 'WebexInventory':
+        return cls(api, path=os.getenv('WEBEX_INVENTORY_PATH', DEFAULT_PATH) or None,
+                   max_age=float(os.getenv('WEBEX_INVENTORY_MAX_AGE', MAX_AGE)))
+
+    def _load(self) -> InventoryData:
+        if not self.path or not os.path.isfile(self.path):
+            return InventoryData()
+        try:
+            data = InventoryData.parse_file(self.path)
+        except Exception as e:
+            log.warning(f'failed to read Webex inventory from {self.path}: {e}')
+            return InventoryData()
+        log.debug(f'read Webex inventory for {len(data.locations)} locations from {self.path}')
+        return data
+
+    def save(self):
+        """
+        Persist the inventory
+        """
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, mode='w') as f:
+            f.write(self._data.json())
+        os.replace(tmp_path, self.path)
+        log.debug(f'wrote Webex inventory to {self.path}')
+
+    async def location(self, name: str) -> Optional[Location]:
+        """
+        Get a location by name (server-side filtered)
+        """
+        return next((location for location in await self.api.locations.list(name=name)
+                     if location.name == name), None)
+
+    def _index(self, entry: LocationNumbers):
+        self._by_tn[entry.location_id] = {n.phone_number: n for n in entry.numbers if n.phone_number}
+        self._by_extension[entry.location_id] = {n.extension: n for n in entry.numbers if n.extension}
+
+    def _current(self, location_id: str) -> bool:
+        """
+        Numbers of the location were read during this run
+        """
+        entry = self._data.locations.get(location_id)
+        return entry is not None and entry.fetched >= self._created
+
+    async def refresh(self, location_id: str) -> LocationNumbers:
+        """
+        Read all numbers of a location
+        """
+        start = time.perf_counter()
+        numbers = await self.api.telephony.phone_numbers(location_id=location_id)
+        entry = LocationNumbers(location_id=location_id, fetched=time.time(), numbers=numbers)
+        self._data.locations[location_id] = entry
+        self._index(entry)
+        log.info(f'read {len(numbers)} numbers of location {location_id} in {time.perf_counter() - start:.3f}s')
+        return entry
+
+    async def numbers(self, location_id: str) -> list[NumberListPhoneNumber]:
+        """
+        Numbers of a location; from the cache if not older than max_age
+        """
+        entry = self._data.locations.get(location_id)
+        if entry is None or time.time() - entry.fetched > self.max_age:
+            entry = await self.refresh(location_id)
+        elif location_id not in self._by_tn:
+            log.info(f'using {len(entry.numbers)} cached numbers of location {location_id}, '
+                     f'{time.time() - entry.fetched:.0f}s old')
+            self._index(entry)
+        return entry.numbers
+
+    def numbers_cached(self, location_id: str) -> list[NumberListPhoneNumber]:
+        """
+        Numbers of a location from the cache w/o reading stale or missing numbers; see :meth:`numbers`
+        """
+        entry = self._data.locations.get(location_id)
+        return entry.numbers if entry else []
+
+    def number(self, location_id: str, phone_number: str) -> Optional[NumberListPhoneNumber]:
+        """
+        Number entry for a TN from the cache
+        """
+        return self._by_tn.get(location_id, dict()).get(phone_number)
+
+    def extension_owner(self, location_id: str, extension: str) -> Optional[NumberOwner]:
+        """
+        Owner of an extension from the cache
+        """
+        number = self._by_extension.get(location_id, dict()).get(extension)
+        return number and number.owner
+
+    def available_tns(self, location_id: str) -> set[str]:
+        """
+        TNs of a location which are not assigned
+        """
+        return set(tn for tn, number in self._by_tn.get(location_id, dict()).items() if number.owner is None)
+
+    async def confirm_available(self, location_id: str, phone_numbers: Iterable[str]) -> set[str]:
+        """
+        Confirm TNs which according to cached numbers are not available. Numbers read during this run are not
+        confirmed again
+
+        :return: TNs which are available after all
+        """
+        phone_numbers = set(phone_numbers)
+        if not phone_numbers or self._current(location_id):
+            return set()
+        if len(phone_numbers) > MAX_CONFIRMATIONS:
+            await self.refresh(location_id)
+            return phone_numbers & self.available_tns(location_id)
+
+        async def confirm(tn: str) -> Optional[NumberListPhoneNumber]:
+            found = await self.api.telephony.phone_numbers(location_id=location_id, phone_number=tn)
+            return found and found[0] or None
+
+        confirmed = await asyncio.gather(*[confirm(tn) for tn in phone_numbers])
+        available = set()
+        for tn, number in zip(phone_numbers, confirmed):
+            if number is None:
+                continue
+            self._update(location_id, number)
+            if number.owner is None:
+                available.add(tn)
+        log.info(f'confirmed {len(phone_numbers)} numbers of location {location_id}, {len(available)} available')
+        return available
+
+    def _update(self, location_id: str, number: NumberListPhoneNumber):
+        """
+        Add or replace a number in the cache
+        """
+        entry = self._data.locations[location_id]
+        existing = number.phone_number and self._by_tn[location_id].get(number.phone_number) or \
+            number.extension and self._by_extension[location_id].get(number.extension)
+        if existing:
+            entry.numbers[entry.numbers.index(existing)] = number
+        else:
+            entry.numbers.append(number)
+        if number.phone_number:
+            self._by_tn[location_id][number.phone_number] = number
+        if number.extension:
+            self._by_extension[location_id][number.extension] = number
+
+    def assign(self, location_id: str, phone_number: Optional[str], extension: Optional[str], owner: NumberOwner):
+        """
+        Record the assignment of a TN and extension in the cache
+        """
+        entry = self._data.locations.get(location_id)
+        if entry is None:
+            return
+        number = self.number(location_id, phone_number) if phone_number else None
+        if number is None:
+            location = next((n.location for n in entry.numbers), None) or IdAndName(id=location_id, name='')
+            number = NumberListPhoneNumber(phone_number=phone_number, extension=extension, main_number=False,
+                                           toll_free_number=False, location=location, owner=owner)
+        else:
+            number = number.copy(update=dict(extension=extension, owner=owner))
+        self._update(location_id, number)
+
+    def invalidate(self, location_id: str):
+        """
+        Mark cached numbers of a location as stale; they are read again by the next run
+        """
+        if entry := self._data.locations.get(location_id):
+            entry.fetched = 0
@@ -0,0 +1,64 @@
+"""
+Map UCM users to Webex Calling locations.
+
+The location of a user is derived from the phones owned by the user: either the UCM location or the device pool of
+the phones. If a user owns phones in multiple locations the most common one wins. An optional map translates UCM
+location (or device pool) names to Webex location names.
+"""
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from typing import Optional
+
+from ucm_reader import Phone, User
+
+__all__ = ['phone_location', 'user_locations']
+
+log = logging.getLogger(__name__)
+
+
+def phone_location(phone: Phone, source: str = 'location') -> Optional[str]:
+    """
+    UCM location or device pool name of a phone
+
+    :param source: 'location' or 'device_pool'
+    """
+    if source == 'location':
+        ref = phone.locationName
+    elif source == 'device_pool':
+        ref = phone.devicePoolName
+    else:
+        raise ValueError(f'unsupported location source: {source}')
+    return ref and ref.value
+
+
+def user_locations(users: Iterable[User], phones: Iterable[Phone], source: str = 'location',
+                   location_map: dict[str, str] = None) -> dict[str, str]:
+    """
+    Determine the Webex location for UCM users
+
+    :param users: UCM users
+    :param phones: UCM phones
+    :param source: 'location': use the UCM location of the phones, 'device_pool': use the device pool
+    :param location_map: UCM location (or device pool) name -> Webex location name. Names missing in the map are
+        used as is
+    :return: Webex location name by userid; users w/o phones are missing
+    """
+    location_map = location_map or dict()
+    locations_by_owner: dict[str, Counter] = defaultdict(Counter)
+    for phone in phones:
+        owner = phone.ownerUserName and phone.ownerUserName.value
+        if not owner:
+            continue
+        location = phone_location(phone, source)
+        if location:
+            locations_by_owner[owner][location_map.get(location, location)] += 1
+    result = dict()
+    for user in users:
+        locations = locations_by_owner.get(user.userid)
+        if not locations:
+            log.debug(f'{user.userid}: no phone, no location')
+            continue
+        # most common location; on ties the location of the first phone
+        result[user.userid] = locations.most_common(1)[0][0]
+    return result
@@ -0,0 +1,82 @@
+"""
+Instrumentation of Webex API requests sent by wxc_sdk.
+
+Requests are recorded in the metrics registry of ucm_reader so that AXL and Webex metrics end up in the same report:
+
+* webex_requests_total{operation,status}: HTTP requests per operation ("METHOD /path/{id}")
+* webex_request_bytes_total{operation}, webex_response_bytes_total{operation}: bytes sent/received
+* webex_request_seconds{operation}: HTTP latency histogram (time until the response headers are received)
+* webex_request_errors_total{operation,error}: requests failing w/o HTTP response
+* webex_throttled_total{operation}: requests answered with 429
+* webex_retry_after_seconds_total{operation}: sum of Retry-After values in 429 responses
+"""
+import re
+import time
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, TraceConfig
+from yarl import URL
+
+from ucm_reader.metrics import Metrics, metrics
+
+__all__ = ['webex_operation', 'instrument_webex']
+
+# path segments which are IDs: base64 encoded Webex IDs or UUIDs
+ID_SEGMENT = re.compile(r'^([A-Za-z0-9+/_-]{30,}=*|[0-9a-fA-F-]{36})$')
+
+
+def webex_operation(method: str, url: URL) -> str:
+    """
+    Operation label for a Webex API request: method and path with IDs replaced by {id}, for example
+    'PUT /people/{id}'
+    """
+    segments = [('{id}' if ID_SEGMENT.match(segment) else segment)
+                for segment in url.path.split('/') if segment]
+    if segments and segments[0] == 'v1':
+        segments = segments[1:]
+    return f'{method} /{"/".join(segments)}'
+
+
+def instrument_webex(api, registry: Metrics = None):
+    """
+    Record all requests sent by a wxc_sdk API (for example AsWebexSimpleApi)
+
+    :param api: wxc_sdk API object; the requests of the session of that API are recorded
+    :param registry: metrics registry; default: :data:`ucm_reader.metrics.metrics`
+    """
+    registry = registry or metrics
+
+    async def on_request_start(session: ClientSession, ctx: SimpleNamespace, params):
+        ctx.operation = webex_operation(params.method, params.url)
+        ctx.start = time.perf_counter()
+
+    async def on_request_chunk_sent(session: ClientSession, ctx: SimpleNamespace, params):
+        registry.inc('webex_request_bytes_total', len(params.chunk), operation=ctx.operation)
+
+    async def on_request_end(session: ClientSession, ctx: SimpleNamespace, params):
+        status = params.response.status
+        registry.inc('webex_requests_total', operation=ctx.operation, status=status)
+        registry.observe('webex_request_seconds', time.perf_counter() - ctx.start, operation=ctx.operation)
+        if status == 429:
+            registry.inc('webex_throttled_total', operation=ctx.operation)
+            retry_after = params.response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                registry.inc('webex_retry_after_seconds_total', int(retry_after), operation=ctx.operation)
+
+    async def on_response_chunk_received(session: ClientSession, ctx: SimpleNamespace, params):
+        registry.inc('webex_response_bytes_total', len(params.chunk), operation=ctx.operation)
+
+    async def on_request_exception(session: ClientSession, ctx: SimpleNamespace, params):
+        registry.inc('webex_request_errors_total', operation=ctx.operation,
+                     error=params.exception.__class__.__name__)
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.freeze()
+    # wxc_sdk creates the session; trace configs can only be passed to the ClientSession constructor
+    # noinspection PyProtectedMember
+    api.session._trace_configs.append(trace_config)
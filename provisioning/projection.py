@@ -0,0 +1,140 @@
+"""
+Projection of wall time and API calls of a provisioning run.
+
+A dry run computes the provisioning plan (see :mod:`provisioning.diff`) without writing anything. Each task of the plan
+(user to create or update, device to create) is a fixed sequence of Webex API calls. Together with the latency of
+each call (measured in this or a previous run) and the configured concurrency the wall time of the real run can be
+projected:
+
+* total work (sum of latencies of all calls) spread over the workers: work / concurrency
+* work of the busiest scheduling key (location) spread over the workers per key: work(key) / per_key
+* rate limit: calls / rate_limit
+* the longest single task
+
+The projected wall time is the maximum of these bounds.
+"""
+import json
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from typing import NamedTuple, Optional
+
+from ucm_reader.metrics import Metrics
+
+__all__ = ['USER_CALLS', 'DEVICE_CALLS', 'Task', 'Projection', 'latencies_from_metrics', 'load_latencies',
+           'project']
+
+log = logging.getLogger(__name__)
+
+# Webex API calls of the tasks; operation names as in the webex_request_seconds metric
+USER_CALLS = {'create': ('POST /people', 'PUT /people/{id}'),
+              'update': ('PUT /people/{id}',)}
+DEVICE_CALLS = ('GET /devices', 'POST /devices')
+
+# latencies in seconds for calls w/o measurements: ballpark numbers for the Webex APIs
+DEFAULT_LATENCIES = {'POST /people': 1.0,
+                     'PUT /people/{id}': 2.5,
+                     'GET /devices': 0.4,
+                     'POST /devices': 1.0}
+DEFAULT_LATENCY = 0.5
+
+
+class Task(NamedTuple):
+    #: scheduling key (location)
+    key: str
+    #: API calls of the task in the order in which they are sent
+    calls: tuple[str, ...]
+
+
+def latencies_from_metrics(registry: Metrics) -> dict[str, float]:
+    """
+    Mean latency by operation from the webex_request_seconds histograms of a metrics registry
+    """
+    return {dict(labels)['operation']: histogram.sum / histogram.count
+            for labels, histogram in registry.histograms.get('webex_request_seconds', dict()).items()
+            if histogram.count}
+
+
+def load_latencies(path: str) -> dict[str, float]:
+    """
+    Mean latency by operation from a JSON metrics file written by a previous run (METRICS_PATH)
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return {h['labels']['operation']: h['sum'] / h['count']
+            for h in data.get('histograms', []) if h['name'] == 'webex_request_seconds' and h['count']}
+
+
+class Projection:
+    """
+    Projected API calls and wall time of a set of tasks
+    """
+
+    def __init__(self, tasks: Iterable[Task], latencies: dict[str, float] = None):
+        """
+
+        :param tasks: tasks of the run
+        :param latencies: latency in seconds by operation; operations w/o latency use DEFAULT_LATENCIES
+        """
+        self.tasks = list(tasks)
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or dict())}
+        #: number of API calls by operation
+        self.calls = Counter(call for task in self.tasks for call in task.calls)
+        self._durations = [self.duration(task) for task in self.tasks]
+        self._work_by_key: dict[str, float] = defaultdict(float)
+        for task, duration in zip(self.tasks, self._durations):
+            self._work_by_key[task.key] += duration
+
+    def latency(self, operation: str) -> float:
+        return self.latencies.get(operation, DEFAULT_LATENCY)
+
+    def duration(self, task: Task) -> float:
+        return sum(self.latency(call) for call in task.calls)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @property
+    def work(self) -> float:
+        """
+        Sum of the latencies of all calls in seconds
+        """
+        return sum(self._durations)
+
+    def wall_time(self, concurrency: int, per_key: Optional[int] = None, rate_limit: Optional[float] = None) -> float:
+        """
+        Projected wall time in seconds
+
+        :param concurrency: number of concurrent tasks
+        :param per_key: maximum number of concurrent tasks per key
+        :param rate_limit: maximum number of API calls per second
+        """
+        if not self.tasks:
+            return 0.0
+        bounds = [self.work / concurrency, max(self._durations)]
+        if per_key:
+            bounds.append(max(self._work_by_key.values()) / per_key)
+        if rate_limit:
+            bounds.append(self.total_calls / rate_limit)
+        return max(bounds)
+
+    def report(self, concurrency: int, per_key: Optional[int] = None, rate_limit: Optional[float] = None,
+               alternatives: Iterable[int] = (1, 5, 10, 20, 50)) -> list[str]:
+        """
+        Human readable projection: calls by operation and projected wall time for the configured and alternative
+        concurrencies
+        """
+        lines = [f'{len(self.tasks)} tasks, {self.total_calls} API calls, {self.work:.1f}s of API latency']
+        lines.extend(f'  {operation}: {count} calls, {self.latency(operation) * 1000:.0f}ms each'
+                     for operation, count in self.calls.most_common())
+        for n in sorted(set(alternatives) | {concurrency}):
+            wall_time = self.wall_time(n, per_key=per_key, rate_limit=rate_limit)
+            rate = self.total_calls / wall_time if wall_time else 0
+            lines.append(f'{"*" if n == concurrency else " "} concurrency {n:3d}: {wall_time:8.1f}s, '
+                         f'{rate:.1f} calls/s')
+        return lines
+
+
+def project(tasks: Iterable[Task], latencies: dict[str, float] = None) -> Projection:
+    return Projection(tasks, latencies=latencies)
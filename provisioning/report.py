@@ -0,0 +1,236 @@
+"""
+Machine readable report of a provisioning run.
+
+A :class:`RunReport` collects what happened in a run so that waves can be compared and concurrency can be tuned from
+evidence instead of log greps:
+
+* stages: wall time and number of items per stage (reading from UCM, planning, provisioning, ...)
+* outcomes: number of users per outcome (success, skip, fail) and reason, details of skipped and failed users
+* latencies: p50/p95/p99 of timed operations (for example people create/update), exact from all samples
+* Webex requests: number of requests, achieved requests per second in the provisioning stages and throttling (429
+  responses, Retry-After seconds, time spent waiting for the adaptive Webex limit) taken from the metrics registry
+
+    report = RunReport()
+    with report.stage('provision', count=len(plan)):
+        with report.timer('people.create'):
+            person = await api.people.create(settings=settings)
+        report.outcome(user.userid, SUCCESS, 'created')
+    report.write('report.json')
+"""
+import json
+import logging
+import math
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from ucm_reader.metrics import Metrics, metrics
+
+__all__ = ['SUCCESS', 'SKIP', 'FAIL', 'percentile', 'Stage', 'RunReport']
+
+log = logging.getLogger(__name__)
+
+SUCCESS = 'success'
+SKIP = 'skip'
+FAIL = 'fail'
+
+# counters of the metrics registry included in the report and their labels
+WEBEX_COUNTERS = {'webex_requests_total': dict(),
+                  'webex_throttled_total': dict(),
+                  'webex_retry_after_seconds_total': dict(),
+                  'adaptive_throttled_total': dict(target='webex'),
+                  'adaptive_wait_seconds_total': dict(target='webex')}
+
+# the Webex request rate is measured in the stages with this prefix
+PROVISIONING_STAGE = 'provision'
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """
+    Percentile of sorted values with linear interpolation between the closest ranks
+
+    :param values: sorted values
+    :param q: 0..1
+    :return: None if there are no values
+    """
+    if not values:
+        return None
+    rank = q * (len(values) - 1)
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class Stage:
+    """
+    Wall time and number of items of one stage of a run
+    """
+
+    def __init__(self, name: str, count: Optional[int] = None):
+        self.name = name
+        #: number of items processed in the stage; can be set within the block
+        self.count = count
+        self.seconds = 0.0
+        #: number of Webex requests sent in the stage
+        self.requests = 0.0
+
+
+class RunReport:
+    """
+    Stages, outcomes, latencies and Webex request rates of a provisioning run
+    """
+
+    def __init__(self, registry: Metrics = None):
+        """
+
+        :param registry: metrics registry with the Webex request counters; default: :data:`ucm_reader.metrics.metrics`
+        """
+        self.registry = registry or metrics
+        self.started = time.time()
+        self._start = time.perf_counter()
+        # counter values at the start of the run so that the report only covers this run
+        self._counters_at_start = {name: self.registry.counter(name, **labels)
+                                   for name, labels in WEBEX_COUNTERS.items()}
+        self.stages: list[Stage] = []
+        self._stage: Optional[Stage] = None
+        self._stage_start = 0.0
+        self._stage_requests = 0.0
+        self.outcomes: dict[str, Counter] = defaultdict(Counter)
+        #: (key, outcome, reason, detail) of users which were skipped or failed
+        self.details: list[tuple[str, str, str, Optional[str]]] = []
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+
+    def begin(self, name: str, count: Optional[int] = None) -> Stage:
+        """
+        Start a stage; a running stage is ended
+
+        :param count: number of items processed in the stage; can also be set on the stage or with end()
+        """
+        self.end()
+        self._stage = Stage(name, count)
+        self._stage_start = time.perf_counter()
+        self._stage_requests = self.registry.counter('webex_requests_total')
+        return self._stage
+
+    def end(self, count: Optional[int] = None):
+        """
+        End the running stage (if any)
+
+        :param count: number of items processed in the stage
+        """
+        if self._stage is None:
+            return
+        stage, self._stage = self._stage, None
+        stage.seconds = time.perf_counter() - self._stage_start
+        stage.requests = self.registry.counter('webex_requests_total') - self._stage_requests
+        if count is not None:
+            stage.count = count
+        self.stages.append(stage)
+
+    @contextmanager
+    def stage(self, name: str, count: Optional[int] = None) -> Iterator[Stage]:
+        """
+        Record the wall time of a block as a stage, see begin()
+        """
+        stage = self.begin(name, count)
+        try:
+            yield stage
+        finally:
+            if self._stage is stage:
+                self.end()
+
+    @contextmanager
+    def timer(self, operation: str):
+        """
+        Record the latency of an operation, for example 'people.create'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies[operation].append(time.perf_counter() - start)
+
+    def outcome(self, key: str, outcome: str, reason: str, detail: str = None):
+        """
+        Record the outcome for one item (user)
+
+        :param key: item, for example the userid
+        :param outcome: SUCCESS, SKIP or FAIL
+        :param reason: reason (category) to count outcomes by, for example 'created' or 'TN not available'
+        :param detail: details of skipped or failed items, for example the error message
+        """
+        self.outcomes[outcome][reason] += 1
+        if outcome != SUCCESS:
+            self.details.append((key, outcome, reason, detail))
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Report as JSON serializable dictionary; a running stage is included with the time elapsed so far
+        """
+        stages = [dict(name=stage.name, seconds=stage.seconds, count=stage.count, webex_requests=stage.requests)
+                  for stage in self.stages]
+        if self._stage is not None:
+            stages.append(dict(name=self._stage.name, seconds=time.perf_counter() - self._stage_start,
+                               count=self._stage.count,
+                               webex_requests=self.registry.counter('webex_requests_total') - self._stage_requests))
+        wall = time.perf_counter() - self._start
+        counters = {name: self.registry.counter(name, **WEBEX_COUNTERS[name]) - at_start
+                    for name, at_start in self._counters_at_start.items()}
+        provisioning = [stage for stage in stages if stage['name'].startswith(PROVISIONING_STAGE)]
+        provisioning_seconds = sum(stage['seconds'] for stage in provisioning)
+        latencies = dict()
+        for operation, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            latencies[operation] = dict(count=len(values), mean=sum(values) / len(values),
+                                        p50=percentile(values, 0.5), p95=percentile(values, 0.95),
+                                        p99=percentile(values, 0.99), max=values[-1])
+        requests = counters['webex_requests_total']
+        return dict(
+            started=time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started)),
+            wall_seconds=wall,
+            stages=stages,
+            outcomes={outcome: dict(total=sum(reasons.values()), reasons=dict(reasons.most_common()))
+                      for outcome, reasons in sorted(self.outcomes.items())},
+            details=[dict(key=key, outcome=outcome, reason=reason, detail=detail)
+                     for key, outcome, reason, detail in self.details],
+            latencies=latencies,
+            webex=dict(requests=requests,
+                       requests_per_second=(sum(stage['webex_requests'] for stage in provisioning) /
+                                            provisioning_seconds if provisioning_seconds else None),
+                       throttled=counters['webex_throttled_total'],
+                       retry_after_seconds=counters['webex_retry_after_seconds_total'],
+                       limit_throttled=counters['adaptive_throttled_total'],
+                       limit_wait_seconds=counters['adaptive_wait_seconds_total']))
+
+    def summary(self) -> list[str]:
+        """
+        Human readable summary: one line per stage, outcome and timed operation
+        """
+        report = self.as_dict()
+        lines = [f'stage {stage["name"]}: {stage["seconds"]:.3f}s'
+                 + (f', {stage["count"]} items' if stage['count'] is not None else '')
+                 for stage in report['stages']]
+        lines.extend(f'{outcome}: {values["total"]} ('
+                     f'{", ".join(f"{reason}: {count}" for reason, count in values["reasons"].items())})'
+                     for outcome, values in report['outcomes'].items())
+        lines.extend(f'{operation}: {values["count"]} calls, p50 {values["p50"] * 1000:.1f}ms, '
+                     f'p95 {values["p95"] * 1000:.1f}ms, p99 {values["p99"] * 1000:.1f}ms'
+                     for operation, values in report['latencies'].items())
+        webex = report['webex']
+        if webex['requests']:
+            rate = webex['requests_per_second']
+            lines.append(f'webex: {webex["requests"]:g} requests'
+                         + (f', {rate:.1f}/s while provisioning' if rate is not None else '') +
+                         f', {webex["throttled"]:g} throttled, waited {webex["limit_wait_seconds"]:.1f}s for the '
+                         f'limit, Retry-After {webex["retry_after_seconds"]:g}s')
+        return lines
+
+    def write(self, path: str):
+        """
+        Write the report as JSON
+        """
+        with open(path, mode='w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        log.info(f'wrote run report to {path}')
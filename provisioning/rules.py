@@ -0,0 +1,319 @@
+"""
+Declarative rules mapping UCM users to Webex Calling attributes.
+
+The email address, display name, extension and DID of a Webex user and the Webex location name for a UCM location (or
+device pool) are derived from UCM data by rules which can be read from a YAML file, so that sites with different dial
+plans can be mapped w/o code changes:
+
+    extension:
+      # 5 digit extensions in RTP, 4 digits everywhere else
+      - source: telephoneNumber
+        match: '^\\+1919\\d{2}(\\d{5})$'
+        template: '{1}'
+      - source: telephoneNumber
+        match: '(\\S{1,4})\\s*$'
+        template: '{1}'
+
+For each target the first rule which matches wins. A rule has a ``template`` (str.format syntax) and optionally a
+``source`` attribute of the UCM user and a ``match`` regular expression searched in the value of the source attribute.
+Templates can refer to the value of the source attribute ({value}), the groups of the match ({0} for the complete
+match, {1}, ... and named groups), attributes of the UCM user ({firstName}) and constants given when compiling the
+rules ({gmail_id}, {timestamp}). The derived attribute ``e164`` is the telephone number of the user normalized to
+E.164 with the number plan of the rules (see :class:`ucm_reader.numbers.NumberPlan`). Targets missing in a rules file
+use :data:`DEFAULT_RULES`. Location rules are applied to UCM location names ({value}); names w/o matching rule are used
+as is.
+
+Rules are compiled once (regular expressions, templates, attributes to read) and then applied to all users in a
+single pass: :meth:`MappingRules.apply`.
+"""
+import datetime
+import logging
+import re
+import string
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Union
+
+import yaml
+from pydantic import BaseModel
+
+from ucm_reader import User
+from ucm_reader.numbers import NumberPlan
+
+__all__ = ['Rule', 'RuleSet', 'DEFAULT_RULES', 'UserMapping', 'MappingRules', 'load_rules']
+
+log = logging.getLogger(__name__)
+
+
+class Rule(BaseModel):
+    """
+    One mapping rule
+    """
+    #: attribute of the UCM user the rule is applied to
+    source: Optional[str]
+    #: regular expression searched in the source value; None: the rule always matches
+    match: Optional[str]
+    template: str
+
+
+class RuleSet(BaseModel):
+    """
+    Rules per target; content of a rules file
+    """
+    email: Optional[list[Rule]]
+    display_name: Optional[list[Rule]]
+    extension: Optional[list[Rule]]
+    did: Optional[list[Rule]]
+    location: Optional[list[Rule]]
+
+
+# same mapping as the original hardcoded functions in main.py
+DEFAULT_RULES = RuleSet(
+    # dummy email addresses under a GMAIL address; in reality one would use the actual email address of the UCM user
+    email=[Rule(source='mailid', match=r'^(?P<mail_user>[^@]*)', template='{gmail_id}+{mail_user}@gmail.com')],
+    display_name=[Rule(template='{firstName} {lastName}')],
+    # last four digits of the phone number
+    extension=[Rule(source='telephoneNumber', match=r'(\S{1,4})\s*$', template='{1}')],
+    # NANP numbers are 10D on the public API; everything else E.164
+    did=[Rule(source='e164', match=r'^\+1(\d{10})$', template='{1}'),
+         Rule(source='e164', template='{value}')],
+    location=[])
+
+# targets of user rules
+USER_TARGETS = ('email', 'display_name', 'extension', 'did')
+
+# derived attributes -> attribute of the UCM user they are derived from
+DERIVED = {'e164': 'telephoneNumber'}
+
+
+class UserMapping(NamedTuple):
+    """
+    Webex attributes of a UCM user; None if no rule matched
+    """
+    email: Optional[str]
+    display_name: Optional[str]
+    extension: Optional[str]
+    did: Optional[str]
+
+
+def load_rules(path: Union[str, Path]) -> RuleSet:
+    """
+    Read rules from a YAML file
+    """
+    with open(path, mode='r') as f:
+        data = yaml.safe_load(f) or dict()
+    return RuleSet.parse_obj(data)
+
+
+# compiled rule: values of the user -> mapped value or None
+Compiled = Callable[[dict[str, Any]], Optional[str]]
+
+
+def template_fields(template: str) -> set[str]:
+    """
+    Names of the fields referenced in a template
+    """
+    return {name.split('.')[0].split('[')[0]
+            for _, name, _, _ in string.Formatter().parse(template) if name}
+
+
+def bind_constants(template: str, constants: dict[str, Any]) -> str:
+    """
+    Replace references to constants (w/o conversion or format spec) in a template by their values
+    """
+    def escape(text: str) -> str:
+        return text.replace('{', '{{').replace('}', '}}')
+
+    result = []
+    for literal, name, spec, conversion in string.Formatter().parse(template):
+        result.append(escape(literal))
+        if name is None:
+            continue
+        if name in constants and not spec and not conversion:
+            result.append(escape(str(constants[name])))
+        else:
+            result.append(f'{{{name}{"!" + conversion if conversion else ""}{":" + spec if spec else ""}}}')
+    return ''.join(result)
+
+
+class MappingRules:
+    """
+    Compiled mapping rules
+    """
+
+    def __init__(self, rules: RuleSet = None, constants: dict[str, Any] = None, number_plan: NumberPlan = None):
+        """
+
+        :param rules: rules to compile; targets w/o rules use DEFAULT_RULES
+        :param constants: constants for the templates, for example {'gmail_id': 'jdoe'}; 'timestamp' (UTC,
+            %Y%m%d%H) is set at compile time unless given
+        :param number_plan: plan to normalize telephone numbers for the derived attribute 'e164'; default: NANP
+        """
+        rules = rules or DEFAULT_RULES
+        self.constants = {'timestamp': datetime.datetime.utcnow().strftime('%Y%m%d%H'), **(constants or dict())}
+        self.number_plan = number_plan or NumberPlan()
+        #: attributes of the UCM users referenced by the user rules
+        self.attributes: set[str] = set()
+        #: derived attributes referenced by the user rules
+        self.derived: set[str] = set()
+        self._targets: dict[str, Compiled] = dict()
+        for target in (*USER_TARGETS, 'location'):
+            target_rules = getattr(rules, target)
+            if target_rules is None:
+                target_rules = getattr(DEFAULT_RULES, target)
+            self._targets[target] = self._compile(target, target_rules)
+        self._user_targets = [self._targets[target] for target in USER_TARGETS]
+
+    def _compile(self, target: str, rules: list[Rule]) -> Compiled:
+        compiled = []
+        for i, rule in enumerate(rules):
+            try:
+                regex = rule.match and re.compile(rule.match)
+            except re.error as e:
+                raise ValueError(f'{target} rule {i + 1}: invalid regular expression "{rule.match}": {e}')
+            groups = set(regex.groupindex) if regex else set()
+            if clash := groups & (set(self.constants) | set(User.__fields__) | set(DERIVED) | {'value'}):
+                raise ValueError(f'{target} rule {i + 1}: group name(s) {", ".join(sorted(clash))} clash with '
+                                 f'attributes or constants')
+            referenced = template_fields(rule.template) - groups - set(self.constants) - {'value'}
+            if any(field.isdigit() for field in referenced):
+                if regex is None or max(int(f) for f in referenced if f.isdigit()) > regex.groups:
+                    raise ValueError(f'{target} rule {i + 1}: template "{rule.template}" references a group which '
+                                     f'doesn\'t exist')
+                referenced = {field for field in referenced if not field.isdigit()}
+            if target == 'location':
+                if rule.source or referenced:
+                    raise ValueError(f'{target} rule {i + 1}: location rules can only refer to {{value}}')
+            else:
+                attributes = referenced | ({rule.source} if rule.source else set())
+                unknown = attributes - set(User.__fields__) - set(DERIVED)
+                if unknown:
+                    raise ValueError(f'{target} rule {i + 1}: unknown attribute(s) {", ".join(sorted(unknown))}')
+                derived = attributes & set(DERIVED)
+                self.derived.update(derived)
+                self.attributes.update(attributes - derived)
+                self.attributes.update(DERIVED[name] for name in derived)
+            compiled.append(self._compile_rule(rule, regex))
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def apply(values: dict[str, Any]) -> Optional[str]:
+            for f in compiled:
+                if (result := f(values)) is not None:
+                    return result
+            return None
+
+        return apply
+
+    def _compile_rule(self, rule: Rule, regex: Optional[re.Pattern]) -> Compiled:
+        template, source = bind_constants(rule.template, self.constants), rule.source or 'value'
+        fields = template_fields(template)
+        # template is a single field w/o conversion or format spec: no formatting needed
+        single = next(iter(fields)) if len(fields) == 1 and template == f'{{{next(iter(fields))}}}' else None
+        # template w/o fields: escaped braces only
+        literal = template.format() if not fields else None
+        if regex is None:
+            if not fields:
+                return lambda values: literal
+            if single is not None:
+                single = source if single == 'value' else single
+                return lambda values: values.get(single)
+            if 'value' not in fields:
+                return template.format_map
+
+            def apply(values: dict[str, Any]) -> Optional[str]:
+                return template.format_map({**values, 'value': values.get(source)})
+            return apply
+
+        search = regex.search
+        if not fields:
+            def apply(values: dict[str, Any]) -> Optional[str]:
+                value = values.get(source)
+                if value is None or search(value) is None:
+                    return None
+                return literal
+        elif single is not None and (single.isdigit() or single in regex.groupindex):
+            group = int(single) if single.isdigit() else single
+
+            def apply(values: dict[str, Any]) -> Optional[str]:
+                value = values.get(source)
+                if value is None or (m := search(value)) is None:
+                    return None
+                return m.group(group)
+        elif all(field.isdigit() or field in regex.groupindex for field in fields):
+            # only groups of the match
+            def apply(values: dict[str, Any]) -> Optional[str]:
+                value = values.get(source)
+                if value is None or (m := search(value)) is None:
+                    return None
+                return template.format(m.group(0), *m.groups(), **m.groupdict())
+        else:
+            def apply(values: dict[str, Any]) -> Optional[str]:
+                value = values.get(source)
+                if value is None or (m := search(value)) is None:
+                    return None
+                return template.format(m.group(0), *m.groups(), **{**values, 'value': value, **m.groupdict()})
+        return apply
+
+    def user_values(self, user: User) -> dict[str, Any]:
+        """
+        Constants and values of the attributes of a user referenced by the rules
+        """
+        values = user.values(self.attributes)
+        if self.derived:
+            values['e164'] = self.number_plan.normalize(values.get('telephoneNumber'))
+        values.update(self.constants)
+        return values
+
+    def apply(self, users: Iterable[User]) -> list[UserMapping]:
+        """
+        Webex attributes of UCM users
+
+        :return: one mapping per user in the order of the users
+        """
+        attributes = tuple(self.attributes)
+        constants = self.constants
+        email, display_name, extension, did = self._user_targets
+        # w/o the attribute lookup on the instance (AXLObject.__getattribute__)
+        user_values = User.values
+        normalize = self.number_plan.normalize if self.derived else None
+        result = []
+        for user in users:
+            values = user_values(user, attributes)
+            if normalize:
+                values['e164'] = normalize(values.get('telephoneNumber'))
+            values.update(constants)
+            result.append(UserMapping(email(values), display_name(values), extension(values), did(values)))
+        return result
+
+    def map_user(self, user: User) -> UserMapping:
+        """
+        Webex attributes of a single UCM user
+        """
+        values = self.user_values(user)
+        return UserMapping(*(f(values) for f in self._user_targets))
+
+    def email(self, user: User) -> Optional[str]:
+        return self._targets['email'](self.user_values(user))
+
+    def display_name(self, user: User) -> Optional[str]:
+        return self._targets['display_name'](self.user_values(user))
+
+    def extension(self, user: User) -> Optional[str]:
+        return self._targets['extension'](self.user_values(user))
+
+    def did(self, user: User) -> Optional[str]:
+        return self._targets['did'](self.user_values(user))
+
+    def location(self, name: str) -> str:
+        """
+        Webex location name for a UCM location (or device pool) name; the name itself if no rule matches
+        """
+        result = self._targets['location']({**self.constants, 'value': name})
+        return name if result is None else result
+
+    def location_map(self, names: Iterable[str]) -> dict[str, str]:
+        """
+        Webex location names for UCM location (or device pool) names which are mapped to a different name
+        """
+        return {name: mapped for name in set(names) if (mapped := self.location(name)) != name}
@@ -0,0 +1,144 @@
+"""
+Fair scheduling of provisioning jobs across locations.
+
+Jobs are queued per key (for example the Webex location). A fixed number of workers takes jobs round-robin from the
+queues so that all locations make progress at the same rate instead of one location after the other. Optionally the
+number of concurrent jobs per key can be limited and the total number of concurrent jobs can follow an adaptive limit
+(see :mod:`ucm_reader.concurrency`) which is fed with the outcome of the Webex API requests (:func:`adapt_webex`).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from aiohttp import ClientSession, TraceConfig
+
+from ucm_reader.concurrency import AdaptiveLimit
+
+__all__ = ['FairScheduler', 'adapt_webex']
+
+log = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class FairScheduler:
+    """
+    Run jobs from per-key queues with limited concurrency and round-robin scheduling across keys
+    """
+
+    def __init__(self, concurrency: int, per_key: Optional[int] = None, limit: AdaptiveLimit = None):
+        """
+
+        :param concurrency: maximum number of concurrent jobs
+        :param per_key: maximum number of concurrent jobs per key; None: no limit
+        :param limit: adaptive limit for the number of concurrent jobs (up to concurrency)
+        """
+        self.concurrency = concurrency
+        self.per_key = per_key
+        self.limit = limit
+        # job queues by key; order of keys is the round-robin order
+        self._queues: dict[str, deque[tuple[int, Job]]] = dict()
+        self._running: dict[str, int] = dict()
+        self._jobs = 0
+        #: keys in the order in which jobs have been started
+        self.started: list[str] = []
+
+    def add(self, key: str, job: Job):
+        """
+        Queue a job
+
+        :param key: queue key
+        :param job: callable returning an awaitable
+        """
+        self._queues.setdefault(key, deque()).append((self._jobs, job))
+        self._running.setdefault(key, 0)
+        self._jobs += 1
+
+    def __len__(self):
+        return self._jobs
+
+    def _next(self) -> Optional[tuple[str, int, Job]]:
+        """
+        Take the next job: first key in round-robin order with queued jobs and capacity. The key is moved to the end
+        """
+        for key, queue in self._queues.items():
+            if queue and (self.per_key is None or self._running[key] < self.per_key):
+                index, job = queue.popleft()
+                # move key to the end of the round-robin order
+                self._queues[key] = self._queues.pop(key)
+                return key, index, job
+        return None
+
+    async def run(self, return_exceptions: bool = False) -> list[Any]:
+        """
+        Run all queued jobs
+
+        :param return_exceptions: return exceptions as results instead of raising the first exception
+        :return: results in the order in which the jobs have been added
+        """
+        results: list[Any] = [None] * self._jobs
+        changed = asyncio.Condition()
+
+        async def worker():
+            while True:
+                async with changed:
+                    while (scheduled := self._next()) is None:
+                        if not any(self._queues.values()):
+                            return
+                        # all keys with queued jobs are at their limit: wait for a job to finish
+                        await changed.wait()
+                    key, index, job = scheduled
+                    self._running[key] += 1
+                    self.started.append(key)
+                try:
+                    async with self.limit.aslot() if self.limit else nullcontext():
+                        results[index] = await job()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[index] = e
+                finally:
+                    async with changed:
+                        self._running[key] -= 1
+                        changed.notify_all()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, self._jobs) or 1)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return results
+
+
+def adapt_webex(api, limit: AdaptiveLimit):
+    """
+    Feed the outcome of all requests sent by a wxc_sdk API (for example AsWebexSimpleApi) to an adaptive limit:
+    429 and 503 responses lower the limit (and delay new jobs by Retry-After), other responses raise it
+
+    :param api: wxc_sdk API object
+    :param limit: adaptive limit, for example the limit of a :class:`FairScheduler`
+    """
+
+    async def on_request_start(session: ClientSession, ctx: SimpleNamespace, params):
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session: ClientSession, ctx: SimpleNamespace, params):
+        status = params.response.status
+        if status in (429, 503):
+            retry_after = params.response.headers.get('Retry-After')
+            limit.on_throttle(retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        elif status < 500:
+            limit.on_success(time.perf_counter() - ctx.start)
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.freeze()
+    # noinspection PyProtectedMember
+    api.session._trace_configs.append(trace_config)
@@ -2,14 +2,25 @@
 """
 Read learned patterns from remoteroutingpattern table from UCMs configured in YML config and write to CSV for further
 processing
+
+Patterns are streamed from UCM through the expansion (:func:`normalize`) and the duplicate detection
+(:func:`unique_patterns`) to the CSV file so that memory stays bounded for very large learned catalogs: keys of
+patterns already written are kept in memory up to a limit and then spill to an on-disk set (:class:`SpillingSet`).
+Patterns which would expand to more than ``--max-expansion`` patterns are skipped and reported as well as route
+strings with more patterns than a Webex dial plan can hold.
 """
 import csv
 import logging
 import os
 import re
+import sqlite3
 import sys
+import tempfile
+from argparse import ArgumentParser, Namespace
+from collections import Counter
 from collections.abc import Iterable, Generator
-from itertools import chain
+from itertools import chain, product
+from math import prod
 from typing import Optional
 
 import yaml
@@ -17,6 +28,12 @@ from pydantic import BaseModel, Field, parse_obj_as
 
 from ucmaxl import AXLHelper
 
+from migrationapi import add_gdpr_arguments
+from ucm_reader.metrics import instrument_axl, metrics
+from ucm_reader.profiling import instrument_profiling, profiler
+from ucm_reader.retry import sql_query
+from ucm_reader.wsdl import axl_helper
+
 
 class LearnedPattern(BaseModel):
     """
@@ -43,59 +60,170 @@ class RcKey(BaseModel):
     rc_catalog_peer_id: str = Field(alias='remoteclusteruricatalog_peerid')
 
 
-def unique_patterns(patterns: Iterable[LearnedPattern]) -> Generator[LearnedPattern, None, None]:
+# maximum number of patterns a single learned pattern may expand to
+MAX_EXPANSION = 1000
+
+# maximum number of dial patterns in a Webex dial plan; learned patterns are provisioned per route string
+WEBEX_MAX_DIAL_PATTERNS = 10000
+
+# number of pattern keys kept in memory by unique_patterns() before spilling to disk
+MAX_KEYS_IN_MEMORY = 1000000
+
+
+class SpillingSet:
+    """
+    Set of strings which is kept in memory up to a maximum number of keys; beyond that the keys spill to an SQLite
+    database in a temporary file
+    """
+
+    def __init__(self, max_keys: int = MAX_KEYS_IN_MEMORY, directory: str = None):
+        """
+
+        :param max_keys: maximum number of keys kept in memory
+        :param directory: directory for the temporary database; default: system temp directory
+        """
+        self.max_keys = max_keys
+        self.directory = directory
+        self._keys: set[str] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self._path: Optional[str] = None
+        self._spilled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._keys) + self._spilled
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._keys:
+            return True
+        return self._db is not None and \
+            self._db.execute('select 1 from spilled where key = ?', (key,)).fetchone() is not None
+
+    @property
+    def spilled(self) -> bool:
+        return self._db is not None
+
+    def add(self, key: str) -> bool:
+        """
+        Add a key
+
+        :return: True if the key was not in the set
+        """
+        if key in self:
+            return False
+        self._keys.add(key)
+        if len(self._keys) >= self.max_keys:
+            self._spill()
+        return True
+
+    def _spill(self):
+        if self._db is None:
+            fd, self._path = tempfile.mkstemp(suffix='.sqlite', prefix='read_gdpr', dir=self.directory)
+            os.close(fd)
+            self._db = sqlite3.connect(self._path)
+            self._db.execute('pragma journal_mode = off')
+            self._db.execute('pragma synchronous = off')
+            self._db.execute('create table spilled (key text primary key) without rowid')
+            logging.info(f'more than {self.max_keys} unique patterns, spilling to {self._path}')
+        with self._db:
+            self._db.executemany('insert into spilled values (?)', ((key,) for key in self._keys))
+        self._spilled += len(self._keys)
+        self._keys.clear()
+
+    def close(self):
+        """
+        Drop all keys and remove the temporary database
+        """
+        self._keys.clear()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.unlink(self._path)
+        self._spilled = 0
+
+
+def unique_patterns(patterns: Iterable[LearnedPattern], max_keys: int = MAX_KEYS_IN_MEMORY,
+                    directory: str = None) -> Generator[LearnedPattern, None, None]:
     """
-    Filter out duplicate patterns
+    Filter out duplicate patterns; the first occurrence of each pattern is yielded
     :param patterns:
+    :param max_keys: maximum number of pattern keys kept in memory, see SpillingSet
+    :param directory: directory for spilled keys; default: system temp directory
     :return:
     """
-    pattern_keys = set()
-    for pattern in patterns:
-        key = f'{pattern.route_string}:{pattern.pattern}'
-        if key in pattern_keys:
-            continue
-        pattern_keys.add(key)
-        yield pattern
+    with SpillingSet(max_keys=max_keys, directory=directory) as pattern_keys:
+        for pattern in patterns:
+            if pattern_keys.add(f'{pattern.route_string}:{pattern.pattern}'):
+                yield pattern
+
 
+# [..] enumerations in a pattern
+ENUMERATION = re.compile(r'(\[.+?])')
 
-def normalize(patterns: Iterable[LearnedPattern]) -> Generator[LearnedPattern, None, None]:
+
+def expansion(pattern: str) -> tuple[list[str], list[list[str]]]:
+    """
+    Literal parts and the digits matched by each [..] enumeration of a pattern
+
+    :return: literal parts (one more than enumerations) and digits per enumeration
+    """
+    parts = ENUMERATION.split(pattern)
+    digits = []
+    for enumeration in parts[1::2]:
+        digit_matcher = re.compile(enumeration)
+        digits.append([d for d in '0123456789' if digit_matcher.match(d)])
+    return parts[::2], digits
+
+
+def normalize(patterns: Iterable[LearnedPattern], max_expansion: Optional[int] = None,
+              oversized: list[tuple[LearnedPattern, int]] = None) -> Generator[LearnedPattern, None, None]:
     """
     Normalize learned patterns to make them compatible with WxC.
     WxC dial plans only have "X" as wildcard. We look for [] enumerations and expand them
 
     :param patterns:
+    :param max_expansion: skip patterns which would expand to more than this many patterns; None: no limit
+    :param oversized: skipped patterns with the number of patterns they would expand to are appended to this list
     :return:
     """
-    # regex to catch patterns with [..] in it
-    catch_re = re.compile(r"""(?P<pre>.*?)          # any characters (non greedy) until ...
-                              (?P<re_part>\[.+?])   # "[” followed by any characters(non greedy) until "]"
-                              (?P<post>.*)          # and whatever might come after that enumeration""",
-                          flags=re.VERBOSE)
     for learned_pattern in patterns:
         pattern = learned_pattern.pattern
         if any(c in pattern for c in '.*!'):
             print(f'illegal pattern format: {pattern}', file=sys.stderr)
             continue
-        if m := catch_re.match(pattern):
-            # get pre, regex, post
-            pre = m.group('pre')
-            re_part = m.group('re_part')
-            post = m.group('post')
-            # determine digits matched by the reqex in the pattern and yield normalized patterns
-            digit_matcher = re.compile(re_part)
-            matching_digits = (d for d in '0123456789'
-                               if digit_matcher.match(d))
-            logging.debug(f'expanding "{pattern}"')
-            for d in matching_digits:
-                expanded = f'{pre}{d}{post}'
-                logging.debug(f' {expanded}')
-                expanded_learned = learned_pattern.copy(deep=True)
-                expanded_learned.pattern = expanded
-                # recursive call to make sure we catch patterns with multiple enumeration in it
-                yield from normalize([expanded_learned])
-        else:
+        literals, digits = expansion(pattern)
+        if not digits:
             # nothing to do, just yield the pattern
             yield learned_pattern
+            continue
+        # the size is known before expanding anything
+        count = prod(len(d) for d in digits)
+        if max_expansion is not None and count > max_expansion:
+            logging.warning(f'"{pattern}" ({learned_pattern.route_string}) would expand to {count} patterns, '
+                            f'skipped')
+            if oversized is not None:
+                oversized.append((learned_pattern, count))
+            continue
+        logging.debug(f'expanding "{pattern}" to {count} patterns')
+        # expand one combination of digits at a time; the leftmost enumeration varies slowest
+        for combination in product(*digits):
+            expanded = ''.join(chain.from_iterable(zip(literals, combination))) + literals[-1]
+            yield learned_pattern.copy(update=dict(pattern=expanded))
+
+
+def count_by_route_string(patterns: Iterable[LearnedPattern],
+                          counts: Counter) -> Generator[LearnedPattern, None, None]:
+    """
+    Count patterns per route string while passing them through
+    """
+    for pattern in patterns:
+        counts[pattern.route_string] += 1
+        yield pattern
 
 
 def learned_patterns(axl: AXLHelper, with_numbers: bool = False) -> list[LearnedPattern]:
@@ -121,9 +249,12 @@ def learned_patterns(axl: AXLHelper, with_numbers: bool = False) -> list[Learned
     if with_numbers:
         usage.extend((23, 24))
     usage = f'({",".join(str(u) for u in usage)})'
-    patterns = axl.sql_query(
-        f'select remotecatalogkey_id,pattern from remoteroutingpattern where tkpatternusage in {usage}')
-    return parse_obj_as(list[LearnedPattern], patterns)
+    with profiler.span('fetch'):
+        patterns = sql_query(
+            axl,
+            f'select remotecatalogkey_id,pattern from remoteroutingpattern where tkpatternusage in {usage}')
+    with profiler.span('validate'):
+        return parse_obj_as(list[LearnedPattern], patterns)
 
 
 def read_from_ucm(*, axl_host: str, axl_user: str, axl_password: str) -> list[LearnedPattern]:
@@ -131,15 +262,19 @@ def read_from_ucm(*, axl_host: str, axl_user: str, axl_password: str) -> list[Le
     Read learned patterns from UCM using thin AXL.
     """
     print(f'Reading from UCM "{axl_host}"...')
-    axl = AXLHelper(ucm_host=axl_host, auth=(axl_user, axl_password), verify=False)
+    # the parsed WSDL is shared by all clusters
+    axl = axl_helper(ucm_host=axl_host, auth=(axl_user, axl_password), verify=False)
+    instrument_axl(axl.service)
+    instrument_profiling(axl.service)
 
-    remote_catalogs = parse_obj_as(list[RemoteCatalog],
-                                   axl.sql_query('select peerid,routestring from remoteclusteruricatalog'))
+    with profiler.span('fetch'):
+        catalog_rows = sql_query(axl, 'select peerid,routestring from remoteclusteruricatalog')
+        key_rows = sql_query(axl, 'select remotecatalogkey_id,remoteclusteruricatalog_peerid from remotecatalogkey')
+    with profiler.span('validate'):
+        remote_catalogs = parse_obj_as(list[RemoteCatalog], catalog_rows)
+        rc_keys = parse_obj_as(list[RcKey], key_rows)
     rc_by_peer_id: dict[str, RemoteCatalog] = {rc.peer_id: rc for rc in remote_catalogs}
 
-    rc_keys = parse_obj_as(
-        list[RcKey],
-        axl.sql_query('select remotecatalogkey_id,remoteclusteruricatalog_peerid from remotecatalogkey'))
     route_string_by_catalog_key: dict[str, str] = {rc.rc_key_id: rc_by_peer_id[rc.rc_catalog_peer_id].route_string
                                                    for rc in rc_keys}
 
@@ -151,6 +286,23 @@ def read_from_ucm(*, axl_host: str, axl_user: str, axl_password: str) -> list[Le
     return learned
 
 
+def write_csv(patterns: Iterable[LearnedPattern], csv_path: str) -> int:
+    """
+    Write patterns to CSV file with route string column
+    :param patterns: patterns to write
+    :param csv_path: path of the CSV file
+    :return: number of patterns written
+    """
+    written = 0
+    with open(csv_path, mode='w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(('route_string', 'pattern'))
+        for csv_pattern in patterns:
+            writer.writerow((csv_pattern.route_string, csv_pattern.pattern))
+            written += 1
+    return written
+
+
 class UCMInfo(BaseModel):
     """
     Information for one AXL target
@@ -173,31 +325,62 @@ def ucm_info_from_yml() -> list[UCMInfo]:
     return hosts
 
 
-if __name__ == '__main__':
+def main(args: Namespace = None):
+    """
+    :param args: parsed arguments (see migrationapi.add_gdpr_arguments); default: parse command line
+    """
     logging.basicConfig(level=logging.INFO)
     logging.getLogger('zeep.wsdl.wsdl').setLevel(logging.INFO)
     logging.getLogger('zeep.xsd.schema').setLevel(logging.INFO)
 
+    if args is None:
+        parser = ArgumentParser(description='Read learned patterns from UCM and write them to CSV')
+        add_gdpr_arguments(parser)
+        args = parser.parse_args()
+    profiler.configure(args)
+
     # get UCM information from YML file
     ucm_infos = ucm_info_from_yml()
 
     # get learned patterns from all configured UCMs
     # - expand patterns to make sure they are compatible with WxC dial plans
     # - only consider unique patterns (there might me catalogs that are read from multiple clusters)
-    ucm_learned_patterns = list(unique_patterns(
-        normalize(
-            chain.from_iterable(
-                read_from_ucm(axl_host=ucm_info.host,
-                              axl_user=ucm_info.user,
-                              axl_password=ucm_info.password)
-                for ucm_info in ucm_infos))))
-
-    # write patterns to file with route string column
+    # - write patterns to file with route string column
+    # (reading and writing is done lazily while transforming; the profile has separate spans for reading, expanded
+    # patterns are never all held in memory)
     csv_path = os.path.abspath(f'{os.path.splitext(__file__)[0]}.csv')
     print(f'Writing patterns to "{csv_path}"')
-    with open(csv_path, mode='w', newline='') as output:
-        writer = csv.writer(output)
-        writer.writerow(('route_string', 'pattern'))
-        for csv_pattern in ucm_learned_patterns:
-            writer.writerow((csv_pattern.route_string, csv_pattern.pattern))
-    print(f'Wrote {len(ucm_learned_patterns)} patterns to {csv_path}')
+    oversized: list[tuple[LearnedPattern, int]] = []
+    per_route_string = Counter()
+    max_expansion = getattr(args, 'max_expansion', None) or MAX_EXPANSION
+    with profiler.span('transform'):
+        written = write_csv(
+            count_by_route_string(
+                unique_patterns(
+                    normalize(
+                        chain.from_iterable(
+                            read_from_ucm(axl_host=ucm_info.host,
+                                          axl_user=ucm_info.user,
+                                          axl_password=ucm_info.password)
+                            for ucm_info in ucm_infos),
+                        max_expansion=max_expansion, oversized=oversized),
+                    max_keys=getattr(args, 'max_keys', None) or MAX_KEYS_IN_MEMORY),
+                per_route_string),
+            csv_path)
+    print(f'Wrote {written} patterns to {csv_path}')
+
+    # patterns which couldn't be provisioned as is
+    for pattern, count in oversized:
+        print(f'skipped "{pattern.pattern}" ({pattern.route_string}): would expand to {count} patterns '
+              f'(max {max_expansion})', file=sys.stderr)
+    for route_string, count in sorted(per_route_string.items()):
+        if count > WEBEX_MAX_DIAL_PATTERNS:
+            print(f'route string {route_string}: {count} patterns exceed the maximum of {WEBEX_MAX_DIAL_PATTERNS} '
+                  f'dial patterns of a Webex dial plan', file=sys.stderr)
+    if metrics_path := os.getenv('METRICS_PATH'):
+        metrics.write(metrics_path)
+    profiler.stop()
+
+
+if __name__ == '__main__':
+    main()
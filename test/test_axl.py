@@ -1,5 +1,5 @@
 import os
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
 from dotenv import load_dotenv
 
@@ -13,13 +13,16 @@ def clean_none(data):
         return data
 
 
+# read .env from parent directory
+load_dotenv(os.path.abspath(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '.env')))
+
+
+@skipUnless(os.getenv('AXL_HOST'), 'live test: needs AXL_HOST, AXL_USER and AXL_PASSWORD; see test_read_path.py for '
+                                   'tests against recorded exchanges')
 class TestPhone(TestCase):
 
     @classmethod
     def setUpClass(cls) -> None:
-        # read .env from parent directory
-        path = os.path.abspath(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '.env'))
-        load_dotenv(path)
         cls.axl = AXLHelper(ucm_host=os.getenv('AXL_HOST'),
                             auth=(os.getenv('AXL_USER'), os.getenv('AXL_PASSWORD')),
                             verify=False)
@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from ucm_reader import UCMInventory, UCMReader
+from ucm_reader.base import SHARD_ALPHABET
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestChanges(TestCase):
+
+    def test_incremental_refresh(self):
+        cluster = SyntheticCluster(users=200)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, track_changes=True) as ucm:
+                users = ucm.user.list(fields=['userid', 'mailid'])
+                phones = ucm.phone.list()
+                first_user, removed_phone = users[0], phones[5]
+                added = cluster.add('user')
+                cluster.update('user', cluster.users[0]['uuid'], mailid='new@example.com')
+                # title hasn't been read: no get required
+                cluster.update('user', cluster.users[1]['uuid'], title='Manager')
+                cluster.remove('phone', removed_phone.uuid)
+                for i in range(150):
+                    cluster.update('phone', cluster.phones[0]['uuid'], description=f'change {i}')
+                requests = dict(server.requests)
+                changed = ucm.refresh()
+                self.assertEqual({'user': 2, 'phone': 2, 'location': 0}, changed)
+                # lists and objects are patched in place
+                self.assertIs(users, ucm.user.list(fields=['userid', 'mailid']))
+                self.assertIs(first_user, users[0])
+                self.assertEqual('new@example.com', users[0].mailid)
+                self.assertEqual(added['userid'], users[-1].userid)
+                self.assertNotIn(removed_phone.uuid, {phone.uuid for phone in phones})
+                self.assertEqual('change 149', phones[0].description)
+                self.assertEqual(2, server.requests['getUser'] - requests.get('getUser', 0))
+                self.assertEqual(1, server.requests['getPhone'] - requests.get('getPhone', 0))
+                # 150 phone changes don't fit into one listChange response
+                self.assertEqual(2, server.requests['listChange'] - requests['listChange'])
+                self.assertEqual(requests['listUser'], server.requests['listUser'])
+
+    def test_lost_position(self):
+        cluster = SyntheticCluster(users=50)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, track_changes=True) as ucm:
+                inventory = UCMInventory(ucm)
+                self.assertEqual(50, len(inventory.users_by_id))
+                cluster.add('user')
+                # UCM restarted: new change queue
+                cluster.change_queue_id = '{NEW-QUEUE}'
+                inventory.refresh(incremental=True)
+                self.assertEqual(2, server.requests['listUser'])
+                self.assertEqual(51, len(inventory.users_by_id))
+                locations = inventory.locations_by_name
+                cluster.update('user', cluster.users[0]['uuid'], mailid='new@example.com')
+                inventory.refresh(incremental=True)
+                self.assertEqual('new@example.com', inventory.user(cluster.users[0]['userid']).mailid)
+                self.assertEqual(2, server.requests['listUser'])
+                # indexes on types w/o changes are kept
+                self.assertIs(locations, inventory.locations_by_name)
+
+    def test_reload_sharded(self):
+        cluster = SyntheticCluster(users=200)
+        with FakeAXLServer(cluster, max_response_bytes=5000) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = ucm.user.list(fields=['userid'], sharded=True)
+                cluster.add('user')
+                requests = server.requests['listUser']
+                self.assertEqual({'user': 201, 'phone': 0, 'location': 0}, ucm.refresh())
+                self.assertEqual(201, len(users))
+                # the list is read again with prefix searches (at least one per character), not with a search for '%'
+                self.assertGreater(server.requests['listUser'] - requests, len(SHARD_ALPHABET))
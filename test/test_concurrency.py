@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_api import AsWebexSimpleApi
+from wxc_sdk.as_rest import AsRestSession
+
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.scheduler import FairScheduler, adapt_webex
+from ucm_reader import UCMReader
+from ucm_reader.concurrency import AdaptiveLimit
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import Metrics, metrics
+from ucm_reader.retry import RetryPolicy
+
+
+class TestAdaptiveLimit(TestCase):
+
+    def test_increase(self):
+        limit = AdaptiveLimit('test', initial=2, maximum=4, registry=Metrics())
+        # no increase while the limit is not used
+        limit.on_success(0.1)
+        self.assertEqual(2, limit.limit)
+        with limit.slot(), limit.slot():
+            for _ in range(10):
+                limit.on_success(0.1)
+            # no increase while the latency is high
+            limit._limit = 2.0
+            limit.on_success(1.0)
+            self.assertEqual(2, limit.limit)
+            for _ in range(3):
+                limit.on_success(0.1)
+        self.assertEqual(3, limit.limit)
+        limit._limit = 3.9
+        with limit.slot(), limit.slot(), limit.slot():
+            limit.on_success(0.1)
+        self.assertEqual(4, limit.limit)
+
+    def test_decrease(self):
+        registry = Metrics()
+        limit = AdaptiveLimit('test', initial=16, cooldown=10, registry=registry)
+        limit.on_throttle()
+        self.assertEqual(8, limit.limit)
+        # same window: only counted once
+        limit.on_throttle()
+        self.assertEqual(8, limit.limit)
+        self.assertEqual(2, registry.counter('adaptive_throttled_total', target='test'))
+        limit._last_decrease -= 10
+        for _ in range(5):
+            limit.on_throttle()
+            limit._last_decrease -= 10
+        self.assertEqual(1, limit.limit)
+
+    def test_retry_after(self):
+        registry = Metrics()
+        limit = AdaptiveLimit('test', registry=registry)
+        limit.on_throttle(retry_after=0.2)
+        start = time.monotonic()
+        with limit.slot():
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertGreaterEqual(registry.counter('adaptive_wait_seconds_total', target='test'), 0.15)
+        limit.on_throttle(retry_after=10)
+        with self.assertRaises(TimeoutError):
+            with limit.slot(timeout=0.1):
+                pass
+
+    def test_axl_throttle(self):
+        cluster = SyntheticCluster(users=10, phones=200)
+        with FakeAXLServer(cluster, max_concurrent=2, latency=0.02) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=8,
+                           retry=RetryPolicy(attempts=50, base=0.01)) as ucm:
+                phones = list(ucm.phone.list())
+                limit = ucm._pool.limit
+                self.assertEqual(8, limit.limit)
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    list(executor.map(lambda phone: phone.read_details(), phones))
+        self.assertTrue(server.throttled)
+        # throttled requests have been retried
+        self.assertEqual(len(phones) + server.throttled, server.requests['getPhone'])
+        self.assertLess(limit.limit, 8)
+        self.assertLess(metrics.gauge('adaptive_limit', target='axl'), 8)
+
+    def test_webex_throttle(self):
+        async def run():
+            async with FakeWebexServer(WebexOrg(), rate_limit=20) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url):
+                    async with AsWebexSimpleApi(tokens='token', concurrent_requests=50) as api:
+                        limit = AdaptiveLimit('webex', initial=20, registry=Metrics())
+                        adapt_webex(api, limit)
+                        scheduler = FairScheduler(concurrency=50, limit=limit)
+                        for i in range(60):
+                            scheduler.add(str(i % 3), lambda: api.people.list(display_name='xyz'))
+                        await scheduler.run()
+                return limit, webex.throttled
+
+        limit, throttled = asyncio.run(run())
+        self.assertTrue(throttled)
+        self.assertLess(limit.limit, 20)
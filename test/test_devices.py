@@ -0,0 +1,84 @@
+import asyncio
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_rest import AsRestSession
+
+import main
+from provisioning.devices import phone_owners, webex_mac
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.mapping import user_locations
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestDevices(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=20)
+
+    def test_details_batches(self):
+        # latency so that concurrent requests overlap on the server
+        with FakeAXLServer(self.cluster, latency=0.05) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=4) as ucm:
+                phones = ucm.phone.list()
+                detailed = list(ucm.phone.details(batch_size=8))
+                # details are not read again
+                self.assertTrue(all(phone.lines for phone in phones))
+        self.assertEqual([p.name for p in phones], [p.name for p in detailed])
+        self.assertEqual(len(phones), server.requests['getPhone'])
+        # getPhone requests are sent concurrently on the 4 sessions of the pool
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 4)
+
+    def test_phone_owners(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = ucm.user.list()
+                phones = ucm.phone.list()
+                # phone w/o owner: joined by the end user associated with the line
+                phones[0].ownerUserName = None
+                # phone owned by a user who isn't in the wave: not joined by the end user on the line
+                phones[1].ownerUserName = phones[15].ownerUserName
+                skipped = []
+                owners = list(phone_owners(ucm.phone.details(), users[:10], skipped=skipped))
+        self.assertEqual([(phone.name, user.userid) for phone, user in owners],
+                         [(phones[i].name, users[i].userid) for i in range(10) if i != 1])
+        self.assertEqual([(phones[1].name, 'owner not in wave')] +
+                         [(phones[i].name, 'owner not in wave') for i in range(10, 20)],
+                         [(phone.name, reason) for phone, reason in skipped])
+        self.assertEqual(self.cluster.phones[0]['name'][3:], webex_mac(owners[0].phone))
+
+    def test_device_provisioning(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                phones = ucm.phone.list()
+                locations = user_locations(users, phones)
+                owners = list(phone_owners(ucm.phone.details(), users))
+
+        async def run():
+            async with FakeWebexServer(WebexOrg.for_cluster(self.cluster)) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', GMAIL_ID='test'), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    person_ids = dict()
+                    await main.user_provisioning(users=users, user_locations=locations, person_ids=person_ids)
+                    webex.requests.clear()
+                    # owners are taken from the user provisioning: no lookup of people
+                    await main.device_provisioning(owners=owners, user_locations=locations, person_ids=person_ids)
+                    first = dict(webex.requests)
+                    # 2nd run: devices exist already; people are read once
+                    await main.device_provisioning(owners=owners, user_locations=locations)
+                    emails = {user.userid: main.webex_email(user=user) for user in users}
+            return webex, emails, first
+
+        webex, emails, first = asyncio.run(run())
+        people = {person['emails'][0]: person['id'] for person in webex.org.people}
+        self.assertNotIn('GET /v1/people', first)
+        self.assertEqual(1, webex.requests['GET /v1/people'])
+        self.assertEqual(len(owners), webex.requests['POST /v1/devices'])
+        self.assertEqual({(webex_mac(phone), people[emails[user.userid]]) for phone, user in owners},
+                         {(device['mac'], device['personId']) for device in webex.org.devices})
@@ -0,0 +1,147 @@
+import asyncio
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_rest import AsRestSession
+from wxc_sdk.common import IdAndName
+from wxc_sdk.people import Person, PhoneNumber, PhoneNumberType
+from wxc_sdk.telephony import NumberListPhoneNumber, NumberOwner, OwnerType
+
+import main
+from provisioning.diff import Action, DesiredUser, diff, summary, with_work_number
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.mapping import user_locations
+from ucm_reader import User, UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.numbers import NumberPlan
+
+LOCATION = 'L1'
+CALLING = 'calling'
+
+
+def desired(i: int) -> DesiredUser:
+    user = User(userid=f'user{i}', uuid=str(i), mailid=f'user{i}@example.com')
+    return DesiredUser(user=user, email=f'User{i}@example.com', phone_number=f'+1408555{i:04d}',
+                       extension=f'{i:04d}', location_id=LOCATION)
+
+
+def number(i: int, owner_id: str = None) -> NumberListPhoneNumber:
+    owner = owner_id and NumberOwner(owner_id=owner_id, owner_type=OwnerType.people)
+    return NumberListPhoneNumber(phone_number=f'+1408555{i:04d}', extension=owner and f'{i:04d}',
+                                 main_number=False, toll_free_number=False,
+                                 location=IdAndName(id=LOCATION, name='Location 1'), owner=owner)
+
+
+def person(i: int, **kwargs) -> Person:
+    return Person(person_id=f'p{i}', emails=[f'user{i}@example.com'], **kwargs)
+
+
+class TestDiff(TestCase):
+
+    def test_plan(self):
+        users = [desired(i) for i in range(6)]
+        people = [
+            # 1: exists w/o calling
+            person(1, licenses=['messaging']),
+            # 2: up to date
+            person(2, licenses=[CALLING], location_id=LOCATION, extension='0002',
+                   phone_numbers=[PhoneNumber(number_type=PhoneNumberType.work, value='4085550002')]),
+            # 3: only the extension differs
+            person(3, licenses=[CALLING], location_id=LOCATION, extension='9999',
+                   phone_numbers=[PhoneNumber(number_type=PhoneNumberType.work, value='+14085550003')]),
+            person(9)]
+        numbers = [number(0), number(1), number(2, owner_id='p2'), number(3, owner_id='p3'),
+                   # TN of user 4 is assigned to somebody else; TN of user 5 doesn't exist
+                   number(4, owner_id='p9')]
+        plan = diff(users, people, numbers={LOCATION: numbers}, calling_license_ids=[CALLING],
+                    number_plan=NumberPlan())
+        self.assertEqual([u.user.userid for u in users], [e.desired.user.userid for e in plan])
+        self.assertEqual([Action.create, Action.update, Action.skip, Action.update, Action.skip, Action.skip],
+                         [e.action for e in plan])
+        self.assertEqual(('location_id', 'licenses', 'extension', 'phone_numbers'), plan[1].changes)
+        self.assertEqual('up to date', plan[2].reason)
+        self.assertEqual(('extension',), plan[3].changes)
+        self.assertEqual(['+14085550004', '+14085550005'], [e.unavailable_tn for e in plan[4:]])
+        self.assertEqual({Action.create: 1, Action.update: 2, Action.skip: 3}, summary(plan))
+
+    def test_number_plan(self):
+        # numbers of people are normalized with the number plan; no +1 for numbers in national format
+        user = User(userid='user1', uuid='1', mailid='user1@example.com')
+        d = DesiredUser(user=user, email='user1@example.com', phone_number='+496100773976', extension='3976',
+                        location_id=LOCATION)
+        tn = NumberListPhoneNumber(phone_number='+496100773976', extension='3976', main_number=False,
+                                   toll_free_number=False, location=IdAndName(id=LOCATION, name='Location 1'),
+                                   owner=NumberOwner(owner_id='p1', owner_type=OwnerType.people))
+        people = [person(1, licenses=[CALLING], location_id=LOCATION, extension='3976',
+                         phone_numbers=[PhoneNumber(number_type=PhoneNumberType.work, value='06100 773976')])]
+        plan = diff([d], people, numbers={LOCATION: [tn]}, calling_license_ids=[CALLING],
+                    number_plan=NumberPlan(country_code='49'))
+        self.assertEqual('up to date', plan[0].reason)
+        plan = diff([d], people, numbers={LOCATION: [tn]}, calling_license_ids=[CALLING],
+                    number_plan=NumberPlan(country_code='1'))
+        self.assertEqual(('phone_numbers',), plan[0].changes)
+
+    def test_incremental(self):
+        cluster = SyntheticCluster(users=20)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                locations = user_locations(users, ucm.phone.list())
+
+        async def run():
+            async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', GMAIL_ID='test'), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    await main.user_provisioning(users=users[:10], user_locations=locations)
+                    first = dict(webex.requests)
+                    webex.requests.clear()
+                    # 2nd wave: only the new users are touched
+                    await main.user_provisioning(users=users, user_locations=locations)
+            return first, webex.requests
+
+        first, second = asyncio.run(run())
+        self.assertEqual(10, first['POST /v1/people'])
+        self.assertEqual(len(users) - 10, second['POST /v1/people'])
+        self.assertEqual(len(users) - 10, second['PUT /v1/people/{person_id}'])
+        self.assertEqual(1, second['GET /v1/people'])
+
+    def test_with_work_number(self):
+        mobile = PhoneNumber(number_type=PhoneNumberType.mobile, value='+14155550100')
+        work = PhoneNumber(number_type=PhoneNumberType.work, value='+14085559999')
+        primary = PhoneNumber(number_type=PhoneNumberType.work, value='+14085558888', primary=True)
+        self.assertEqual([('mobile', '+14155550100'), ('work', '+14085550001')],
+                         [(n.number_type, n.value) for n in with_work_number([mobile], '+14085550001')])
+        self.assertEqual([('mobile', '+14155550100'), ('work', '+14085559999'), ('work', '+14085550001')],
+                         [(n.number_type, n.value) for n in with_work_number([mobile, work, primary], '+14085550001')])
+
+    def test_update_keeps_numbers(self):
+        cluster = SyntheticCluster(users=5)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                locations = user_locations(users, ucm.phone.list())
+        org = WebexOrg.for_cluster(cluster)
+
+        async def run():
+            async with FakeWebexServer(org) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', GMAIL_ID='test'), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    await main.user_provisioning(users=users, user_locations=locations)
+                    person = org.people[0]
+                    tn = person['phoneNumbers'][0]['value']
+                    # person got a mobile number and another work number; display name changed in Webex
+                    person['phoneNumbers'] = [dict(type='mobile', value='+14155550100'),
+                                              dict(type='work', value='+14155550101')]
+                    person['displayName'] = 'Changed in Webex'
+                    webex.requests.clear()
+                    await main.user_provisioning(users=users, user_locations=locations)
+            return person, tn, webex.requests
+
+        person, tn, requests = asyncio.run(run())
+        self.assertEqual(1, requests['PUT /v1/people/{person_id}'])
+        self.assertEqual([('mobile', '+14155550100'), ('work', tn)],
+                         [(n['type'], n['value']) for n in person['phoneNumbers']])
+        self.assertEqual('Changed in Webex', person['displayName'])
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+import zeep.exceptions
+from ucmaxl import AXLHelper
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.retry import RetryPolicy
+
+
+class TestFakeAXL(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=500)
+        # small response limit to force paged list calls
+        cls.server = FakeAXLServer(cls.cluster, max_response_bytes=100000).start()
+        cls.ucm = UCMReader(host='ucm', user='axl', password='secret', address=cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.ucm.close()
+        cls.server.close()
+
+    def test_list_user(self):
+        users = self.ucm.user.list(refresh=True)
+        self.assertEqual(len(self.cluster.users), len(users))
+        self.assertEqual(len(users), len(set(user.uuid for user in users)))
+
+    def test_list_phone_paged(self):
+        requests = self.server.requests.get('listPhone', 0)
+        phones = self.ucm.phone.list(refresh=True)
+        self.assertEqual([p['name'] for p in self.cluster.phones], [p.name for p in phones])
+        # 1st request fails with 'Query request too large' and then we need at least two pages
+        self.assertGreater(self.server.requests['listPhone'] - requests, 2)
+
+    def test_phone_details(self):
+        phone = self.ucm.phone.list()[1]
+        self.assertEqual(1, len(phone.lines.line))
+        self.assertEqual(phone.ownerUserName.value, phone.lines.line[0].associatedEndusers.enduser[0].userId)
+
+    def test_list_location(self):
+        locations = self.ucm.location.list()
+        self.assertEqual([loc['name'] for loc in self.cluster.locations], [loc.name for loc in locations])
+
+    def test_sql_query(self):
+        axl = self.server.bind(AXLHelper(ucm_host='ucm', auth=('axl', 'secret'), verify=False))
+        rows = axl.sql_query('select remotecatalogkey_id,pattern from remoteroutingpattern '
+                             'where tkpatternusage in (25,26)')
+        self.assertEqual(len(self.cluster.tables['remoteroutingpattern']), len(rows))
+        self.assertEqual({'remotecatalogkey_id', 'pattern'}, set(rows[0]))
+
+    def test_throttling(self):
+        with FakeAXLServer(self.cluster, max_concurrent=0) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url,
+                           retry=RetryPolicy(attempts=3, base=0.001)) as ucm:
+                with self.assertRaises(zeep.exceptions.Fault) as context:
+                    ucm.location.list()
+        self.assertIn('busy', context.exception.message)
+        # throttled requests are retried
+        self.assertEqual(3, server.throttled)
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from ucm_reader import UCMReader, User
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import metrics
+
+
+class TestFields(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=300)
+
+    def test_list_tags(self):
+        self.assertEqual(['userid', 'mailid', 'uuid'], User.list_tags(['mailid', 'userid']))
+        with self.assertRaises(ValueError):
+            # requires a get
+            User.list_tags(['convertUserAccount'])
+
+    def test_smaller_responses(self):
+        def read(fields=None) -> tuple[int, int]:
+            metrics.reset()
+            with FakeAXLServer(self.cluster, max_response_bytes=50000) as server:
+                with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                    users = ucm.user.list(fields=fields)
+            self.assertEqual(len(self.cluster.users), len(users))
+            return server.requests['listUser'], metrics.counter('axl_response_bytes_total', operation='listUser')
+
+        all_requests, all_bytes = read()
+        requests, response_bytes = read(fields=['userid', 'mailid'])
+        # fewer, bigger pages and less data
+        self.assertLess(requests, all_requests)
+        self.assertLess(response_bytes, all_bytes / 2)
+
+    def test_partial_objects(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                phones = ucm.phone.list(fields=['name', 'ownerUserName'])
+                phone = phones[0]
+                self.assertTrue(phone.ownerUserName.value)
+                self.assertNotIn('getPhone', server.requests)
+                # attribute not read by the list call: read with a get
+                self.assertTrue(phone.devicePoolName.value)
+                self.assertTrue(phone.lines)
+                self.assertEqual(1, server.requests['getPhone'])
+                # cached list is reused for a subset of the fields ...
+                self.assertIs(phones, ucm.phone.list(fields=['name']))
+                # ... but not for other fields
+                self.assertIsNot(phones, ucm.phone.list())
+                self.assertIs(ucm.phone.list(), ucm.phone.list(fields=['model']))
@@ -0,0 +1,42 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from read_gdpr import LearnedPattern, SpillingSet, normalize, unique_patterns
+
+
+def learned(pattern: str, route_string: str = 'a.example.com') -> LearnedPattern:
+    return LearnedPattern(remotecatalogkey_id='1', route_string=route_string, pattern=pattern)
+
+
+class TestGdpr(TestCase):
+
+    def test_expansion(self):
+        patterns = [p.pattern for p in normalize([learned('+1408[1-2]5[05]XX'), learned('+14085551234'),
+                                                   learned('8[^0-8]X'), learned('8[1-2]X.')])]
+        self.assertEqual(['+1408150XX', '+1408155XX', '+1408250XX', '+1408255XX', '+14085551234', '89X'], patterns)
+
+    def test_max_expansion(self):
+        oversized = []
+        patterns = list(normalize([learned('+1408[1-2]XX'), learned('+1[2-9][0-9][0-9]XXXXXXX')],
+                                  max_expansion=100, oversized=oversized))
+        self.assertEqual(['+14081XX', '+14082XX'], [p.pattern for p in patterns])
+        self.assertEqual([('+1[2-9][0-9][0-9]XXXXXXX', 800)], [(p.pattern, count) for p, count in oversized])
+
+    def test_spilling_set(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with SpillingSet(max_keys=10, directory=directory) as keys:
+                self.assertTrue(all(keys.add(str(i)) for i in range(25)))
+                self.assertTrue(keys.spilled)
+                self.assertEqual(1, len(os.listdir(directory)))
+                self.assertFalse(any(keys.add(str(i)) for i in range(25)))
+                self.assertIn('3', keys)
+                self.assertNotIn('25', keys)
+                self.assertEqual(25, len(keys))
+            self.assertEqual([], os.listdir(directory))
+
+    def test_unique_patterns(self):
+        patterns = [learned(f'+1408555{i % 30:04d}', route_string=f'r{i % 2}') for i in range(120)]
+        unique = list(unique_patterns(patterns, max_keys=7))
+        # first occurrences in the original order
+        self.assertEqual(patterns[:30], unique)
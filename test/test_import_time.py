@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+# repository root: working directory for the scripts
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time budget for the command line entry point in seconds
+IMPORT_BUDGET = 0.1
+
+# modules which should only be imported by the subcommands which need them
+HEAVY = ('zeep', 'wxc_sdk', 'pydantic', 'ucmaxl', 'requests', 'lxml', 'aiohttp')
+
+
+def import_times(*args: str) -> dict[str, int]:
+    """
+    Run Python with -X importtime and return the cumulative import time in microseconds per module
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line.split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(TestCase):
+
+    def test_entry_point(self):
+        times = import_times('-c', 'import migrationapi')
+        self.assertLess(times['migrationapi'] / 1000000, IMPORT_BUDGET)
+        self.assertFalse([m for m in times if m.split('.')[0] in HEAVY])
+
+    def test_help(self):
+        for command in ('provision', 'gdpr', 'export'):
+            with self.subTest(command=command):
+                times = import_times('migrationapi.py', command, '--help')
+                self.assertFalse([m for m in times if m.split('.')[0] in HEAVY])
+
+    def test_ucm_reader_lazy(self):
+        times = import_times('-c', 'import ucm_reader, ucm_reader.profiling')
+        self.assertFalse([m for m in times if m.split('.')[0] in HEAVY])
+        times = import_times('-c', 'from ucm_reader import UCMReader')
+        self.assertIn('zeep', times)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_api import AsWebexSimpleApi
+from wxc_sdk.as_rest import AsRestSession
+from wxc_sdk.telephony import NumberOwner, OwnerType
+
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.inventory import WebexInventory
+from ucm_reader.fake_axl import SyntheticCluster
+
+NUMBERS = 'GET /v1/telephony/config/numbers'
+
+
+class TestInventory(TestCase):
+
+    def setUp(self) -> None:
+        self.org = WebexOrg.for_cluster(SyntheticCluster(users=100))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'inventory.json')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def run_with_api(self, test, **kwargs):
+        async def run():
+            async with FakeWebexServer(self.org) as server:
+                with patch.object(AsRestSession, 'BASE', server.url):
+                    async with AsWebexSimpleApi(tokens='token') as api:
+                        await test(WebexInventory(api, path=self.path, **kwargs))
+            return server
+
+        return asyncio.run(run())
+
+    def test_persisted(self):
+        location = self.org.locations[0]
+        location_numbers = [n for n in self.org.numbers if n['location']['id'] == location['id']]
+
+        async def first(inventory: WebexInventory):
+            self.assertEqual(location['id'], (await inventory.location(location['name'])).location_id)
+            numbers = await inventory.numbers(location['id'])
+            self.assertEqual(len(location_numbers), len(numbers))
+            inventory.assign(location['id'], phone_number=location_numbers[0]['phoneNumber'], extension='1000',
+                             owner=NumberOwner(owner_id='p1', owner_type=OwnerType.people))
+            inventory.save()
+
+        server = self.run_with_api(first)
+        # only the numbers of the location have been read
+        self.assertEqual(1, server.requests[NUMBERS])
+
+        async def second(inventory: WebexInventory):
+            await inventory.numbers(location['id'])
+            self.assertEqual('p1', inventory.extension_owner(location['id'], '1000').owner_id)
+            self.assertEqual(len(location_numbers) - 1, len(inventory.available_tns(location['id'])))
+
+        server = self.run_with_api(second)
+        self.assertNotIn(NUMBERS, server.requests)
+
+        # stale entries are read again
+        async def stale(inventory: WebexInventory):
+            await inventory.numbers(location['id'])
+            self.assertIsNone(inventory.extension_owner(location['id'], '1000'))
+
+        server = self.run_with_api(stale, max_age=0)
+        self.assertEqual(1, server.requests[NUMBERS])
+
+    def test_confirm_available(self):
+        location = self.org.locations[0]
+
+        async def first(inventory: WebexInventory):
+            await inventory.numbers(location['id'])
+            inventory.save()
+
+        self.run_with_api(first)
+        # numbers added after the inventory has been persisted
+        added = [self.org.add_number(location, phone_number=f'+1408555{i:04d}')['phoneNumber'] for i in range(3)]
+
+        async def second(inventory: WebexInventory):
+            await inventory.numbers(location['id'])
+            self.assertFalse(set(added) & inventory.available_tns(location['id']))
+            confirmed = await inventory.confirm_available(location['id'], added + ['+14089999999'])
+            self.assertEqual(set(added), confirmed)
+            self.assertTrue(set(added) <= inventory.available_tns(location['id']))
+
+        server = self.run_with_api(second)
+        # one targeted request per number to confirm
+        self.assertEqual(4, server.requests[NUMBERS])
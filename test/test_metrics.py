@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import Histogram, Metrics, metrics
+
+
+class TestHistogram(TestCase):
+
+    def test_quantile(self):
+        histogram = Histogram(buckets=(1.0, 2.0, 3.0))
+        for value in (0.5, 1.5, 1.5, 2.5):
+            histogram.observe(value)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(6.0, histogram.sum)
+        self.assertEqual(1.5, histogram.quantile(0.5))
+        self.assertEqual([(1.0, 1), (2.0, 3), (3.0, 4)], list(histogram.cumulative())[:3])
+
+
+class TestMetrics(TestCase):
+
+    def test_prometheus(self):
+        registry = Metrics()
+        registry.inc('requests_total', operation='listUser', status=200)
+        registry.inc('requests_total', 2, operation='listPhone', status=200)
+        registry.observe('request_seconds', 0.2, operation='listUser')
+        text = registry.prometheus()
+        self.assertIn('requests_total{operation="listPhone",status="200"} 2', text)
+        self.assertIn('request_seconds_bucket{operation="listUser",le="0.25"} 1', text)
+        self.assertIn('request_seconds_count{operation="listUser"} 1', text)
+        self.assertEqual(3, registry.counter('requests_total'))
+        self.assertEqual(2, registry.counter('requests_total', operation='listPhone'))
+
+    def test_label_escaping(self):
+        registry = Metrics()
+        registry.inc('errors_total', error='Fault: "Item" not\nvalid C:\\axl')
+        self.assertIn('errors_total{error="Fault: \\"Item\\" not\\nvalid C:\\\\axl"} 1', registry.prometheus())
+
+    def test_axl_instrumentation(self):
+        metrics.reset()
+        with FakeAXLServer(SyntheticCluster(users=200), max_response_bytes=20000) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                ucm.user.list()
+        self.assertEqual(server.requests['listUser'], metrics.counter('axl_requests_total', operation='listUser'))
+        self.assertEqual(1, metrics.counter('axl_paged_retries_total', operation='listUser'))
+        self.assertEqual(200, metrics.counter('axl_objects_total', type='user'))
+        self.assertGreater(metrics.counter('axl_response_bytes_total', operation='listUser'), 0)
+        self.assertEqual(1, metrics.counter('axl_operation_errors_total', operation='listUser'))
@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from ucm_reader import UCMInventory, UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.numbers import COUNTRY_CODES, NumberPlan, apply_mask, country_code, index_numbers
+
+
+class TestNumbers(TestCase):
+
+    def test_country_codes(self):
+        # prefix free: at most one country code per number
+        for code in COUNTRY_CODES:
+            self.assertFalse(any(code[:i] in COUNTRY_CODES for i in range(1, len(code))), code)
+        self.assertEqual('1', country_code('14085551234'))
+        self.assertEqual('49', country_code('4961007739764'))
+        self.assertEqual('353', country_code('35312345678'))
+        self.assertIsNone(country_code('2'))
+
+    def test_nanp(self):
+        plan = NumberPlan(site_prefixes={'SJC': '+1408555'})
+        for number in ('+14085551234', '\\+14085551234', '4085551234', '14085551234', '(408) 555-1234',
+                       '+1 408.555.1234', '01114085551234'):
+            with self.subTest(number=number):
+                self.assertEqual('+14085551234', plan.normalize(number))
+        self.assertEqual('+14085551234', plan.normalize('1234', site='SJC'))
+        self.assertEqual('+4961007739764', plan.normalize('011 49 6100 7739764'))
+        for number in (None, '', '1234', '408555123', 'sip:jdoe@example.com', '+2123'):
+            with self.subTest(number=number):
+                self.assertIsNone(plan.normalize(number))
+        self.assertIsNone(plan.normalize('1234', site='RTP'))
+
+    def test_national_prefix(self):
+        plan = NumberPlan(country_code='49')
+        for number in ('+4961007739764', '0049 6100 7739764', '06100 7739764'):
+            with self.subTest(number=number):
+                self.assertEqual('+4961007739764', plan.normalize(number))
+        self.assertIsNone(plan.normalize('61007739764'))
+        self.assertEqual('+390612345678', NumberPlan(country_code='39').normalize('0612345678'))
+        with self.assertRaises(ValueError):
+            NumberPlan(country_code='999')
+
+    def test_mask(self):
+        self.assertEqual('+14085551234', apply_mask('1234', '+1408555XXXX'))
+        self.assertEqual('+14085550000', apply_mask('1234', '+14085550000'))
+        self.assertIsNone(apply_mask('12', '+1408555XXXX'))
+        self.assertIsNone(apply_mask('1234', None))
+
+    def test_index(self):
+        plan = NumberPlan()
+        users = [dict(tn='+14085551234', ext='\\+14085551234'), dict(tn='4085551234', ext=None),
+                 dict(tn='+19195550000', ext='5550000')]
+        index = index_numbers(users, lambda u: (u['tn'], u['ext']), plan)
+        self.assertEqual({'+14085551234': users[:2], '+19195550000': users[2:]}, index)
+
+    def test_inventory(self):
+        cluster = SyntheticCluster(users=100)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                inventory = UCMInventory(ucm)
+                user = cluster.users[7]
+                tn = user['telephoneNumber']
+                found = inventory.users_with_number(tn[2:])
+                self.assertEqual([user['userid']], [u.userid for u in found])
+                self.assertEqual(server.requests['listUser'], 1)
+                phones = inventory.phones_with_number(f'{tn[:2]} ({tn[2:5]}) {tn[5:8]}-{tn[8:]}')
+                self.assertTrue(phones)
+                self.assertEqual(phones, inventory.phones_with_dn(f'\\{tn}', 'DN'))
+                self.assertEqual([], inventory.users_with_number('1234'))
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+def values(objects) -> list[dict]:
+    return [{k: v for k, v in o.dict().items() if not k.startswith('_')} for o in objects]
+
+
+class TestParsing(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=300)
+
+    def read(self, **kwargs) -> tuple[list, list, list, dict]:
+        with FakeAXLServer(self.cluster, max_response_bytes=50000) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, **kwargs) as ucm:
+                if ucm._parser is not None:
+                    # parse all responses in the worker processes
+                    ucm._parser.min_bytes = 0
+                phones = ucm.phone.list(fields=['name', 'ownerUserName'])
+                # partial objects read details on demand
+                self.assertTrue(phones[0].lines)
+                return ucm.user.list(), phones, ucm.location.list(), server.requests
+
+    def test_same_objects(self):
+        users, phones, locations, _ = self.read()
+        p_users, p_phones, p_locations, requests = self.read(parse_processes=2)
+        self.assertEqual(values(users), values(p_users))
+        self.assertEqual(values(phones), values(p_phones))
+        self.assertEqual(values(locations), values(p_locations))
+        # 'Query request too large' faults are raised for raw responses as well
+        self.assertGreater(requests['listUser'], 2)
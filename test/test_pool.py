@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import Metrics, instrument_axl
+from ucm_reader.pool import AXLSessionPool
+
+
+class TestPool(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=20)
+
+    def test_keep_alive(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=2) as ucm:
+                for _ in range(5):
+                    ucm.location.list(refresh=True)
+        # all requests on the same connection
+        self.assertEqual(5, server.requests['listLocation'])
+        self.assertEqual(1, server.connections)
+
+    def test_no_keep_alive(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, keep_alive=False) as ucm:
+                for _ in range(3):
+                    ucm.location.list(refresh=True)
+        self.assertEqual(3, server.connections)
+
+    def test_parallel(self):
+        latency = 0.1
+        with FakeAXLServer(self.cluster, latency=latency) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=4) as ucm:
+                phones = ucm.phone.list()
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=4) as pool:
+                    lines = list(pool.map(lambda phone: phone.lines, phones[:8]))
+                elapsed = time.perf_counter() - start
+        self.assertTrue(all(lines))
+        # 8 getPhone requests on 4 sessions in parallel
+        self.assertLess(elapsed, 4 * latency)
+        self.assertLessEqual(server.connections, 4)
+
+    def test_gzip_and_instrumentation(self):
+        registry = Metrics()
+        with FakeAXLServer(self.cluster, gzip=True) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                instrument_axl(ucm._axl.service, registry)
+                # sessions of a pool copy the hooks of the template session
+                with AXLSessionPool(ucm._axl.service, size=1) as pool, pool.service() as service:
+                    response = service['listLocation'](searchCriteria={'name': '%'}, returnedTags={'name': ''})
+        self.assertEqual(len(self.cluster.locations), len(response['return']['location']))
+        self.assertEqual(1, registry.counter('axl_requests_total', operation='listLocation'))
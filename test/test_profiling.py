@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.profiling import Profiler, profiler
+
+
+class TestProfiler(TestCase):
+
+    def test_exclusive_time(self):
+        p = Profiler()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.folded')
+            p.start(path)
+            with p.span('transform'):
+                time.sleep(0.02)
+                with p.span('fetch'):
+                    # spans left open within a span are closed with the enclosing span
+                    p.begin('parse')
+                    time.sleep(0.02)
+            p.stop()
+            with open(path) as f:
+                lines = dict(line.rsplit(' ', 1) for line in f.read().splitlines())
+        self.assertEqual({'transform', 'transform;fetch', 'transform;fetch;parse'}, set(lines))
+        self.assertGreaterEqual(int(lines['transform']), 20000)
+        self.assertLess(int(lines['transform']), 40000)
+        self.assertLess(int(lines['transform;fetch']), 10000)
+        self.assertGreaterEqual(int(lines['transform;fetch;parse']), 20000)
+
+    def test_disabled(self):
+        p = Profiler()
+        with p.span('fetch'):
+            p.begin('parse')
+        self.assertFalse(p.spans)
+
+    def test_sampling(self):
+        p = Profiler()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.folded')
+            p.start(path, interval=0.001)
+            with p.span('transform'):
+                deadline = time.perf_counter() + 0.1
+                while time.perf_counter() < deadline:
+                    pass
+            p.stop()
+            with open(os.path.join(tmp, 'profile.samples.folded')) as f:
+                lines = f.read().splitlines()
+        sampled = [line for line in lines if line.startswith('transform;') and 'test_sampling' in line]
+        self.assertTrue(sampled)
+
+    def test_ucm_reader_phases(self):
+        with FakeAXLServer(SyntheticCluster(users=50)) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                with tempfile.TemporaryDirectory() as tmp:
+                    profiler.start(os.path.join(tmp, 'profile.folded'))
+                    try:
+                        ucm.user.list()
+                    finally:
+                        profiler.stop()
+        self.assertEqual({('fetch',), ('fetch', 'parse'), ('serialize',), ('validate',)}, set(profiler.spans))
+
+    def test_nested_outside_span(self):
+        p = Profiler()
+        with tempfile.TemporaryDirectory() as tmp:
+            p.start(os.path.join(tmp, 'profile.folded'))
+            # e.g. a SOAP response parsed outside of a 'fetch' span
+            for _ in range(3):
+                p.begin_nested('parse')
+            with p.span('fetch'):
+                p.begin_nested('parse')
+                self.assertEqual(1, len(p._stacks))
+            # no stacks are kept for threads w/o open spans
+            self.assertEqual({}, p._stacks)
+            p.stop()
+        self.assertEqual({('fetch',), ('fetch', 'parse')}, set(p.spans))
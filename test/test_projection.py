@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_rest import AsRestSession
+
+import main
+from provisioning.devices import phone_owners
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.mapping import user_locations
+from provisioning.projection import Projection, Task, load_latencies
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import Metrics
+
+
+class TestProjection(TestCase):
+
+    def test_wall_time(self):
+        latencies = {'A': 1.0, 'B': 2.0}
+        tasks = [Task(key='L1', calls=('A', 'B'))] * 8 + [Task(key='L2', calls=('A',))] * 4
+        projection = Projection(tasks, latencies=latencies)
+        self.assertEqual(28.0, projection.work)
+        self.assertEqual(dict(A=12, B=8), projection.calls)
+        # work spread over the workers
+        self.assertEqual(7.0, projection.wall_time(concurrency=4))
+        # limited by the busiest location: 24s of work on 2 workers
+        self.assertEqual(12.0, projection.wall_time(concurrency=10, per_key=2))
+        # limited by the rate limit: 20 calls at 1/s
+        self.assertEqual(20.0, projection.wall_time(concurrency=10, rate_limit=1))
+        # can't be faster than the longest task
+        self.assertEqual(3.0, projection.wall_time(concurrency=100))
+
+    def test_load_latencies(self):
+        registry = Metrics()
+        registry.observe('webex_request_seconds', 0.2, operation='PUT /people/{id}')
+        registry.observe('webex_request_seconds', 0.4, operation='PUT /people/{id}')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.json')
+            registry.write(path)
+            with open(path) as f:
+                self.assertTrue(json.load(f))
+            self.assertAlmostEqual(0.3, load_latencies(path)['PUT /people/{id}'])
+
+    def test_dry_run(self):
+        cluster = SyntheticCluster(users=30)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                phones = ucm.phone.list()
+                locations = user_locations(users, phones)
+                owners = list(phone_owners(ucm.phone.details(), users))
+
+        async def run(dry_run: bool):
+            async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', GMAIL_ID='test'), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    person_ids = dict()
+                    plan = await main.user_provisioning(users=users, user_locations=locations, dry_run=dry_run,
+                                                        person_ids=person_ids)
+                    if not dry_run:
+                        await main.device_provisioning(owners=owners, user_locations=locations,
+                                                       person_ids=person_ids)
+            return plan, webex.requests
+
+        plan, requests = asyncio.run(run(dry_run=True))
+        self.assertFalse([r for r in requests if not r.startswith('GET')])
+        projection = Projection(main.plan_tasks(plan=plan, owners=owners, user_locations=locations))
+
+        # projected calls match the calls of the real run
+        _, requests = asyncio.run(run(dry_run=False))
+        self.assertEqual(projection.calls['POST /people'], requests['POST /v1/people'])
+        self.assertEqual(projection.calls['PUT /people/{id}'], requests['PUT /v1/people/{person_id}'])
+        # devices of users from the user provisioning: one device lookup and one create per device
+        self.assertNotIn('GET /people', projection.calls)
+        self.assertEqual(len(owners), projection.calls['GET /devices'])
+        self.assertEqual(len(owners), projection.calls['POST /devices'])
+        self.assertEqual(projection.calls['GET /devices'], requests['GET /v1/devices'])
+        self.assertEqual(projection.calls['POST /devices'], requests['POST /v1/devices'])
@@ -0,0 +1,126 @@
+"""
+Read path of ucm_reader against recorded AXL exchanges.
+
+The exchanges are recorded once per module through a RecordingProxy in front of a fake AXL server with a synthetic
+cluster (same as recording a real UCM) and then replayed; the tests are independent of each other and can run in
+parallel (pytest -n auto). READ_PATH_USERS sets the size of the cluster.
+"""
+import os
+import tempfile
+from unittest import TestCase
+
+import zeep.exceptions
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.recording import Cassette, RecordingProxy
+
+USERS = int(os.getenv('READ_PATH_USERS', '500'))
+
+# response limit to force 'Query request too large' faults and a few pages for the complete list of phones
+MAX_RESPONSE_BYTES = USERS * 500
+
+USER_FIELDS = ['userid', 'mailid', 'telephoneNumber']
+PHONE_FIELDS = ['name', 'model', 'ownerUserName', 'locationName']
+
+cluster: SyntheticCluster
+directory: tempfile.TemporaryDirectory
+
+
+def exercise(ucm: UCMReader):
+    """
+    All reads of the tests; recorded once
+    """
+    ucm.user.list()
+    ucm.user.list(refresh=True, fields=USER_FIELDS)
+    ucm.user.list(refresh=True, search={'lastName': 'S%'})
+    phones = ucm.phone.list()
+    ucm.phone.list(refresh=True, fields=PHONE_FIELDS)
+    list(ucm.phone.details(phones[:20]))
+    ucm.location.list()
+
+
+def setUpModule():
+    global cluster, directory
+    cluster = SyntheticCluster(users=USERS)
+    directory = tempfile.TemporaryDirectory()
+    with FakeAXLServer(cluster, max_response_bytes=MAX_RESPONSE_BYTES) as server, \
+            RecordingProxy(server.url, Cassette(directory.name)) as proxy:
+        with UCMReader(host='ucm', user='axl', password='secret', address=proxy.url) as ucm:
+            exercise(ucm)
+
+
+def tearDownModule():
+    directory.cleanup()
+
+
+class ReplayTest(TestCase):
+    """
+    Reader on a server replaying the recorded exchanges; the synthetic cluster of the server is empty
+    """
+
+    def setUp(self) -> None:
+        self.server = FakeAXLServer(SyntheticCluster(users=0, locations=0), cassette=Cassette(directory.name)).start()
+        self.ucm = UCMReader(host='ucm', user='axl', password='secret', address=self.server.url)
+
+    def tearDown(self) -> None:
+        self.ucm.close()
+        self.server.close()
+
+
+class TestUserApi(ReplayTest):
+
+    def test_list(self):
+        users = self.ucm.user.list()
+        self.assertEqual([u['userid'] for u in cluster.users], [user.userid for user in users])
+        self.assertEqual(cluster.users[3]['telephoneNumber'], users[3].telephoneNumber)
+
+    def test_fields(self):
+        users = self.ucm.user.list(fields=USER_FIELDS)
+        self.assertEqual(len(cluster.users), len(users))
+        self.assertEqual(cluster.users[5]['mailid'], users[5].mailid)
+
+    def test_search(self):
+        users = self.ucm.user.list(search={'lastName': 'S%'})
+        expected = [u['userid'] for u in cluster.users if u['lastName'].startswith('S')]
+        self.assertTrue(expected)
+        self.assertEqual(expected, [user.userid for user in users])
+
+
+class TestPhoneApi(ReplayTest):
+
+    def test_list_paged(self):
+        phones = self.ucm.phone.list()
+        self.assertEqual([p['name'] for p in cluster.phones], [phone.name for phone in phones])
+        # 1st request fails with 'Query request too large', then at least two pages
+        self.assertGreater(self.server.requests['listPhone'], 2)
+
+    def test_lazy_details(self):
+        phones = self.ucm.phone.list(fields=PHONE_FIELDS)
+        self.assertEqual(cluster.phones[1]['model'], phones[1].model)
+        requests = self.server.requests.get('getPhone', 0)
+        # lines are not read by the list call: the details are read on first access
+        line = phones[1].lines.line[0]
+        self.assertEqual(requests + 1, self.server.requests['getPhone'])
+        self.assertEqual(phones[1].ownerUserName.value, line.associatedEndusers.enduser[0].userId)
+
+    def test_details(self):
+        phones = self.ucm.phone.list()[:20]
+        details = list(self.ucm.phone.details(phones))
+        self.assertEqual([phone.name for phone in phones], [phone.name for phone in details])
+        self.assertTrue(all(phone.lines.line for phone in details))
+
+
+class TestLocationApi(ReplayTest):
+
+    def test_list(self):
+        locations = self.ucm.location.list()
+        self.assertEqual([loc['name'] for loc in cluster.locations], [loc.name for loc in locations])
+
+
+class TestReplay(ReplayTest):
+
+    def test_not_recorded(self):
+        with self.assertRaises(zeep.exceptions.Fault) as context:
+            self.ucm.user.list(search={'lastName': 'X%'})
+        self.assertIn('no recorded response', context.exception.message)
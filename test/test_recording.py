@@ -0,0 +1,36 @@
+import tempfile
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.recording import Cassette, RecordingProxy, request_key
+
+REQUEST = b'''<soap-env:Envelope xmlns:soap-env="http://schemas.xmlsoap.org/soap/envelope/">
+<soap-env:Body><ns0:getUser xmlns:ns0="http://www.cisco.com/AXL/API/12.5"><userid>{userid}</userid></ns0:getUser>
+</soap-env:Body></soap-env:Envelope>'''
+
+
+class TestRecording(TestCase):
+
+    def test_request_key(self):
+        key = request_key(REQUEST.replace(b'{userid}', b'jdoe'))
+        self.assertTrue(key.startswith('getUser-'))
+        # different envelope prefix, same operation
+        other = REQUEST.replace(b'soap-env', b'soapenv').replace(b'{userid}', b'jdoe')
+        self.assertEqual(key, request_key(other))
+        self.assertNotEqual(key, request_key(REQUEST.replace(b'{userid}', b'anna')))
+
+    def test_record_replay(self):
+        cluster = SyntheticCluster(users=20)
+        with tempfile.TemporaryDirectory() as directory:
+            with FakeAXLServer(cluster, error_rate=0.3, seed=1) as server, \
+                    RecordingProxy(server.url, Cassette(directory)) as proxy:
+                with UCMReader(host='ucm', user='axl', password='secret', address=proxy.url) as ucm:
+                    recorded = [user.userid for user in ucm.user.list()]
+            # transient errors are retried by the reader but not recorded
+            self.assertGreater(server.errors, 0)
+            cassette = Cassette(directory)
+            self.assertEqual(1, len(cassette))
+            with FakeAXLServer(SyntheticCluster(users=0), cassette=cassette) as server:
+                with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                    self.assertEqual(recorded, [user.userid for user in ucm.user.list()])
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from ucm_reader import UCMReader, StringAndUUID
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestReferences(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=200)
+
+    def test_interned(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                phones = ucm.phone.list()
+                # details read with a get reference the same objects
+                phones[0].read_details()
+        device_pools = {id(phone.devicePoolName) for phone in phones}
+        self.assertEqual(len({phone.devicePoolName.value for phone in phones}), len(device_pools))
+        self.assertIs(phones[0].devicePoolName, StringAndUUID.validate(
+            {'_value_1': phones[0].devicePoolName.value, 'uuid': phones[0].devicePoolName.uuid}))
+        self.assertEqual(StringAndUUID(_value_1='a', uuid='{1}'), StringAndUUID(_value_1='a', uuid='{1}'))
+        with self.assertRaises(TypeError):
+            phones[0].devicePoolName.value = 'other'
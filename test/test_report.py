@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from wxc_sdk.as_rest import AsRestSession
+
+import main
+from provisioning.fake_webex import FakeWebexServer, WebexOrg
+from provisioning.mapping import user_locations
+from provisioning.report import FAIL, SKIP, SUCCESS, RunReport, percentile
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.metrics import Metrics
+
+
+class TestReport(TestCase):
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(50.5, percentile(values, 0.5))
+        self.assertAlmostEqual(99.01, percentile(values, 0.99))
+        self.assertEqual(100.0, percentile(values, 1))
+        self.assertEqual(3.0, percentile([3.0], 0.95))
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_report(self):
+        registry = Metrics()
+        registry.inc('webex_requests_total', 5, operation='GET /people', status=200)
+        report = RunReport(registry=registry)
+        registry.inc('webex_requests_total', 4, operation='GET /people', status=200)
+        registry.inc('webex_throttled_total', 2, operation='GET /people')
+        registry.inc('adaptive_wait_seconds_total', 1.5, target='webex')
+        # AXL throttling isn't reported as Webex throttling
+        registry.inc('adaptive_wait_seconds_total', 3, target='axl')
+        registry.inc('adaptive_throttled_total', 2, target='axl')
+        with report.stage('plan', count=3):
+            report.outcome('a', SUCCESS, 'created')
+            report.outcome('b', SKIP, 'TN not available', 'TN +14085551234 not available')
+            report.outcome('c', FAIL, 'errors in calling data', 'phone_numbers/4003(invalid)')
+        report.begin('provision')
+        for _ in range(4):
+            with report.timer('people.create'):
+                registry.inc('webex_requests_total', operation='POST /people', status=200)
+        registry.inc('webex_requests_total', 2, operation='GET /people', status=200)
+        data = report.as_dict()
+        self.assertEqual([('plan', 3, 0), ('provision', None, 6)],
+                         [(s['name'], s['count'], s['webex_requests']) for s in data['stages']])
+        self.assertEqual({'fail': {'total': 1, 'reasons': {'errors in calling data': 1}},
+                          'skip': {'total': 1, 'reasons': {'TN not available': 1}},
+                          'success': {'total': 1, 'reasons': {'created': 1}}}, data['outcomes'])
+        self.assertEqual(['b', 'c'], [d['key'] for d in data['details']])
+        self.assertEqual(4, data['latencies']['people.create']['count'])
+        # only requests after the start of the run
+        self.assertEqual(10, data['webex']['requests'])
+        self.assertEqual(2, data['webex']['throttled'])
+        self.assertEqual(1.5, data['webex']['limit_wait_seconds'])
+        self.assertEqual(0, data['webex']['limit_throttled'])
+        # only requests of the provisioning stage over the time of that stage
+        self.assertAlmostEqual(6 / data['stages'][1]['seconds'], data['webex']['requests_per_second'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            report.write(path)
+            with open(path) as f:
+                self.assertEqual(data['outcomes'], json.load(f)['outcomes'])
+
+    def test_user_provisioning(self):
+        cluster = SyntheticCluster(users=20)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                locations = user_locations(users, ucm.phone.list())
+        report = RunReport()
+
+        async def run():
+            async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', GMAIL_ID='test'), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    await main.user_provisioning(users=users, user_locations=locations, report=report)
+            return webex.requests
+
+        requests = asyncio.run(run())
+        data = report.as_dict()
+        self.assertEqual(['prepare', 'plan', 'provision users'], [stage['name'] for stage in data['stages']])
+        self.assertEqual(len(users), data['outcomes']['success']['reasons']['created'])
+        self.assertEqual(len(users), data['latencies']['people.create']['count'])
+        self.assertEqual(len(users), data['latencies']['people.update']['count'])
+        self.assertEqual(sum(requests.values()), data['webex']['requests'])
+
+    def test_unmapped_user(self):
+        cluster = SyntheticCluster(users=10)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = [user for user in ucm.user.list() if user.mailid]
+                locations = user_locations(users, ucm.phone.list())
+        unmapped = users[0]
+        # number which can't be normalized with the number plan
+        unknown = users[1]
+        unknown.telephoneNumber = '555-12345'
+        report = RunReport()
+
+        async def run(rules_path: str):
+            async with FakeWebexServer(WebexOrg.for_cluster(cluster)) as webex:
+                with patch.object(AsRestSession, 'BASE', webex.url), \
+                        patch.multiple(main, READONLY=False, WEBEX_TOKEN='token', MAPPING_RULES=rules_path), \
+                        patch.dict(os.environ, WEBEX_INVENTORY_PATH=''):
+                    await main.user_provisioning(users=users, user_locations=locations, report=report)
+
+        with tempfile.TemporaryDirectory() as directory:
+            # no email rule for the first user
+            path = os.path.join(directory, 'rules.yml')
+            with open(path, 'w') as f:
+                json.dump({'email': [{'source': 'userid', 'match': f'^(?!{re.escape(unmapped.userid)}$)',
+                                      'template': '{value}@example.com'}]}, f)
+            asyncio.run(run(path))
+        data = report.as_dict()
+        self.assertEqual(len(users) - 2, data['outcomes']['success']['reasons']['created'])
+        self.assertEqual({'total': 2, 'reasons': {'no mapping rule matched': 1, 'number not normalizable': 1}},
+                         data['outcomes']['skip'])
+        self.assertEqual({(unmapped.userid, 'email'), (unknown.userid, '555-12345')},
+                         {(d['key'], d['detail']) for d in data['details']})
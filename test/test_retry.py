@@ -0,0 +1,101 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+import zeep.exceptions
+
+from ucm_reader import UCMReader
+from ucm_reader.checkpoint import PageCheckpoint
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.retry import PERMANENT, THROTTLED, TRANSIENT, RetryPolicy, classify
+
+
+class TestRetry(TestCase):
+
+    def test_classify(self):
+        self.assertEqual(THROTTLED, classify(zeep.exceptions.TransportError(status_code=503)))
+        self.assertEqual(TRANSIENT, classify(zeep.exceptions.TransportError(status_code=502)))
+        self.assertEqual(TRANSIENT, classify(zeep.exceptions.Fault('Read timed out')))
+        self.assertEqual(PERMANENT, classify(zeep.exceptions.Fault('Item not valid: The specified User was not found')))
+
+    def test_backoff(self):
+        policy = RetryPolicy(base=1, cap=5, rng=random.Random(0))
+        for attempt in range(10):
+            self.assertLessEqual(policy.backoff(attempt), min(5, 2 ** attempt))
+
+    def test_idempotency(self):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise zeep.exceptions.TransportError(status_code=502)
+
+        policy = RetryPolicy(attempts=3, base=0)
+        with self.assertRaises(zeep.exceptions.TransportError):
+            policy.call('getUser', fail)
+        self.assertEqual(3, len(calls))
+        # the update might have been executed: no retry
+        calls.clear()
+        with self.assertRaises(zeep.exceptions.TransportError):
+            policy.call('updateUser', fail)
+        self.assertEqual(1, len(calls))
+
+    def test_transient_errors(self):
+        cluster = SyntheticCluster(users=200, phones=50)
+        with FakeAXLServer(cluster, max_response_bytes=20000, error_rate=0.2) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url,
+                           retry=RetryPolicy(attempts=10, base=0.001)) as ucm:
+                users = ucm.user.list()
+                phones = list(ucm.phone.details())
+        self.assertTrue(server.errors)
+        self.assertEqual(len(cluster.users), len(users))
+        self.assertTrue(all(phone.lines for phone in phones))
+
+    def test_checkpoint(self):
+        cluster = SyntheticCluster(users=200)
+        with tempfile.TemporaryDirectory() as checkpoint:
+            with FakeAXLServer(cluster, max_response_bytes=20000, error_rate=0.2, seed=3) as server:
+                # w/o retries the paged read fails at some point
+                with UCMReader(host='ucm', user='axl', password='secret', address=server.url,
+                               retry=RetryPolicy(attempts=1), checkpoint=checkpoint) as ucm:
+                    with self.assertRaises(zeep.exceptions.TransportError):
+                        ucm.user.list()
+                pages = server.requests['listUser']
+                server.error_rate = 0
+                with UCMReader(host='ucm', user='axl', password='secret', address=server.url,
+                               checkpoint=checkpoint) as ucm:
+                    users = ucm.user.list()
+                # only the missing pages (and the initial unpaged request) are read again
+                resumed = server.requests['listUser'] - pages
+        self.assertEqual(len(cluster.users), len(users))
+        self.assertEqual(len(cluster.users), len(set(user.userid for user in users)))
+        self.assertLess(resumed, pages)
+
+    def test_checkpoint_refresh(self):
+        cluster = SyntheticCluster(users=200)
+        with tempfile.TemporaryDirectory() as checkpoint:
+            with FakeAXLServer(cluster, max_response_bytes=5000) as server:
+                with UCMReader(host='ucm', user='axl', password='secret', address=server.url,
+                               checkpoint=checkpoint) as ucm:
+                    ucm.user.list(fields=['userid', 'mailid'])
+                    # the list has been read completely: nothing to resume
+                    self.assertEqual([], os.listdir(checkpoint))
+                    cluster.users[0]['mailid'] = 'changed@example.com'
+                    cluster.users[-1]['mailid'] = 'changed.too@example.com'
+                    users = ucm.user.list(fields=['userid', 'mailid'], refresh=True)
+                    self.assertEqual('changed@example.com', users[0].mailid)
+                    cluster.users[0]['mailid'] = 'reloaded@example.com'
+                    ucm.refresh()
+                    self.assertEqual('reloaded@example.com', users[0].mailid)
+                    self.assertEqual('changed.too@example.com', users[-1].mailid)
+
+    def test_checkpoint_key(self):
+        tags = [f'tag{i:02d}' for i in range(20)]
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = PageCheckpoint(directory)
+            checkpoint.save('listUser', tags, 100, 0, [{'tag19': 'a'}])
+            # same number of tags and same first 40 characters
+            self.assertIsNone(checkpoint.load('listUser', tags[:-1] + ['other'], 100, 0))
+            self.assertIsNone(checkpoint.load('listUser', tags, 100, 0, search={'userid': 'a%'}))
+            self.assertEqual([{'tag19': 'a'}], checkpoint.load('listUser', tags, 100, 0))
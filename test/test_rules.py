@@ -0,0 +1,58 @@
+from pathlib import Path
+from unittest import TestCase
+
+from provisioning.rules import MappingRules, Rule, RuleSet, UserMapping, load_rules
+from ucm_reader import User
+from ucm_reader.numbers import NumberPlan
+
+
+def user(**kwargs) -> User:
+    return User.parse_obj(None, dict(uuid='{1}', **kwargs))
+
+
+class TestRules(TestCase):
+
+    def test_default_rules(self):
+        rules = MappingRules(constants=dict(gmail_id='admin'))
+        users = [user(userid='jdoe', mailid='jdoe@example.com', firstName='John', lastName='Doe',
+                      telephoneNumber='+14085551234'),
+                 user(userid='anna', mailid='anna@example.com', firstName='Anna', lastName='Lee',
+                      telephoneNumber='+4961007739764')]
+        self.assertEqual([UserMapping('admin+jdoe@gmail.com', 'John Doe', '1234', '4085551234'),
+                          UserMapping('admin+anna@gmail.com', 'Anna Lee', '9764', '+4961007739764')],
+                         rules.apply(users))
+        self.assertEqual(rules.apply(users[:1])[0], rules.map_user(users[0]))
+
+    def test_rules_file(self):
+        path = Path(__file__).parent.parent / 'mapping_rules.yml (sample)'
+        rules = MappingRules(load_rules(path), constants=dict(gmail_id='admin'))
+        rtp = user(userid='a', mailid='a@example.com', firstName='A', lastName='B', telephoneNumber='+19195551234')
+        sjc = user(userid='b', mailid='b@example.com', firstName='C', lastName='D', telephoneNumber='+14085554321')
+        self.assertEqual([UserMapping('a@example.com', 'A B', '51234', '9195551234'),
+                          UserMapping('b@example.com', 'C D', '4321', '4085554321')],
+                         rules.apply([rtp, sjc]))
+        self.assertEqual({'SJC1': 'San Jose', 'Hub_None': 'SJC'}, rules.location_map(['SJC1', 'Hub_None', 'RTP']))
+
+    def test_constants(self):
+        rules = MappingRules(RuleSet(email=[Rule(source='mailid', match=r'^(?P<name>[^@]+)@',
+                                                 template='{gmail_id}+{timestamp}-{name}@gmail.com')],
+                                     display_name=[Rule(template='{{{lastName}}}')]),
+                             constants=dict(gmail_id='admin', timestamp='2023060112'))
+        mapping = rules.map_user(user(userid='x', mailid='x@example.com', lastName='Doe'))
+        self.assertEqual('admin+2023060112-x@gmail.com', mapping.email)
+        self.assertEqual('{Doe}', mapping.display_name)
+
+    def test_invalid(self):
+        for rule in (Rule(source='noSuchAttribute', template='{value}'),
+                     Rule(source='telephoneNumber', match='(', template='{value}'),
+                     Rule(source='telephoneNumber', match=r'(\d{4})$', template='{2}')):
+            with self.subTest(rule=rule), self.assertRaises(ValueError):
+                MappingRules(RuleSet(extension=[rule]))
+
+    def test_e164(self):
+        rules = MappingRules(constants=dict(gmail_id='admin'), number_plan=NumberPlan(country_code='49'))
+        users = [user(userid='a', telephoneNumber='06100 7739764'), user(userid='b', telephoneNumber='+1 408 555 1234'),
+                 user(userid='c', telephoneNumber='1234')]
+        self.assertEqual(['+4961007739764', '4085551234', None], [m.did for m in rules.apply(users)])
+        self.assertIn('telephoneNumber', rules.attributes)
+        self.assertNotIn('e164', rules.attributes)
@@ -0,0 +1,76 @@
+import asyncio
+from collections import Counter
+from unittest import TestCase
+
+from provisioning.mapping import user_locations
+from provisioning.scheduler import FairScheduler
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestFairScheduler(TestCase):
+
+    def test_round_robin(self):
+        scheduler = FairScheduler(concurrency=1)
+        # all jobs of location A queued before the jobs of B and C
+        for key, count in (('A', 6), ('B', 2), ('C', 2)):
+            for i in range(count):
+                scheduler.add(key, lambda key=key, i=i: asyncio.sleep(0, result=f'{key}{i}'))
+        results = asyncio.run(scheduler.run())
+        self.assertEqual(['A', 'B', 'C', 'A', 'B', 'C', 'A', 'A', 'A', 'A'], scheduler.started)
+        # results in the order in which jobs have been added
+        self.assertEqual(['A0', 'A1', 'A2', 'A3', 'A4', 'A5', 'B0', 'B1', 'C0', 'C1'], results)
+
+    def test_per_key_limit(self):
+        running = Counter()
+        max_running = Counter()
+
+        async def job(key: str):
+            running[key] += 1
+            max_running[key] = max(max_running[key], running[key])
+            await asyncio.sleep(0.01)
+            running[key] -= 1
+
+        scheduler = FairScheduler(concurrency=8, per_key=2)
+        for i in range(20):
+            scheduler.add('A' if i < 15 else 'B', lambda i=i: job('A' if i < 15 else 'B'))
+        asyncio.run(scheduler.run())
+        self.assertEqual(Counter(A=2, B=2), max_running)
+        self.assertEqual(20, len(scheduler.started))
+
+    def test_exceptions(self):
+        async def fail():
+            raise ValueError('failed')
+
+        scheduler = FairScheduler(concurrency=2)
+        scheduler.add('A', fail)
+        scheduler.add('B', lambda: asyncio.sleep(0, result='ok'))
+        results = asyncio.run(scheduler.run(return_exceptions=True))
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual('ok', results[1])
+
+        scheduler = FairScheduler(concurrency=2)
+        scheduler.add('A', fail)
+        with self.assertRaises(ValueError):
+            asyncio.run(scheduler.run())
+
+
+class TestUserLocations(TestCase):
+
+    def test_user_locations(self):
+        cluster = SyntheticCluster(users=30, locations=3)
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = ucm.user.list()
+                phones = ucm.phone.list()
+        by_location = user_locations(users, phones)
+        expected = {user['userid']: cluster.site(i)[0] for i, user in enumerate(cluster.users)}
+        self.assertEqual(expected, by_location)
+
+        # device pools mapped to Webex location names
+        location_map = {f'DP_{site}': f'Webex {site}' for site in set(expected.values())}
+        by_device_pool = user_locations(users, phones, source='device_pool', location_map=location_map)
+        self.assertEqual({userid: f'Webex {site}' for userid, site in expected.items()}, by_device_pool)
+
+        # users w/o phones don't have a location
+        self.assertEqual(dict(), user_locations(users, phones[:0]))
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from ucm_reader import UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestSearch(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=500)
+
+    def test_search_criteria(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = ucm.user.list(search={'department': 'Dept01'}, fields=['userid'])
+                phones = ucm.phone.list(search={'devicePoolName': 'DP_SJC'})
+        self.assertEqual(sorted(u['userid'] for u in self.cluster.users if u['department'] == 'Dept01'),
+                         sorted(user.userid for user in users))
+        self.assertEqual(sum(p['devicePoolName'].value == 'DP_SJC' for p in self.cluster.phones), len(phones))
+        self.assertEqual(1, server.requests['listUser'])
+
+    def test_where(self):
+        with FakeAXLServer(self.cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                users = ucm.user.list(where="telephonenumber like '+1408%'")
+        expected = [u for u in self.cluster.users if u['telephoneNumber'].startswith('+1408')]
+        self.assertEqual([u['userid'] for u in expected], [user.userid for user in users])
+        self.assertTrue(all(user.department for user in users))
+        # one SQL query and one get per matching user; no list call
+        self.assertEqual(len(expected), server.requests['getUser'])
+        self.assertNotIn('listUser', server.requests)
+
+    def test_where_phones(self):
+        cluster = SyntheticCluster(users=20)
+        # not a phone: gateways are in the device table as well
+        cluster.tables['device'].append(dict(pkid='0e0f4ad4-7e0e-4c4b-9c8e-0c4a3f5e2a11', name='SJC-GW1',
+                                             description='Phone gateway at SJC', tkclass='2'))
+        with FakeAXLServer(cluster) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+                phones = ucm.phone.list(where="description like 'Phone%'")
+        self.assertEqual(sorted(p['name'] for p in cluster.phones), sorted(phone.name for phone in phones))
+        self.assertEqual(len(cluster.phones), server.requests['getPhone'])
+
+    def test_sharded(self):
+        with FakeAXLServer(self.cluster, max_response_bytes=20000) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=4) as ucm:
+                users = ucm.user.list(sharded=True, fields=['userid'])
+                phones = ucm.phone.list(sharded=True)
+        self.assertEqual(sorted(u['userid'] for u in self.cluster.users), [user.userid for user in users])
+        self.assertEqual(sorted(p['name'] for p in self.cluster.phones), sorted(phone.name for phone in phones))
+        self.assertGreater(server.requests['listPhone'], 1)
+
+    def test_sharded_incomplete(self):
+        cluster = SyntheticCluster(users=100)
+        # not matched by any prefix of the shard alphabet
+        for userid in ('_svc', 'josé', ' admin'):
+            cluster.add('user', {**cluster.users[0], 'uuid': f'{{{userid}}}', 'userid': userid})
+        with FakeAXLServer(cluster, max_response_bytes=20000) as server:
+            with UCMReader(host='ucm', user='axl', password='secret', address=server.url, pool_size=4) as ucm, \
+                    self.assertLogs('ucm_reader.base', 'WARNING'):
+                users = ucm.user.list(sharded=True, fields=['userid'])
+        self.assertEqual(sorted(u['userid'] for u in cluster.users), sorted(user.userid for user in users))
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from ucm_reader import UCMInventory, UCMReader
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+
+
+class TestUCMInventory(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cluster = SyntheticCluster(users=30, locations=3)
+        cls.server = FakeAXLServer(cls.cluster).start()
+        cls.reader = UCMReader(host='ucm', user='axl', password='secret', address=cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.reader.close()
+        cls.server.close()
+
+    def test_lookups(self):
+        inventory = UCMInventory(self.reader)
+        get_phone = self.server.requests.get('getPhone', 0)
+        user = self.cluster.users[4]
+        phone = self.cluster.phones[4]
+        self.assertEqual(user['uuid'], inventory.user(user['userid']).uuid)
+        self.assertIs(inventory.user(user['userid']), inventory.users_by_uuid[user['uuid']])
+        self.assertEqual([phone['name']], [p.name for p in inventory.phones_of(user['userid'])])
+        self.assertEqual(user['userid'], inventory.owner(inventory.phone(phone['name'])).userid)
+        location = inventory.phone_location(inventory.phone(phone['name']))
+        self.assertEqual(self.cluster.site(4)[0], location.name)
+        self.assertIs(location, inventory.location(location.name))
+        self.assertEqual(len(self.cluster.phones) // 3, len(inventory.phones_by_location[location.name]))
+        self.assertIsNone(inventory.user('unknown'))
+        self.assertEqual([], inventory.phones_of('unknown'))
+        # indexes are built once
+        self.assertIs(inventory.users_by_id, inventory.users_by_id)
+        # no phone details read
+        self.assertEqual(get_phone, self.server.requests.get('getPhone', 0))
+
+    def test_dn(self):
+        inventory = UCMInventory(self.reader)
+        user = self.cluster.users[7]
+        pattern = user['primaryExtension']['pattern']
+        phones = inventory.phones_with_dn(pattern, 'DN')
+        self.assertEqual([self.cluster.phones[7]['name']], [p.name for p in phones])
+        self.assertEqual([user['userid']], [u.userid for u in inventory.dn_owners(pattern, 'DN')])
+        self.assertEqual([], inventory.phones_with_dn(pattern))
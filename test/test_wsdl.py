@@ -0,0 +1,51 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from ucm_reader import PhoneApi, UserApi
+from ucm_reader.fake_axl import FakeAXLServer, SyntheticCluster
+from ucm_reader.wsdl import WSDLCache, axl_helper
+
+
+class TestWSDLCache(TestCase):
+
+    def test_shared_in_memory(self):
+        cache = WSDLCache(directory=None)
+        axl1 = axl_helper(ucm_host='ucm1', auth=('axl', 'secret'), verify=False, cache=cache)
+        axl2 = axl_helper(ucm_host='ucm2', auth=('axl', 'secret'), verify=False, cache=cache)
+        # noinspection PyProtectedMember
+        self.assertIs(axl1.service._client.wsdl, axl2.service._client.wsdl)
+        # ... but each helper still has its own transport
+        # noinspection PyProtectedMember
+        self.assertIsNot(axl1.service._client.transport, axl2.service._client.transport)
+
+    def test_disk_cache(self):
+        cluster = SyntheticCluster(users=20)
+        with tempfile.TemporaryDirectory() as tmp, FakeAXLServer(cluster) as server:
+            axl_helper(ucm_host='ucm', auth=('axl', 'secret'), verify=False, cache=WSDLCache(directory=tmp))
+            self.assertEqual(1, len([f for f in os.listdir(tmp) if f.endswith('.pickle')]))
+
+            # new cache instance: document has to be loaded from disk
+            axl = axl_helper(ucm_host='ucm', auth=('axl', 'secret'), verify=False, cache=WSDLCache(directory=tmp))
+            server.bind(axl)
+            rows = axl.sql_query('select pattern from remoteroutingpattern')
+            self.assertEqual(len(cluster.tables['remoteroutingpattern']), len(rows))
+            users = UserApi(axl.service).list()
+            self.assertEqual(len(cluster.users), len(users))
+            # get details
+            phone = PhoneApi(axl.service).list()[1]
+            self.assertEqual(phone.ownerUserName.value, phone.lines.line[0].associatedEndusers.enduser[0].userId)
+
+    def test_corrupt_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = WSDLCache(directory=tmp)
+            axl = axl_helper(ucm_host='ucm', auth=('axl', 'secret'), verify=False, cache=cache)
+            for name in os.listdir(tmp):
+                with open(os.path.join(tmp, name), mode='wb') as f:
+                    f.write(b'garbage')
+            # corrupt cache file is ignored
+            with self.assertLogs('ucm_reader.wsdl', level='WARNING'):
+                axl = axl_helper(ucm_host='ucm', auth=('axl', 'secret'), verify=False,
+                                 cache=WSDLCache(directory=tmp))
+            # noinspection PyProtectedMember
+            self.assertIsNotNone(axl.service._client.wsdl.bindings)
@@ -1,31 +1,44 @@
-from ucmaxl import AXLHelper
-import urllib3
-
-from typing import List
-import logging
-
-from ucm_reader.base import *
-from ucm_reader.user import *
-from ucm_reader.phone import *
-from ucm_reader.locations import *
-
-log = logging.getLogger(__name__)
-
-
-class UCMReader:
-    def __init__(self, host: str, user: str, password: str, verify=False):
-        if not verify:
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        self._axl = AXLHelper(ucm_host=host, auth=(user, password), verify=verify)
-        self.user = UserApi(self._axl.service)
-        self.phone = PhoneApi(self._axl.service)
-        self.location = LocationApi(self._axl.service)
-
-    def close(self):
-        pass
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+"""
+Read UCM configuration via AXL.
+
+The public names are imported lazily on first access so that importing a light submodule (for example
+ucm_reader.profiling) or the package itself doesn't pull in zeep, pydantic and ucmaxl.
+"""
+import importlib
+
+# public name -> module defining it
+_modules = {
+    'UCMReader': 'ucm_reader.reader',
+    'UCMInventory': 'ucm_reader.inventory',
+    'AXLObject': 'ucm_reader.base',
+    'StringAndUUID': 'ucm_reader.base',
+    'ObjApi': 'ucm_reader.base',
+    'GetRequired': 'ucm_reader.base',
+    'User': 'ucm_reader.user',
+    'UserApi': 'ucm_reader.user',
+    'CurrentConfig': 'ucm_reader.phone',
+    'AssociatedEndUser': 'ucm_reader.phone',
+    'DN': 'ucm_reader.phone',
+    'Line': 'ucm_reader.phone',
+    'SpeedDial': 'ucm_reader.phone',
+    'Phone': 'ucm_reader.phone',
+    'PhoneApi': 'ucm_reader.phone',
+    'Location': 'ucm_reader.locations',
+    'LocationApi': 'ucm_reader.locations',
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str):
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module), name)
+    # cache so that __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
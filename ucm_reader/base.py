@@ -1,10 +1,24 @@
 from pydantic import BaseModel, Field
 import zeep.exceptions
 import zeep.helpers
+import zeep.proxy
 import re
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from itertools import islice
+from threading import Lock
+from weakref import WeakValueDictionary
 
-from typing import Optional, Generator
+from typing import Any, Optional, Generator, Iterable, Iterator, TypeVar
+
+from ucm_reader.changes import REMOVE, Change
+from ucm_reader.checkpoint import PageCheckpoint
+from ucm_reader.metrics import metrics
+from ucm_reader.parsing import ParsePool
+from ucm_reader.pool import AXLSessionPool
+from ucm_reader.profiling import profiler
+from ucm_reader.retry import DEFAULT_RETRY, RetryPolicy
 
 __all__ = ['AXLObject', 'StringAndUUID', 'ObjApi', 'GetRequired']
 
@@ -13,10 +27,40 @@ GetRequired = Field(None, get_required=True)
 
 log = logging.getLogger(__name__)
 
+# default number of objects for which details are read concurrently
+DETAILS_BATCH_SIZE = 100
+
+# AXL fault for a get of an object which doesn't exist (anymore)
+NOT_FOUND = re.compile(r'not found', re.IGNORECASE)
+
+# AXL fault for list calls with too many matches, for example:
+# 'Query request too large. Total rows matched: 1277 rows. Suggestive Row Fetch: less than 953 rows'
+QUERY_TOO_LARGE = re.compile(r'Query request too large\..+matched: (\d+).+less than (\d+)')
+
+# characters of the prefixes for sharded list calls (see AXLObject.do_list_sharded())
+SHARD_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789.-@+'
+
+
+def bind_address(zeep_service: zeep.proxy.ServiceProxy, address: str) -> zeep.proxy.ServiceProxy:
+    """
+    Get a service proxy for the same binding as the given service but sending requests to a different address
+    :param zeep_service: service proxy, for example the service of an AXLHelper instance
+    :param address: URL of the AXL service, for example the URL of a FakeAXLServer
+    :return: new service proxy
+    """
+    # noinspection PyProtectedMember
+    return zeep.proxy.ServiceProxy(zeep_service._client, zeep_service._binding, address=address)
+
 
 class AXLObject(BaseModel):
     _axl_type: Optional[str] = None
     _axl_search: Optional[str] = None
+    # database table of the objects, for SQL predicates
+    _axl_table: Optional[str] = None
+    # SQL predicate selecting the objects of the class if the table also holds other objects
+    _axl_where: Optional[str] = None
+    # tags read by the list call which created a partial object; None: all tags
+    _fields: Optional[frozenset[str]] = None
 
     class Config:
         extra = 'allow'
@@ -48,28 +92,61 @@ class AXLObject(BaseModel):
             else:
                 yield field.name
 
-    def _init_get_details(self, obj_api: 'ObjApi'):
+    @classmethod
+    def list_tags(cls, fields: Iterable[str] = None) -> list[str]:
+        """
+        returnedTags for a list call
+        :param fields: names (or aliases) of the attributes to read; uuid is always read. None: all attributes which
+            can be read with a list call
+        :return: list of tags
+        """
+        tags = list(cls.tags())
+        if fields is None:
+            return tags
+        aliases = {field.name: field.alias for field in cls.__fields__.values()}
+        requested = {'uuid'}
+        for name in fields:
+            tag = aliases.get(name, name)
+            if tag not in tags:
+                raise ValueError(f'{cls.__name__}.{name} can not be read with a list call')
+            requested.add(tag)
+        return [tag for tag in tags if tag in requested]
+
+    def _init_get_details(self, obj_api: 'ObjApi', fields: Iterable[str] = None):
         """
         Initialize the helper attributes required to get details on demand if an attribute is accessed which requires
         a get call
         :param obj_api: obj api to store in the object for further use
+        :param fields: tags read by a list call which only requested some of the attributes
         :return:
         """
         self._obj_api = obj_api
         # we haven't read details yet
         self._details_read = False
+        if fields is not None:
+            self._fields = fields if isinstance(fields, frozenset) else frozenset(fields)
 
     @classmethod
-    def parse_obj(cls, obj_api: 'ObjApi', obj):
+    def parse_obj(cls, obj_api: 'ObjApi', obj, fields: Iterable[str] = None):
         """
         Create an object from data and prepare for automatic get if needed
         :param obj_api: object api to store in the object
         :param obj: init data for object creation
+        :param fields: if set then only these tags are present in obj (partial object). Accessing one of the other
+            attributes triggers a get
         :return:
         """
+        if fields is not None:
+            # placeholders for required attributes which have not been read
+            if not isinstance(fields, frozenset):
+                fields = frozenset(fields)
+            obj = {**{field.alias: {} if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+                      else None
+                      for field in cls.__fields__.values() if field.required and field.alias not in fields},
+                   **obj}
         model = super(AXLObject, cls).parse_obj(obj)
         # noinspection PyProtectedMember
-        model._init_get_details(obj_api)
+        model._init_get_details(obj_api, fields=fields)
         return model
 
     def __getattribute__(self, item):
@@ -78,97 +155,569 @@ class AXLObject(BaseModel):
         :param item:
         :return:
         """
+        # object.__getattribute__ instead of self.xxx for the helper attributes: this is called for every attribute
+        # access, and each self.xxx would be another call of this method
         if item.startswith('_'):
-            return super(AXLObject, self).__getattribute__(item)
-        field = self.__fields__.get(item)
+            return object.__getattribute__(self, item)
+        field = type(self).__fields__.get(item)
         if field is not None:
-            if field.field_info.extra.get('get_required') and not self._details_read:
+            fields = object.__getattribute__(self, '_fields')
+            if (field.field_info.extra.get('get_required') or fields is not None and field.alias not in fields) and \
+                    not object.__getattribute__(self, '_details_read'):
                 # need to get the details via AXL
-                get_method_name = f'get{self._axl_type.capitalize()}'
-                log.debug(f'{get_method_name(uuid={self.uuid})} triggered by access to {self.__class__.__name__}.{item}')
-                get_method = self._obj_api.service[get_method_name]
-                zeep_response = get_method(uuid=self.uuid)
-                zeep_data = zeep_response['return'][next(iter(zeep_response['return']))]
-                data = zeep.helpers.serialize_object(zeep_data)
-                obj = self.__class__.parse_obj(obj_api=self._obj_api, obj=data)
-                # set indication that details have been read so that we don't do it again for this object
-                obj._details_read = True
-                self._details_read = True
-                # now copy values of all extra attributes
-                for tag in self.tags(only_extra=True):
-                    self.__setattr__(tag, obj.__getattribute__(tag))
-
-        return super(AXLObject, self).__getattribute__(item)
+                log.debug(f'get{self._axl_type.capitalize()}(uuid={self.uuid}) triggered by access to '
+                          f'{self.__class__.__name__}.{item}')
+                self.read_details()
+
+        return object.__getattribute__(self, item)
+
+    def read_details(self):
+        """
+        Get the attributes which require an AXL get call. Does nothing if the details have been read before
+        :return: self
+        """
+        if self._details_read:
+            return self
+        get_method_name = f'get{self._axl_type.capitalize()}'
+        zeep_response = self._obj_api.call(get_method_name, uuid=self.uuid)
+        zeep_data = zeep_response['return'][next(iter(zeep_response['return']))]
+        with profiler.span('serialize'):
+            data = zeep.helpers.serialize_object(zeep_data)
+        with profiler.span('validate'):
+            obj = self.__class__.parse_obj(obj_api=self._obj_api, obj=data)
+        # set indication that details have been read so that we don't do it again for this object
+        obj._details_read = True
+        self._details_read = True
+        # now copy values of all extra attributes and of the attributes not read by the list call of a partial object
+        for tag in self.tags(only_extra=True):
+            self.__setattr__(tag, obj.__getattribute__(tag))
+        if self._fields is not None:
+            for field in self.__fields__.values():
+                if field.alias not in self._fields:
+                    self.__setattr__(field.name, obj.__getattribute__(field.name))
+            self._fields = None
+        return self
+
+    def values(self, names: Iterable[str]) -> dict[str, Any]:
+        """
+        Values of some attributes. Same as getattr() for each name but faster for many objects: attributes which
+        have been read already are taken from the instance dictionary w/o the checks in __getattribute__()
+        :param names: attribute names
+        :return: dictionary name -> value
+        """
+        values = object.__getattribute__(self, '__dict__')
+        if values.get('_details_read') is False and not lazy_names(type(self), values.get('_fields')).isdisjoint(names):
+            # triggers a get
+            return {name: getattr(self, name) for name in names}
+        return {name: values[name] for name in names}
 
     def __repr_args__(self):
-        # suppress _details_read and _obj_api from string output
+        # suppress _details_read, _obj_api and _fields from string output
         return [(a, v)
                 for a, v in super(AXLObject, self).__repr_args__()
-                if a not in ['_details_read', '_obj_api']]
+                if a not in ['_details_read', '_obj_api', '_fields']]
 
     @classmethod
-    def do_list(cls, obj_api: 'ObjApi', first=None, skip=None):
+    def do_list(cls, obj_api: 'ObjApi', first=None, skip=None, fields: Iterable[str] = None,
+                search: dict[str, str] = None, resume: bool = True):
         """
         get a list of objects via AXL
         :param obj_api: axl API
         :param first: limit to the first n objects
         :param skip: skip 1st n objects
+        :param fields: only read these attributes (see list_tags()); the objects are partial objects
+        :param search: AXL search criteria, for example {'userid': 'a%'}; default: all objects
+        :param resume: take pages from the checkpoint of the obj_api (if any); pages are always written to it
         :return: list of objects
         """
         # the AXL method to list the objects is something like 'listUser'
         list_call_name = f'list{cls._axl_type.capitalize()}'
-        list_call = obj_api.service[list_call_name]
-        log.debug(f'Calling {list_call_name}')
         try:
-            zeep_response = list_call(searchCriteria={cls._axl_search: '%'},
-                                      returnedTags={t: '' for t in cls.tags()},
-                                      first=first,
-                                      skip=skip)
+            return cls._list_page(obj_api, fields=fields, search=search, first=first, skip=skip, resume=resume)
         except zeep.exceptions.Fault as e:
             # check if we need to restrict the query to smaller sets
             # Error to look for is something like:
             # 'Query request too large. Total rows matched: 1277 rows. Suggestive Row Fetch: less than 953 rows'
             message = e.message
-            if (m := re.match(r'Query request too large\..+matched: (\d+).+less than (\d+)', message)):
+            if (m := QUERY_TOO_LARGE.match(message)):
                 total_rows = int(m.group(1))
                 batch_size = int(m.group(2))
                 # reduce site (safety)
                 batch_size = int(batch_size * 0.7)
                 log.debug(f'{list_call_name} returns to many rows, need to request batches: {message}')
+                metrics.inc('axl_paged_retries_total', operation=list_call_name)
                 result = []
                 for skip in range(0, total_rows, batch_size):
-                    batch = cls.do_list(obj_api, first=batch_size, skip=skip)
+                    batch = cls.do_list(obj_api, first=batch_size, skip=skip, fields=fields, search=search,
+                                        resume=resume)
                     result.extend(batch)
                 return result
             else:
                 # for other errors re-raise the exception
                 raise
-        if zeep_response['return'] is None:
-            return []
-        # list of objects is in the first entry of the return dictionary
-        zeep_response = zeep_response['return'][next(iter(zeep_response['return']))]
-        result = []
-        log.debug(f'{list_call_name} serializing {len(zeep_response)} {cls.__name__} objects')
-        for zeep_object in zeep_response:
-            d = zeep.helpers.serialize_object(zeep_object)
-            # the AXl response potentially contains more attributes than we are interested in
-            # only look at the ones we have in the class definition
-            filtered = {tag: d[tag] for tag in cls.tags()}
-            # create object from values
-            o = cls.parse_obj(obj_api=obj_api, obj=filtered)
-            result.append(o)
+
+    @classmethod
+    def do_list_sharded(cls, obj_api: 'ObjApi', fields: Iterable[str] = None, alphabet: str = SHARD_ALPHABET,
+                        max_prefix_length: int = 4, max_workers: int = None, resume: bool = True):
+        """
+        get a list of all objects via AXL with concurrent prefix searches on the search attribute (for example
+        userid) instead of one search for '%'. A prefix with too many matches for a single response is split into
+        longer prefixes; at max_prefix_length the matches of the prefix are read in pages instead.
+        Prefix searches only find objects whose search attribute starts with characters of the alphabet: if the
+        shards have fewer objects than a list of all objects (see do_count()) then the list is read with do_list()
+        :param obj_api: axl API
+        :param fields: only read these attributes (see list_tags()); the objects are partial objects
+        :param alphabet: characters of the prefixes; no LIKE wildcards ('%', '_'); searches are case-insensitive
+        :param max_prefix_length: maximum length of the prefixes
+        :param max_workers: number of concurrent searches; default: size of the session pool
+        :param resume: take pages from the checkpoint of the obj_api (if any), see do_list()
+        :return: list of objects ordered by prefix
+        """
+        list_call_name = f'list{cls._axl_type.capitalize()}'
+        if max_workers is None:
+            max_workers = obj_api.pool.size if obj_api.pool else 1
+        shards: dict[str, list[AXLObject]] = dict()
+
+        def read_shard(prefix: str) -> list[str]:
+            """
+            Read all objects with the given prefix
+
+            :return: longer prefixes to search for if the prefix has too many matches
+            """
+            try:
+                shards[f'{prefix}%'] = cls._list_page(obj_api, fields=fields, search={cls._axl_search: f'{prefix}%'},
+                                                      resume=resume)
+                return []
+            except zeep.exceptions.Fault as e:
+                if not QUERY_TOO_LARGE.match(e.message or ''):
+                    raise
+            if len(prefix) >= max_prefix_length:
+                shards[f'{prefix}%'] = cls.do_list(obj_api, fields=fields, search={cls._axl_search: f'{prefix}%'},
+                                                   resume=resume)
+                return []
+            metrics.inc('axl_shard_splits_total', operation=list_call_name)
+            # an object named exactly like the prefix is not matched by any of the longer prefixes
+            shards[prefix] = cls._list_page(obj_api, fields=fields, search={cls._axl_search: prefix}, resume=resume)
+            return [prefix + c for c in alphabet]
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='axl-shard') as executor:
+            count = executor.submit(cls.do_count, obj_api)
+            pending = {executor.submit(read_shard, c) for c in alphabet}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.update(executor.submit(read_shard, prefix) for prefix in future.result())
+            total = count.result()
+        log.debug(f'{list_call_name}: read {len(shards)} shards')
+        # shards are disjoint unless UCM treats characters of the alphabet as equal
+        seen = set()
+        result = [obj for key in sorted(shards) for obj in shards[key]
+                  if not (obj.uuid in seen or seen.add(obj.uuid))]
+        if len(result) < total:
+            # some objects don't start with characters of the alphabet, for example '_svc' or 'josé'
+            log.warning(f'{list_call_name}: prefix searches found {len(result)} of {total} objects, reading all '
+                        f'objects w/o prefixes')
+            metrics.inc('axl_shard_incomplete_total', operation=list_call_name)
+            return cls.do_list(obj_api, fields=fields, resume=resume)
         return result
 
+    @classmethod
+    def do_count(cls, obj_api: 'ObjApi') -> int:
+        """
+        Number of objects in a list of all objects: list call only reading the uuid. If there are too many objects for
+        a single response then the number is taken from the 'Query request too large' fault. Never taken from a
+        checkpoint
+        :param obj_api: axl API
+        :return: number of objects
+        """
+        try:
+            return len(cls._list_page(obj_api, fields=[], resume=False))
+        except zeep.exceptions.Fault as e:
+            if m := QUERY_TOO_LARGE.match(e.message or ''):
+                return int(m.group(1))
+            raise
+
+    @classmethod
+    def _list_page(cls, obj_api: 'ObjApi', fields: Iterable[str] = None, search: dict[str, str] = None,
+                   first: int = None, skip: int = None, resume: bool = True) -> list['AXLObject']:
+        """
+        Single list call; raises a 'Query request too large' fault if the response would be too large
+        :param resume: take the page from the checkpoint of the obj_api (if any)
+        """
+        list_call_name = f'list{cls._axl_type.capitalize()}'
+        tags = cls.list_tags(fields)
+        # all objects share the set of tags
+        partial = fields is not None and frozenset(tags) or None
+        checkpoint = obj_api.checkpoint
+        if checkpoint is not None and resume and \
+                (rows := checkpoint.load(list_call_name, tags, first, skip, search=search)) is not None:
+            metrics.inc('axl_checkpoint_pages_total', operation=list_call_name)
+            return cls._from_rows(obj_api, rows, fields=partial)
+        log.debug(f'Calling {list_call_name}')
+        kwargs = dict(searchCriteria=search or {cls._axl_search: '%'},
+                      returnedTags={t: '' for t in tags},
+                      first=first,
+                      skip=skip)
+        if obj_api.parser is not None:
+            # raw response parsed by the process pool
+            content = obj_api.call_raw(list_call_name, **kwargs)
+            ref_tags, model_tags = cls._structured_tags()
+            with profiler.span('serialize'):
+                rows = obj_api.parser.parse(content, tuple(tags), ref_tags, model_tags)
+                filtered = [dict(zip(tags, row)) for row in rows]
+            log.debug(f'{list_call_name} parsed {len(filtered)} {cls.__name__} objects')
+        elif (zeep_response := obj_api.call(list_call_name, **kwargs))['return'] is None:
+            filtered = []
+        else:
+            # list of objects is in the first entry of the return dictionary
+            zeep_response = zeep_response['return'][next(iter(zeep_response['return']))]
+            log.debug(f'{list_call_name} serializing {len(zeep_response)} {cls.__name__} objects')
+            with profiler.span('serialize'):
+                # the AXl response potentially contains more attributes than we are interested in
+                # only look at the ones we have in the class definition
+                serialized = [zeep.helpers.serialize_object(zeep_object) for zeep_object in zeep_response]
+                filtered = [{tag: d[tag] for tag in tags} for d in serialized]
+        if checkpoint is not None:
+            checkpoint.save(list_call_name, tags, first, skip, filtered, search=search)
+        return cls._from_rows(obj_api, filtered, fields=partial)
+
+    @classmethod
+    def _structured_tags(cls) -> tuple[frozenset[str], frozenset[str]]:
+        """
+        Tags of references (StringAndUUID) and of other attributes with a model as type
+        """
+        models = {field.alias: field.type_ for field in cls.__fields__.values()
+                  if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)}
+        refs = frozenset(tag for tag, type_ in models.items() if issubclass(type_, StringAndUUID))
+        return refs, frozenset(models) - refs
+
+    @classmethod
+    def _from_rows(cls, obj_api: 'ObjApi', filtered: list[dict], fields: list[str] = None) -> list['AXLObject']:
+        with profiler.span('validate'):
+            # create objects from values
+            result = [cls.parse_obj(obj_api=obj_api, obj=d, fields=fields) for d in filtered]
+        metrics.inc('axl_objects_total', len(result), type=cls._axl_type)
+        return result
+
+
+AXLObjectT = TypeVar('AXLObjectT', bound=AXLObject)
+
+
+@lru_cache(maxsize=None)
+def lazy_names(cls: type[AXLObject], fields: Optional[frozenset[str]]) -> frozenset[str]:
+    """
+    Names of the attributes of objects which need a get b/c they haven't been read by the list call
+    :param cls: AXL object class
+    :param fields: tags read by the list call; None: all tags which can be read with a list call
+    """
+    return frozenset(field.name for field in cls.__fields__.values()
+                     if field.field_info.extra.get('get_required') or fields is not None and field.alias not in fields)
+
+
+def uuid_key(uuid: str) -> str:
+    """
+    uuid w/o curly braces in upper case
+    """
+    return uuid.strip('{}').upper()
+
 
 class ObjApi:
     """
     Simple API helper
     """
 
-    def __init__(self, zeep_service):
+    def __init__(self, zeep_service, pool: AXLSessionPool = None, retry: RetryPolicy = None,
+                 checkpoint: PageCheckpoint = None, parser: ParsePool = None):
+        """
+
+        :param zeep_service: zeep service to send AXL requests
+        :param pool: if set then requests are sent using a service taken from the pool
+        :param retry: policy for retrying failed operations; default: DEFAULT_RETRY
+        :param checkpoint: if set then pages of list operations are read from/written to this checkpoint
+        :param parser: if set then responses of list operations are parsed by this process pool instead of zeep
+        """
         self.service = zeep_service
+        self.pool = pool
+        self.retry = retry or DEFAULT_RETRY
+        self.checkpoint = checkpoint
+        self.parser = parser
+        # cached list of all objects (see _cached_list()), their class and the tags read for the objects in the list
+        self._list: Optional[list[AXLObject]] = None
+        self._list_cls: Optional[type[AXLObject]] = None
+        self._list_tags: frozenset[str] = frozenset()
+        # arguments of the list call which read the cached list: fields and sharded
+        self._list_args: dict[str, Any] = dict()
+
+    def _cached_list(self, cls: type[AXLObjectT], refresh: bool = False, fields: Iterable[str] = None,
+                     search: dict[str, str] = None, where: str = None, sharded: bool = False) -> list[AXLObjectT]:
+        """
+        List of all objects of a class. The list is read on first call and then cached; a cached list is reused if
+        it has all requested fields. Filtered lists (search, where) are not cached
+        :param cls: AXL object class
+        :param refresh: re-read the list from UCM
+        :param fields: only read these attributes, see AXLObject.do_list()
+        :param search: AXL search criteria, for example {'userid': 'a%'}
+        :param where: SQL predicate on the table of the objects, see list_where()
+        :param sharded: read the list with concurrent prefix searches, see AXLObject.do_list_sharded()
+        :return: list of objects
+        """
+        if search and where:
+            raise ValueError('search criteria and SQL predicate are mutually exclusive')
+        if where:
+            return self.list_where(cls, where)
+        if search:
+            result = cls.do_list(obj_api=self, fields=fields, search=search, resume=not refresh)
+            self._list_completed(cls)
+            return result
+        tags = frozenset(cls.list_tags(fields))
+        if refresh or self._list is None or not tags <= self._list_tags:
+            self._list_cls = cls
+            self._list_tags = tags
+            self._list_args = dict(fields=fields and list(fields), sharded=sharded)
+            # an extraction aborted before can be resumed; a refresh needs current data
+            self._list = self._read_list(resume=not refresh)
+        return self._list
+
+    def _read_list(self, resume: bool) -> list[AXLObject]:
+        """
+        Read the list of all objects of the cached list with the same arguments
+        :param resume: take pages from the checkpoint
+        """
+        fields, sharded = self._list_args['fields'], self._list_args['sharded']
+        if sharded:
+            result = self._list_cls.do_list_sharded(obj_api=self, fields=fields, resume=resume)
+        else:
+            result = self._list_cls.do_list(obj_api=self, fields=fields, resume=resume)
+        self._list_completed(self._list_cls)
+        return result
+
+    def _list_completed(self, cls: type[AXLObject]):
+        """
+        A list has been read completely: the checkpoint is only needed to resume an aborted extraction
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.clear(operation=f'list{cls._axl_type.capitalize()}')
+
+    def reload(self) -> int:
+        """
+        Read the cached list again with the same fields and the same way (sharded or not). The list is updated in
+        place
+        :return: number of objects; 0 if there is no cached list
+        """
+        if self._list is None:
+            return 0
+        self._list[:] = self._read_list(resume=False)
+        return len(self._list)
+
+    def apply_changes(self, changes: Iterable[Change], max_workers: int = None) -> int:
+        """
+        Patch the cached list with changes from the UCM change queue (see ucm_reader.changes). The list and the
+        objects in it are updated in place so that references to them stay valid. Added and updated objects are read
+        with concurrent get calls; an update is skipped if it only changed tags which haven't been read for the object
+        :param changes: changes of objects of the class of the cached list in queue order
+        :param max_workers: number of concurrent get calls; default: size of the session pool
+        :return: number of added, updated and removed objects
+        """
+        if self._list is None:
+            return 0
+        # combine all changes of an object: the last action wins
+        actions: dict[str, str] = {}
+        do_get: dict[str, bool] = {}
+        changed_tags: dict[str, set[str]] = {}
+        for change in changes:
+            key = uuid_key(change.uuid)
+            actions[key] = change.action
+            do_get[key] = do_get.get(key, False) or change.do_get
+            changed_tags.setdefault(key, set()).update(change.changed_tags)
+        cached = {uuid_key(obj.uuid): obj for obj in self._list}
+        removed = {key for key, action in actions.items() if action == REMOVE and key in cached}
+        read = []
+        for key, action in actions.items():
+            if action == REMOVE:
+                continue
+            obj = cached.get(key)
+            if obj is not None and not do_get[key] and not obj._details_read:
+                held = obj._fields if obj._fields is not None else self._list_tags
+                if not changed_tags[key] & held:
+                    # none of the changed tags has been read
+                    continue
+            # noinspection PyProtectedMember
+            read.append(self._list_cls.parse_obj(obj_api=self, obj={'uuid': obj.uuid if obj else f'{{{key}}}'},
+                                                 fields=['uuid']))
+        if max_workers is None:
+            max_workers = self.pool.size if self.pool else 1
+        added = []
+        updated = 0
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='axl-get') as executor:
+            for key, current in zip((uuid_key(obj.uuid) for obj in read), executor.map(self._read_current, read)):
+                obj = cached.get(key)
+                if current is None:
+                    # removed after the change had been logged
+                    if obj is not None:
+                        removed.add(key)
+                elif obj is None:
+                    added.append(current)
+                else:
+                    for name in obj.__fields__:
+                        obj.__setattr__(name, current.__getattribute__(name))
+                    obj._details_read = True
+                    obj._fields = None
+                    updated += 1
+        if removed:
+            self._list[:] = [obj for obj in self._list if uuid_key(obj.uuid) not in removed]
+        self._list.extend(added)
+        log.debug(f'{self._list_cls.__name__}: {len(added)} added, {updated} updated, {len(removed)} removed')
+        return len(added) + updated + len(removed)
+
+    @staticmethod
+    def _read_current(obj: AXLObjectT) -> Optional[AXLObjectT]:
+        """
+        Read the current state of an object; None if the object doesn't exist anymore
+        """
+        try:
+            return obj.read_details()
+        except zeep.exceptions.Fault as e:
+            if not NOT_FOUND.search(e.message or ''):
+                raise
+            return None
+
+    def sql_query(self, sql: str) -> list[dict[str, Optional[str]]]:
+        """
+        Execute a SQL query
+        :param sql: SQL statement
+        :return: rows as dictionaries column -> value
+        """
+        zeep_response = self.call('executeSQLQuery', sql=sql)
+        if zeep_response['return'] is None:
+            return []
+        return [{column.tag: column.text for column in row} for row in zeep_response['return']['row']]
+
+    def list_where(self, cls: type[AXLObjectT], where: str, batch_size: int = DETAILS_BATCH_SIZE,
+                   max_workers: int = None) -> list[AXLObjectT]:
+        """
+        Objects matching a SQL predicate on the database table of the objects. The pkids are selected with a SQL
+        query; the objects are then read with concurrent get calls
+        :param cls: AXL object class
+        :param where: SQL predicate, for example "telephonenumber like '+1408%'" for users (table enduser)
+        :param batch_size: number of objects per batch of get calls
+        :param max_workers: number of concurrent get calls; default: size of the session pool
+        :return: list of (complete) objects
+        """
+        predicate = f'{cls._axl_where} and ({where})' if cls._axl_where else where
+        rows = self.sql_query(f'select pkid from {cls._axl_table} where {predicate}')
+        # uuid of an AXL object is the pkid in upper case in curly braces
+        objects = [cls.parse_obj(obj_api=self, obj={'uuid': f'{{{row["pkid"].upper()}}}'}, fields=['uuid'])
+                   for row in rows]
+        log.debug(f'{len(objects)} {cls._axl_table} rows match "{where}"')
+        return list(self.with_details(objects, batch_size=batch_size, max_workers=max_workers))
+
+    def call(self, operation: str, **kwargs):
+        """
+        Call an AXL operation and record the latency (including parsing of the response) and errors in the metrics.
+        Transient errors are retried according to the retry policy. When profiling the call is recorded as 'fetch'
+        span
+        :param operation: name of the AXL operation, for example 'listUser'
+        :param kwargs: parameters for the AXL operation
+        :return: zeep response
+        """
+        return self.retry.call(operation, self._call, operation, False, **kwargs)
+
+    def call_raw(self, operation: str, **kwargs) -> bytes:
+        """
+        Call an AXL operation like call() but return the SOAP response w/o parsing it. Faults are raised like for
+        call()
+        :param operation: name of the AXL operation, for example 'listUser'
+        :param kwargs: parameters for the AXL operation
+        :return: SOAP envelope
+        """
+        return self.retry.call(operation, self._call, operation, True, **kwargs)
+
+    def _call(self, operation: str, raw: bool, **kwargs):
+        with metrics.timer('axl_operation_seconds', operation=operation), profiler.span('fetch'):
+            try:
+                if self.pool is None:
+                    return self._send(self.service, operation, raw, kwargs)
+                with self.pool.service() as service:
+                    return self._send(service, operation, raw, kwargs)
+            except Exception as e:
+                metrics.inc('axl_operation_errors_total', operation=operation, error=e.__class__.__name__)
+                raise
+
+    @staticmethod
+    def _send(service: zeep.proxy.ServiceProxy, operation: str, raw: bool, kwargs: dict):
+        if not raw:
+            return service[operation](**kwargs)
+        # noinspection PyProtectedMember
+        client, binding = service._client, service._binding
+        # the setting is thread local
+        with client.settings(raw_response=True):
+            response = service[operation](**kwargs)
+        if response.status_code != 200:
+            # zeep raises the fault or transport error
+            binding.process_reply(client, binding.get(operation), response)
+        return response.content
+
+    def with_details(self, objects: Iterable[AXLObjectT], batch_size: int = DETAILS_BATCH_SIZE,
+                     max_workers: int = None) -> Iterator[AXLObjectT]:
+        """
+        Read the details (attributes which require an AXL get) of objects in batches. The get calls of a batch are
+        sent concurrently; objects are yielded as soon as their batch is complete
+        :param objects: objects to read details for, for example from a list() call
+        :param batch_size: number of objects per batch
+        :param max_workers: number of concurrent get calls; default: size of the session pool
+        :return: generator yielding the objects in the original order
+        """
+        if max_workers is None:
+            max_workers = self.pool.size if self.pool else 1
+        objects = iter(objects)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='axl-get') as executor:
+            while batch := list(islice(objects, batch_size)):
+                # map() raises the first exception when iterating over the results
+                yield from executor.map(AXLObject.read_details, batch)
 
 
 class StringAndUUID(BaseModel):
+    """
+    Reference to another AXL object. References are immutable and interned: all references with the same value and
+    uuid created by parsing AXL data are the same object. This saves memory (most phones reference the same few
+    device pools, CSSes, partitions, ...) and grouping by reference only needs an identity check
+    """
+    # interned references are held in a WeakValueDictionary
+    __slots__ = ('__weakref__',)
+
     value: str = Field(None, alias='_value_1')
     uuid: Optional[str]
+
+    class Config:
+        frozen = True
+
+    @classmethod
+    def validate(cls, value) -> 'StringAndUUID':
+        """
+        Called by pydantic to create the reference for an attribute of an AXL object
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict) and value.keys() <= {'_value_1', 'uuid'}:
+            key = (value.get('_value_1'), value.get('uuid'))
+            ref = _references.get(key)
+            if ref is not None:
+                return ref
+        ref = super(StringAndUUID, cls).validate(value)
+        return cls.intern(ref)
+
+    @classmethod
+    def intern(cls, ref: 'StringAndUUID') -> 'StringAndUUID':
+        """
+        Interned reference with the same value and uuid
+        """
+        with _references_lock:
+            return _references.setdefault((ref.value, ref.uuid), ref)
+
+    def __eq__(self, other):
+        return self is other or super(StringAndUUID, self).__eq__(other)
+
+
+# interned references; references which are not used anymore are removed automatically
+_references: WeakValueDictionary[tuple[Optional[str], Optional[str]], StringAndUUID] = WeakValueDictionary()
+_references_lock = Lock()
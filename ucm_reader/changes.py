@@ -0,0 +1,125 @@
+"""
+AXL change notification feed.
+
+UCM records adds, updates and removals of configuration objects in a change queue which can be read with the AXL
+listChange operation. A :class:`ChangeFeed` keeps the position in that queue (queue id and id of the next change): the
+first poll only establishes the position at the end of the queue, each following poll returns the changes since the
+previous poll. :meth:`ucm_reader.UCMReader.refresh` uses the feed to patch the cached lists in place instead of
+reading everything again:
+
+    with UCMReader(host=host, user=user, password=password, track_changes=True) as ucm:
+        users = ucm.user.list()
+        ...
+        ucm.refresh()
+
+If the position in the queue is lost (UCM restarted, the queue wrapped) :meth:`ChangeFeed.poll` returns None and the
+caller has to read everything again.
+"""
+import logging
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple, Optional
+
+import zeep.exceptions
+
+from ucm_reader.metrics import metrics
+
+__all__ = ['ADD', 'UPDATE', 'REMOVE', 'Change', 'ChangeFeed']
+
+log = logging.getLogger(__name__)
+
+ADD = 'a'
+UPDATE = 'u'
+REMOVE = 'r'
+
+
+class Change(NamedTuple):
+    """
+    One entry of the change queue
+    """
+    id: int
+    #: ADD, UPDATE or REMOVE
+    action: str
+    #: AXL object type, for example 'User' or 'Phone'
+    type: str
+    uuid: str
+    #: changed_tags is incomplete; the object has to be read with a get
+    do_get: bool
+    #: tag name -> new value of the changed simple tags
+    changed_tags: dict[str, Optional[str]]
+
+
+class ChangeFeed:
+    """
+    Position in the UCM change queue
+    """
+
+    def __init__(self, call: Callable[..., Any], types: Iterable[str] = None):
+        """
+
+        :param call: function to call an AXL operation with, for example ObjApi.call
+        :param types: only report changes of these AXL object types, for example ['User', 'Phone']; None: all types
+        """
+        self._call = call
+        self.types = list(types) if types else None
+        self.queue_id: Optional[str] = None
+        self.next_change_id: Optional[int] = None
+
+    @property
+    def started(self) -> bool:
+        return self.queue_id is not None
+
+    def _list_change(self, **kwargs):
+        if self.types:
+            kwargs['objectList'] = {'object': self.types}
+        return self._call('listChange', **kwargs)
+
+    def start(self):
+        """
+        Establish the position at the end of the change queue
+        """
+        queue_info = self._list_change()['queueInfo']
+        self.queue_id = queue_info['queueId']
+        self.next_change_id = int(queue_info['nextStartChangeId'])
+        log.debug(f'change queue {self.queue_id}: starting at change {self.next_change_id}')
+
+    def poll(self) -> Optional[list[Change]]:
+        """
+        Changes since the previous poll. The first poll only establishes the position in the change queue
+
+        :return: changes in queue order; None if the feed was not started or the position in the queue has been
+            lost. In that case the feed is restarted at the end of the queue
+        """
+        if not self.started:
+            self.start()
+            return None
+        changes = []
+        while True:
+            try:
+                response = self._list_change(startChangeId={'_value_1': self.next_change_id,
+                                                            'queueId': self.queue_id})
+            except zeep.exceptions.Fault as e:
+                log.warning(f'change queue {self.queue_id}: lost position {self.next_change_id}: {e}')
+                self.start()
+                return None
+            queue_info = response['queueInfo']
+            if queue_info['queueId'] != self.queue_id:
+                log.warning(f'change queue {self.queue_id} replaced by {queue_info["queueId"]}')
+                self.start()
+                return None
+            page = [Change(id=int(change['id']),
+                           action=change['action'],
+                           type=change['type'],
+                           uuid=change['uuid'],
+                           do_get=str(change['doGet']).lower() == 'true',
+                           changed_tags={tag['name']: tag['_value_1']
+                                         for tag in (change['changedTags'] and change['changedTags']['changedTag']
+                                                     or [])})
+                    for change in (response['changes'] and response['changes']['change'] or [])]
+            changes.extend(page)
+            self.next_change_id = int(queue_info['nextStartChangeId'])
+            if not page or self.next_change_id > int(queue_info['lastChangeId']):
+                break
+        for change in changes:
+            metrics.inc('axl_changes_total', type=change.type, action=change.action)
+        log.debug(f'change queue {self.queue_id}: {len(changes)} changes, next change {self.next_change_id}')
+        return changes
@@ -0,0 +1,88 @@
+"""
+Page level checkpoints for AXL list operations.
+
+Large lists are read in pages (see :meth:`ucm_reader.AXLObject.do_list`). With a :class:`PageCheckpoint` each page is
+written to a JSON file as soon as it has been read. If an extraction is aborted (for example b/c UCM was unreachable
+for longer than the retry policy allows) the next run with the same checkpoint directory only reads the pages which
+are missing:
+
+    with UCMReader(host=host, user=user, password=password, checkpoint='axl_checkpoint') as ucm:
+        users = ucm.user.list()
+
+Checkpoints only serve to resume an aborted extraction: once a list has been read completely the pages of the list
+operation are removed, and refreshes of cached lists never read pages from the checkpoint. Pages of an aborted
+extraction are taken as they are: if UCM changed in between, remove the directory (:meth:`PageCheckpoint.clear`) to
+read everything from UCM again.
+"""
+import hashlib
+import json
+import logging
+import os
+from itertools import chain
+from pathlib import Path
+from typing import Any, Optional, Union
+
+__all__ = ['PageCheckpoint']
+
+log = logging.getLogger(__name__)
+
+
+class PageCheckpoint:
+    """
+    Directory with one JSON file per page of a list operation
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    def _file(self, operation: str, returned_tags: list[str], first: Optional[int], skip: Optional[int],
+              search: Optional[dict[str, str]]) -> Path:
+        # the (ordered) returned tags and the search criteria are part of the key: a different class definition or
+        # search needs to read the page again
+        key = '\0'.join(chain(returned_tags, ('',), chain.from_iterable(sorted((search or dict()).items()))))
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self.path / f'{operation}-{first or "all"}-{skip or 0}-{digest}.json'
+
+    def load(self, operation: str, returned_tags: list[str], first: Optional[int] = None,
+             skip: Optional[int] = None, search: dict[str, str] = None) -> Optional[list[dict[str, Any]]]:
+        """
+        Objects of a page read before
+
+        :return: None if there is no checkpoint for the page
+        """
+        path = self._file(operation, returned_tags, first, skip, search)
+        try:
+            with open(path) as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            # incomplete file
+            log.warning(f'ignoring checkpoint {path}: {e}')
+            return None
+        log.debug(f'{operation}: {len(rows)} objects from checkpoint {path}')
+        return rows
+
+    def save(self, operation: str, returned_tags: list[str], first: Optional[int], skip: Optional[int],
+             rows: list[dict[str, Any]], search: dict[str, str] = None):
+        """
+        Write the objects of a page
+        """
+        path = self._file(operation, returned_tags, first, skip, search)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that an aborted run never leaves an incomplete checkpoint
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(rows, f, default=str)
+        os.replace(tmp, path)
+
+    def clear(self, operation: str = None):
+        """
+        Remove checkpoints
+
+        :param operation: only remove the pages of this list operation, for example 'listUser'; default: all pages
+        """
+        if not self.path.is_dir():
+            return
+        for path in self.path.glob(f'{operation}-*.json' if operation else '*.json'):
+            path.unlink()
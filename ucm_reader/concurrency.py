@@ -0,0 +1,187 @@
+"""
+Adaptive concurrency limits (AIMD).
+
+Both UCM (AXL throttle) and Webex (429 with Retry-After) push back when too many requests are in flight. Instead of a
+fixed number of parallel requests :class:`AdaptiveLimit` adjusts the number of requests in flight for one target at
+runtime:
+
+* additive increase: each request which completes without push back while all slots are in use adds 1/limit; i.e.
+  the limit grows by one per round trip of a full window of requests. The limit is not increased while the latency is
+  above ``latency_factor`` times the baseline latency (the lowest latency seen, slowly decaying)
+* multiplicative decrease: a throttled request (429, 503, AXL throttle fault) multiplies the limit by ``decrease``;
+  at most once per ``cooldown`` seconds (default: the smoothed latency, i.e. once per round trip) so that a burst of
+  throttled requests of the same window only counts once
+* Retry-After: no new requests are started before the time given by the server
+
+The limit is a float; the number of requests in flight is ``int(limit)``. :meth:`AdaptiveLimit.slot` is used by
+threads (AXL session pool), :meth:`AdaptiveLimit.aslot` by asyncio code; a limit can only be used from one event loop.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from ucm_reader.metrics import Metrics, metrics
+
+__all__ = ['AdaptiveLimit']
+
+log = logging.getLogger(__name__)
+
+
+class AdaptiveLimit:
+    """
+    AIMD limit for the number of concurrent requests to one target
+    """
+
+    def __init__(self, name: str, initial: float = 4, minimum: float = 1, maximum: float = 50,
+                 decrease: float = 0.5, latency_factor: float = 2.0, cooldown: Optional[float] = None,
+                 registry: Metrics = None):
+        """
+
+        :param name: name of the target; used as label in the metrics
+        :param initial: initial limit
+        :param minimum: lower bound for the limit
+        :param maximum: upper bound for the limit
+        :param decrease: factor applied to the limit when a request is throttled
+        :param latency_factor: no increase while the latency is above this factor times the baseline latency
+        :param cooldown: minimum time in seconds between two decreases; None: smoothed latency of the requests
+        :param registry: metrics registry for the adaptive_limit{target} gauge and the adaptive_throttled_total{target}
+            and adaptive_wait_seconds_total{target} (time spent waiting for a slot) counters
+        """
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.registry = registry or metrics
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        # exponentially weighted moving average of the latency
+        self._latency = 0.0
+        self._last_decrease = 0.0
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._async_changed: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def on_success(self, latency: float):
+        """
+        Record a request which completed w/o push back
+        """
+        with self._lock:
+            # baseline: lowest latency seen; decays slowly so that a permanent change of the latency is picked up
+            if self._baseline is None or latency < self._baseline:
+                self._baseline = latency
+            else:
+                self._baseline *= 1.01
+            self._latency = latency if not self._latency else 0.9 * self._latency + 0.1 * latency
+            # only increase if the limit is actually used
+            if self._in_flight >= self.limit and latency <= self._baseline * self.latency_factor:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._changed.notify_all()
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Record a throttled request
+        """
+        now = time.monotonic()
+        with self._lock:
+            if retry_after:
+                self._not_before = max(self._not_before, now + retry_after)
+            cooldown = self._latency if self.cooldown is None else self.cooldown
+            if now - self._last_decrease >= cooldown:
+                self._last_decrease = now
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                log.debug(f'{self.name}: throttled, limit decreased to {self._limit:.1f}')
+        self.registry.inc('adaptive_throttled_total', target=self.name)
+
+    def _try_acquire(self) -> Optional[float]:
+        """
+        Try to take a slot
+
+        :return: None if a slot was taken, else time to wait (0: wait for a slot to be released)
+        """
+        with self._lock:
+            wait = self._not_before - time.monotonic()
+            if wait > 0:
+                return wait
+            if self._in_flight >= self.limit:
+                return 0
+            self._in_flight += 1
+            return None
+
+    def _waited(self, start: Optional[float]):
+        """
+        Record the time spent waiting for a slot since start (None: no wait)
+        """
+        if start is not None:
+            self.registry.inc('adaptive_wait_seconds_total', time.monotonic() - start, target=self.name)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._changed.notify_all()
+        self.registry.set('adaptive_limit', self._limit, target=self.name)
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """
+        Take a slot for one request (threads). The outcome of the request has to be recorded with :meth:`on_success`
+        or :meth:`on_throttle` within the block
+
+        :param timeout: maximum time in seconds to wait for a slot; None: wait forever
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = None
+        while (wait := self._try_acquire()) is not None:
+            start = start or time.monotonic()
+            wait = wait or 0.1
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waited(start)
+                    raise TimeoutError(f'{self.name}: no slot available after {timeout}s')
+                wait = min(wait, remaining)
+            with self._lock:
+                self._changed.wait(timeout=wait)
+        self._waited(start)
+        try:
+            yield self
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """
+        Take a slot for one request (asyncio), see :meth:`slot`
+        """
+        start = None
+        while (wait := self._try_acquire()) is not None:
+            start = start or time.monotonic()
+            if self._async_changed is None:
+                self._async_changed = asyncio.Condition()
+            async with self._async_changed:
+                try:
+                    await asyncio.wait_for(self._async_changed.wait(), timeout=wait or 0.1)
+                except asyncio.TimeoutError:
+                    pass
+        self._waited(start)
+        try:
+            yield self
+        finally:
+            self._release()
+            if self._async_changed is not None:
+                async with self._async_changed:
+                    self._async_changed.notify_all()
@@ -0,0 +1,671 @@
+"""
+Offline stand-in for the AXL SOAP endpoint of a UCM publisher.
+
+:class:`FakeAXLServer` is a small HTTP server answering the AXL operations used by ``ucm_reader``, ``read_gdpr.py``
+and ``export_to_csv.py`` (list*, get*, executeSQLQuery, listChange) from a :class:`SyntheticCluster`. The client side
+still uses the WSDL shipped with ucmaxl; only the service address is bound to the fake server:
+
+    with FakeAXLServer(SyntheticCluster(users=100000)) as server:
+        with UCMReader(host='ucm', user='axl', password='secret', address=server.url) as ucm:
+            users = ucm.user.list()
+
+Like a real UCM the server answers list requests which would create a too large response with a
+'Query request too large' fault and rejects requests above a concurrency limit with HTTP 503 and a SOAP fault.
+Transient errors (HTTP 502 w/o body) can be injected for a fraction of the requests. Changes of the cluster
+(:meth:`SyntheticCluster.add`, :meth:`SyntheticCluster.update`, :meth:`SyntheticCluster.remove`) are reported by
+listChange.
+
+With a :class:`ucm_reader.recording.Cassette` the server replays recorded exchanges instead (see
+:mod:`ucm_reader.recording`).
+"""
+import gzip
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, List, NamedTuple, Optional, Union
+
+from lxml import etree
+
+from ucm_reader.recording import Cassette
+
+__all__ = ['Ref', 'SyntheticCluster', 'FakeAXLServer']
+
+log = logging.getLogger(__name__)
+
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+# fault string for requests rejected b/c of throttling
+THROTTLED = 'AXL Web Service is busy: maximum number of concurrent requests exceeded'
+
+# maximum number of changes in a listChange response
+MAX_CHANGES = 100
+
+# SQL statements understood by executeSQLQuery: select ... from table [where predicate [and predicate ...]]
+SQL_SELECT = re.compile(r'\s*select\s+(?P<columns>.+?)\s+from\s+(?P<table>\w+)(?:\s+where\s+(?P<where>.+?))?\s*$',
+                        flags=re.IGNORECASE)
+# predicate (optionally in parentheses): column in (...), column like '...', column = '...' or column = number
+SQL_PREDICATE = re.compile(r'\s*\(?\s*(?P<column>\w+)\s+(?:in\s*\((?P<values>[^)]*)\)|'
+                           r'(?P<op>like|=)\s*(?:\'(?P<value>[^\']*)\'|(?P<number>\d+)))\s*\)?\s*',
+                           flags=re.IGNORECASE)
+SQL_AND = re.compile(r'and\b', flags=re.IGNORECASE)
+
+# attributes of AXL objects; everything else is serialized as child element
+ATTRIBUTES = ('uuid', 'ctiid')
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+SITES = [('SJC', '408'), ('RTP', '919'), ('RCD', '972'), ('NYC', '212'), ('BXB', '978'), ('CHI', '312'),
+         ('ATL', '404'), ('SEA', '206'), ('DEN', '720'), ('MIA', '305')]
+CSS_NAMES = ['CSS_Internal', 'CSS_National', 'CSS_International', 'CSS_Emergency']
+
+
+class Ref(NamedTuple):
+    """
+    Reference to another AXL object (XFkType): serialized as element with the name as text and a uuid attribute
+    """
+    value: Optional[str]
+    uuid: Optional[str] = None
+
+
+class SyntheticCluster:
+    """
+    Synthetic, deterministic configuration of a UCM cluster.
+
+    Objects are dictionaries in AXL schema order; keys in :data:`ATTRIBUTES` are serialized as XML attributes,
+    :class:`Ref` instances as references and lists as repeated elements.
+    """
+
+    def __init__(self, users: int = 100, phones: int = None, locations: int = 10, learned_patterns: int = 50,
+                 seed: int = 0):
+        """
+
+        :param users: number of end users
+        :param phones: number of phones; default: one phone per user
+        :param locations: number of site locations (in addition to the system locations Hub_None and Phantom)
+        :param learned_patterns: number of learned patterns in the remoteroutingpattern table
+        :param seed: seed for the random generator
+        """
+        self._rng = random.Random(seed)
+        self._refs: dict[str, Ref] = dict()
+        self._site_count = max(1, locations)
+        phones = users if phones is None else phones
+        self.locations: list[dict[str, Any]] = self._locations(locations)
+        self.users: list[dict[str, Any]] = [self._user(i) for i in range(users)]
+        self.phones: list[dict[str, Any]] = [self._phone(i) for i in range(phones)]
+        self.tables: dict[str, list[dict[str, str]]] = self._tables(learned_patterns)
+        #: change notification queue (listChange): dictionaries with id, action ('a', 'u', 'r'), type, uuid and
+        #: changed tags
+        self.changes: list[dict[str, Any]] = []
+        self.change_queue_id = self.uuid()
+        self._next_change_id = 1
+
+    def uuid(self) -> str:
+        return f'{{{uuid.UUID(int=self._rng.getrandbits(128), version=4)}}}'.upper()
+
+    def ref(self, value: str) -> Ref:
+        # references to the same object always carry the same uuid
+        if value not in self._refs:
+            self._refs[value] = Ref(value, self.uuid())
+        return self._refs[value]
+
+    def site(self, i: int) -> tuple[str, str]:
+        """
+        site name and NPA for the i-th user or phone
+        """
+        site = i % self._site_count
+        name, npa = SITES[site % len(SITES)]
+        if self._site_count > len(SITES):
+            name = f'{name}{site // len(SITES)}'
+        return name, npa
+
+    def telephone_number(self, i: int) -> str:
+        _, npa = self.site(i)
+        return f'+1{npa}{2000000 + i:07d}'
+
+    def _locations(self, count: int) -> list[dict[str, Any]]:
+        names = ['Hub_None', 'Phantom']
+        names.extend(self.site(i)[0] for i in range(count))
+        return [dict(name=name, id=i + 1, withinAudioBandwidth=0, withinVideoBandwidth=0, withinImmersiveKbits=0,
+                     uuid=self.ref(name).uuid)
+                for i, name in enumerate(names)]
+
+    def _user(self, i: int) -> dict[str, Any]:
+        userid = f'user{i:06d}'
+        tn = self.telephone_number(i)
+        # some users have inconsistent or missing data to exercise the consistency checks
+        pattern = tn if i % 50 else f'{tn[:-4]}9999'
+        return dict(firstName=self._rng.choice(FIRST_NAMES),
+                    middleName=None,
+                    lastName=self._rng.choice(LAST_NAMES),
+                    userid=userid,
+                    mailid=f'{userid}@example.com' if i % 97 else None,
+                    department=f'Dept{i % 20:02d}',
+                    manager=None,
+                    primaryExtension=dict(pattern=f'\\{pattern}', routePartitionName='DN'),
+                    directoryUri=f'{userid}@example.com',
+                    telephoneNumber=tn,
+                    title=None,
+                    mobileNumber=None,
+                    homeNumber=None,
+                    pagerNumber=None,
+                    userIdentity=userid,
+                    convertUserAccount=Ref(None),
+                    uuid=self.uuid())
+
+    def _phone(self, i: int) -> dict[str, Any]:
+        site, _ = self.site(i)
+        owner = self.users[i % len(self.users)] if self.users else None
+        tn = self.telephone_number(i)
+        line = dict(index=1,
+                    label=None,
+                    display=owner and f'{owner["firstName"]} {owner["lastName"]}',
+                    dirn=dict(pattern=f'\\{tn}', routePartitionName=self.ref('DN'), uuid=self.ref(tn).uuid),
+                    displayAscii=None,
+                    e164Mask=tn,
+                    speedDial=None,
+                    partitionUsage='General',
+                    associatedEndusers=owner and dict(enduser=[dict(userId=owner['userid'])]),
+                    ctiid=i + 1)
+        speed_dials = [dict(dirn=self.telephone_number(i + j), label=f'SD{j}', index=j) for j in range(1, i % 3 + 1)]
+        return dict(name=f'SEP{0x001122000000 + i:012X}',
+                    description=f'Phone {i} at {site}',
+                    product='Cisco 8865',
+                    model='Cisco 8865',
+                    **{'class': 'Phone'},
+                    protocol='SIP',
+                    protocolSide='User',
+                    callingSearchSpaceName=self.ref(CSS_NAMES[i % len(CSS_NAMES)]),
+                    devicePoolName=self.ref(f'DP_{site}'),
+                    commonDeviceConfigName=self.ref(f'CDC_{site}'),
+                    commonPhoneConfigName=self.ref('Standard Common Phone Profile'),
+                    networkLocation='Use System Default',
+                    locationName=self.ref(site),
+                    mediaResourceListName=self.ref(f'MRGL_{site}'),
+                    securityProfileName=self.ref('Cisco 8865 - Standard SIP Non-Secure Profile'),
+                    sipProfileName=self.ref('Standard SIP Profile'),
+                    cgpnTransformationCssName=Ref(None),
+                    useDevicePoolCgpnTransformCss='true',
+                    lines=dict(line=[line]),
+                    numberOfButtons=5,
+                    phoneTemplateName=self.ref('Standard 8865 SIP'),
+                    speeddials=dict(speeddial=speed_dials) if speed_dials else None,
+                    busyLampFields=None,
+                    primaryPhoneName=Ref(None),
+                    blfDirectedCallParks=None,
+                    softkeyTemplateName=self.ref('Standard User'),
+                    loginUserId=None,
+                    defaultProfileName=Ref(None),
+                    enableExtensionMobility='false',
+                    currentProfileName=Ref(None),
+                    loginTime=None,
+                    loginDuration=None,
+                    ownerUserName=Ref(owner and owner['userid'], owner and owner['uuid']),
+                    subscribeCallingSearchSpaceName=Ref(None),
+                    rerouteCallingSearchSpaceName=Ref(None),
+                    presenceGroupName=self.ref('Standard Presence group'),
+                    ctiid=i + 1,
+                    uuid=self.uuid())
+
+    def _tables(self, learned_patterns: int) -> dict[str, list[dict[str, str]]]:
+        catalogs = [dict(peerid=self.uuid().strip('{}').lower(), routestring=route_string)
+                    for route_string in ('us.route', 'emea.route', 'apac.route')]
+        keys = [dict(remotecatalogkey_id=self.uuid().strip('{}').lower(), remoteclusteruricatalog_peerid=c['peerid'])
+                for c in catalogs]
+        patterns = []
+        for i in range(learned_patterns):
+            key = keys[i % len(keys)]
+            if i % 5 == 4:
+                # patterns with enumerations need to be expanded by read_gdpr.normalize
+                pattern = f'8{i % 90 + 10}[1-4]XXX'
+            else:
+                pattern = f'+1{SITES[i % len(SITES)][1]}{555000 + i:06d}XX'
+            patterns.append(dict(remotecatalogkey_id=key['remotecatalogkey_id'], pattern=pattern,
+                                 tkpatternusage=str(25 + i % 2)))
+        enduser = [dict(pkid=u['uuid'].strip('{}').lower(), userid=u['userid'], firstname=u['firstName'],
+                        lastname=u['lastName'], mailid=u['mailid'] or '', telephonenumber=u['telephoneNumber'],
+                        department=u['department'])
+                   for u in self.users]
+        # tkclass 1: phone
+        device = [dict(pkid=p['uuid'].strip('{}').lower(), name=p['name'], description=p['description'], tkclass='1')
+                  for p in self.phones]
+        return dict(remoteclusteruricatalog=catalogs, remotecatalogkey=keys, remoteroutingpattern=patterns,
+                    enduser=enduser, device=device)
+
+    def objects(self, axl_type: str) -> list[dict[str, Any]]:
+        """
+        all objects of a given AXL type ('user', 'phone', 'location')
+        """
+        return {'user': self.users, 'phone': self.phones, 'location': self.locations}[axl_type]
+
+    def _log_change(self, action: str, axl_type: str, uuid: str, changed_tags: dict[str, Any] = None):
+        self.changes.append(dict(id=self._next_change_id, action=action, type=axl_type[0].upper() + axl_type[1:],
+                                 uuid=uuid, changed_tags=changed_tags or dict()))
+        self._next_change_id += 1
+
+    def add(self, axl_type: str, obj: dict[str, Any] = None) -> dict[str, Any]:
+        """
+        Add an object and log the change. SQL tables are not updated
+
+        :param axl_type: 'user', 'phone' or 'location'
+        :param obj: object to add; default: the next synthetic user or phone
+        :return: added object
+        """
+        objects = self.objects(axl_type)
+        if obj is None:
+            obj = {'user': self._user, 'phone': self._phone}[axl_type](len(objects))
+        objects.append(obj)
+        self._log_change('a', axl_type, obj['uuid'])
+        return obj
+
+    def update(self, axl_type: str, uuid: str, **values) -> dict[str, Any]:
+        """
+        Update attributes of an object and log the change with the changed tags
+        """
+        obj = next(o for o in self.objects(axl_type) if o['uuid'] == uuid)
+        obj.update(values)
+        self._log_change('u', axl_type, uuid, changed_tags=values)
+        return obj
+
+    def remove(self, axl_type: str, uuid: str):
+        """
+        Remove an object and log the change
+        """
+        objects = self.objects(axl_type)
+        objects[:] = [o for o in objects if o['uuid'] != uuid]
+        self._log_change('r', axl_type, uuid)
+
+
+class AXLFault(Exception):
+    def __init__(self, message: str, request: str, code: int = -1):
+        super().__init__(message)
+        self.message = message
+        self.request = request
+        self.code = code
+
+
+def like(pattern: str) -> re.Pattern:
+    """
+    Regular expression for an AXL search criteria value; '%' is the wildcard
+    """
+    return re.compile('.*'.join(re.escape(p) for p in pattern.split('%')) + '$', flags=re.IGNORECASE)
+
+
+def sql_predicates(where: str) -> Optional[list[Callable[[dict[str, str]], bool]]]:
+    """
+    Filters for the predicates of a SQL where clause; only conjunctions of the predicates in SQL_PREDICATE
+
+    :return: None if the where clause isn't understood
+    """
+    result = []
+    pos = 0
+    while True:
+        m = SQL_PREDICATE.match(where, pos)
+        if m is None:
+            return None
+        column = m.group('column')
+        if m.group('values') is not None:
+            values = {v.strip().strip('\'"') for v in m.group('values').split(',')}
+            result.append(lambda row, column=column, values=values: row.get(column) in values)
+        elif m.group('op').lower() == 'like':
+            # only the % wildcard for LIKE
+            regex = like(m.group('value') or '')
+            result.append(lambda row, column=column, regex=regex: regex.match(row.get(column) or '') is not None)
+        else:
+            value = m.group('value') if m.group('value') is not None else m.group('number')
+            result.append(lambda row, column=column, value=value: row.get(column) == value)
+        pos = m.end()
+        if pos == len(where):
+            return result
+        if (m := SQL_AND.match(where, pos)) is None:
+            return None
+        pos = m.end()
+
+
+def text_value(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def add_element(parent: etree._Element, tag: str, value: Any):
+    """
+    Serialize a value as child element of parent
+    """
+    if isinstance(value, list):
+        for v in value:
+            add_element(parent, tag, v)
+        return
+    element = etree.SubElement(parent, tag)
+    if isinstance(value, Ref):
+        element.text = value.value
+        element.set('uuid', value.uuid or '')
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            if k in ATTRIBUTES:
+                element.set(k, text_value(v) or '')
+            else:
+                add_element(element, k, v)
+    else:
+        element.text = text_value(value)
+
+
+class FakeAXLServer:
+    """
+    Local HTTP server answering AXL SOAP requests from a :class:`SyntheticCluster` or from recorded responses
+    """
+
+    def __init__(self, cluster: SyntheticCluster = None, *, host: str = '127.0.0.1', port: int = 0,
+                 max_response_bytes: int = 2000000, max_concurrent: int = None, latency: float = 0.0,
+                 recorded: Union[str, Path, dict[str, bytes]] = None, gzip: bool = False, error_rate: float = 0.0,
+                 seed: int = 0, cassette: Cassette = None):
+        """
+
+        :param cluster: data to serve; default: a cluster with 100 users
+        :param host: address to listen on
+        :param port: port to listen on; 0: pick a free port
+        :param max_response_bytes: list requests creating a larger response are rejected with a
+            'Query request too large' fault
+        :param max_concurrent: if set, requests exceeding this number of concurrent requests are rejected with a 503
+            (AXL throttling)
+        :param latency: processing time in seconds added to each request
+        :param recorded: recorded responses: either a dictionary operation name -> SOAP envelope or a directory with
+            one <operation name>.xml file per operation. A recorded response is returned verbatim for each request
+            of that operation
+        :param gzip: compress responses if the client accepts gzip encoding
+        :param error_rate: fraction of requests answered with a transient error (HTTP 502)
+        :param seed: seed for the random generator deciding which requests fail
+        :param cassette: recorded exchanges: each request is answered with the recorded response for the same request;
+            requests which haven't been recorded are answered with a fault. The cluster is not used
+        """
+        self.cluster = cluster or SyntheticCluster()
+        self.max_response_bytes = max_response_bytes
+        self.max_concurrent = max_concurrent
+        self.latency = latency
+        self.gzip = gzip
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        if isinstance(recorded, (str, Path)):
+            recorded = {p.stem: p.read_bytes() for p in Path(recorded).glob('*.xml')}
+        self.recorded: dict[str, bytes] = recorded or dict()
+        self.cassette = cassette
+        #: number of requests per operation
+        self.requests: dict[str, int] = dict()
+        #: number of requests rejected b/c of throttling
+        self.throttled = 0
+        #: number of requests answered with an injected transient error
+        self.errors = 0
+        #: number of accepted TCP connections
+        self.connections = 0
+        #: highest number of requests handled concurrently
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/axl/'
+
+    def start(self) -> 'FakeAXLServer':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name='FakeAXLServer', daemon=True)
+            self._thread.start()
+            log.debug(f'fake AXL server listening on {self.url}')
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def bind(self, axl):
+        """
+        Point an existing AXLHelper to this server
+        """
+        # avoid circular import
+        from ucm_reader.base import bind_address
+        axl.service = bind_address(axl.service, self.url)
+        return axl
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately; w/o this each response is delayed by the delayed ACK
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, response = server.handle(body)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/xml; charset=utf-8')
+                if server.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    response = gzip.compress(response, compresslevel=1)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, fmt, *args):
+                log.debug(fmt % args)
+
+        return Handler
+
+    def handle(self, body: bytes) -> tuple[int, bytes]:
+        """
+        Handle one SOAP request
+
+        :return: HTTP status and response body
+        """
+        request = etree.fromstring(body, parser=etree.XMLParser(huge_tree=True))
+        operation = next(iter(request.find(f'{{{SOAP_ENV}}}Body')))
+        namespace, name = etree.QName(operation).namespace, etree.QName(operation).localname
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            throttled = self.max_concurrent is not None and self._in_flight > self.max_concurrent
+            if throttled:
+                self.throttled += 1
+            failed = not throttled and self.error_rate and self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        try:
+            if throttled:
+                return 503, self.fault(AXLFault(THROTTLED, request=name))
+            if failed:
+                return 502, b''
+            if self.latency:
+                time.sleep(self.latency)
+            if name in self.recorded:
+                return 200, self.recorded[name]
+            if self.cassette is not None:
+                replayed = self.cassette.lookup(body)
+                if replayed is None:
+                    return 500, self.fault(AXLFault(f'no recorded response for {name} request', request=name))
+                return replayed
+            try:
+                result = self.dispatch(name, operation)
+            except AXLFault as fault:
+                return 500, self.fault(fault)
+            return 200, self.envelope(namespace, name, result)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def dispatch(self, name: str, operation: etree._Element) -> Union[etree._Element, list[etree._Element], None]:
+        """
+        Execute an AXL operation
+
+        :return: 'return' element of the response (or a list of elements for operations w/o 'return' element)
+        """
+        if name == 'executeSQLQuery':
+            return self.sql_query(operation.findtext('sql'))
+        if name == 'listChange':
+            return self.list_change(operation)
+        if m := re.match(r'(list|get)(\w+)$', name):
+            axl_type = m.group(2)[0].lower() + m.group(2)[1:]
+            try:
+                self.cluster.objects(axl_type)
+            except KeyError:
+                pass
+            else:
+                if m.group(1) == 'list':
+                    return self.list(name, axl_type, operation)
+                return self.get(name, axl_type, operation)
+        raise AXLFault(f'Operation {name} not supported by fake AXL server', request=name, code=5007)
+
+    def list(self, name: str, axl_type: str, operation: etree._Element) -> etree._Element:
+        criteria = [(child.tag, like(child.text or ''))
+                    for child in operation.find('searchCriteria')]
+
+        def matches(obj: dict[str, Any]) -> bool:
+            for tag, regex in criteria:
+                value = obj.get(tag)
+                if isinstance(value, Ref):
+                    value = value.value
+                if not regex.match(text_value(value) or ''):
+                    return False
+            return True
+
+        matched = [obj for obj in self.cluster.objects(axl_type) if matches(obj)]
+        total = len(matched)
+        skip = int(operation.findtext('skip') or 0)
+        first = operation.findtext('first')
+        matched = matched[skip:skip + int(first)] if first else matched[skip:]
+        returned_tags = operation.find('returnedTags')
+        tags = [child.tag for child in returned_tags] if returned_tags is not None else []
+        result = etree.Element('return')
+        if not matched:
+            return result
+
+        def add(obj: dict[str, Any]):
+            if tags:
+                # only the requested tags in the requested order; AXL always returns the attributes
+                values = {tag: obj.get(tag) for tag in tags}
+                values.update((a, obj[a]) for a in ATTRIBUTES if a in obj)
+            else:
+                values = obj
+            add_element(result, axl_type, values)
+
+        # AXL limits the size of the response; estimate the size from the first object
+        add(matched[0])
+        row_size = len(etree.tostring(result[0]))
+        max_rows = max(1, self.max_response_bytes // row_size)
+        if len(matched) > max_rows:
+            raise AXLFault(f'Query request too large. Total rows matched: {total} rows. '
+                           f'Suggestive Row Fetch: less than {max_rows} rows', request=name, code=-1)
+        for obj in matched[1:]:
+            add(obj)
+        return result
+
+    def get(self, name: str, axl_type: str, operation: etree._Element) -> etree._Element:
+        key, value = next(((child.tag, child.text) for child in operation
+                           if child.tag in ('uuid', 'name', 'userid')), (None, None))
+        obj = next((o for o in self.cluster.objects(axl_type)
+                    if key and (o.get(key) or '').lower() == (value or '').lower()), None)
+        if obj is None:
+            raise AXLFault(f'Item not valid: The specified {axl_type} was not found', request=name, code=5007)
+        result = etree.Element('return')
+        add_element(result, axl_type, obj)
+        return result
+
+    def sql_query(self, sql: str) -> etree._Element:
+        m = SQL_SELECT.match(sql)
+        predicates = sql_predicates(m.group('where')) if m and m.group('where') else []
+        if m is None or predicates is None or m.group('table') not in self.cluster.tables:
+            raise AXLFault(f'Cannot execute SQL statement: {sql}', request='executeSQLQuery', code=-201)
+        rows = [row for row in self.cluster.tables[m.group('table')]
+                if all(predicate(row) for predicate in predicates)]
+        columns = m.group('columns').split(',')
+        result = etree.Element('return')
+        for row in rows:
+            add_element(result, 'row', row if columns == ['*'] else {c.strip(): row.get(c.strip()) for c in columns})
+        return result
+
+    def list_change(self, operation: etree._Element) -> List[etree._Element]:
+        """
+        Change notifications since startChangeId; w/o startChangeId only the queue info is returned
+        """
+        cluster = self.cluster
+        types = {e.text for e in operation.iterfind('objectList/object')}
+        first_id = cluster.changes[0]['id'] if cluster.changes else cluster._next_change_id
+        next_id = cluster._next_change_id
+        selected = []
+        start = operation.find('startChangeId')
+        if start is not None:
+            start_id = int(start.text)
+            if start.get('queueId') != cluster.change_queue_id or not first_id <= start_id <= next_id:
+                raise AXLFault(f'Invalid startChangeId {start_id} for queue {start.get("queueId")}',
+                               request='listChange', code=5003)
+            selected = [c for c in cluster.changes if c['id'] >= start_id and (not types or c['type'] in types)]
+            if len(selected) > MAX_CHANGES:
+                selected = selected[:MAX_CHANGES]
+                next_id = selected[-1]['id'] + 1
+        queue_info = etree.Element('queueInfo')
+        add_element(queue_info, 'firstChangeId', first_id)
+        add_element(queue_info, 'lastChangeId', cluster._next_change_id - 1)
+        add_element(queue_info, 'nextStartChangeId', next_id)
+        add_element(queue_info, 'queueId', cluster.change_queue_id)
+        changes = etree.Element('changes')
+        for c in selected:
+            change = etree.SubElement(changes, 'change', type=c['type'], uuid=c['uuid'])
+            add_element(change, 'id', c['id'])
+            add_element(change, 'action', c['action'])
+            add_element(change, 'doGet', c['action'] != 'r' and not c['changed_tags'])
+            changed_tags = etree.SubElement(change, 'changedTags')
+            for tag, value in c['changed_tags'].items():
+                # like UCM only the value of simple tags is reported
+                changed_tag = etree.SubElement(changed_tags, 'changedTag', name=tag)
+                changed_tag.text = value.value if isinstance(value, Ref) else text_value(value)
+        return [queue_info, changes]
+
+    @staticmethod
+    def envelope(namespace: str, name: str, result: Union[etree._Element, List[etree._Element], None]) -> bytes:
+        envelope = etree.Element(f'{{{SOAP_ENV}}}Envelope', nsmap={'soapenv': SOAP_ENV})
+        body = etree.SubElement(envelope, f'{{{SOAP_ENV}}}Body')
+        response = etree.SubElement(body, f'{{{namespace}}}{name}Response', nsmap={'ns': namespace})
+        if isinstance(result, list):
+            response.extend(result)
+        elif result is not None:
+            response.append(result)
+        return etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')
+
+    @staticmethod
+    def fault(fault: AXLFault) -> bytes:
+        envelope = etree.Element(f'{{{SOAP_ENV}}}Envelope', nsmap={'soapenv': SOAP_ENV})
+        body = etree.SubElement(envelope, f'{{{SOAP_ENV}}}Body')
+        soap_fault = etree.SubElement(body, f'{{{SOAP_ENV}}}Fault')
+        etree.SubElement(soap_fault, 'faultcode').text = 'soapenv:Server'
+        etree.SubElement(soap_fault, 'faultstring').text = fault.message
+        axl_error = etree.SubElement(etree.SubElement(soap_fault, 'detail'), 'axlError')
+        etree.SubElement(axl_error, 'axlcode').text = str(fault.code)
+        etree.SubElement(axl_error, 'axlmessage').text = fault.message
+        etree.SubElement(axl_error, 'request').text = fault.request
+        return etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')
@@ -0,0 +1,274 @@
+"""
+Hash indexes across UCM users, phones, lines and locations.
+
+:class:`UCMInventory` sits on top of a :class:`ucm_reader.UCMReader` and builds indexes lazily on first use: each
+index is built with a single pass over the (cached) list of the respective objects so that correlating entities
+(the phones of a user, the owners of a DN, the location of a phone) are dictionary lookups instead of nested loops.
+
+    inventory = UCMInventory(ucm_reader)
+    for phone in inventory.phones_of('jdoe'):
+        print(phone.name, inventory.phone_location(phone).name)
+
+Indexes on lines (DN + partition) need phone details; these are read with concurrent getPhone calls in batches the
+first time such an index is used.
+
+With a reader which tracks UCM changes (``UCMReader(track_changes=True)``) ``refresh(incremental=True)`` only reads
+the changed objects and only drops the indexes on the changed object types; the indexes are rebuilt from the patched
+lists w/o AXL requests.
+
+Numbers are also indexed by their canonical E.164 representation (see :class:`ucm_reader.numbers.NumberPlan`) so
+that '+14085551234', '\\+14085551234', '4085551234' and extension 1234 in a site with prefix +1408555 all find the
+same users and phones:
+
+    inventory = UCMInventory(ucm_reader, number_plan=NumberPlan(site_prefixes={'SJC': '+1408555'}))
+    users = inventory.users_with_number('(408) 555-1234')
+"""
+import logging
+from collections import defaultdict
+from functools import cached_property
+from collections.abc import Iterable
+from typing import Optional
+
+from ucm_reader.locations import Location
+from ucm_reader.numbers import NumberPlan, apply_mask, index_numbers
+from ucm_reader.phone import Line, Phone
+from ucm_reader.reader import UCMReader
+from ucm_reader.user import User
+
+__all__ = ['DNKey', 'dn_key', 'line_key', 'UCMInventory']
+
+log = logging.getLogger(__name__)
+
+# key of a DN: pattern and partition name ('' for the null partition)
+DNKey = tuple[str, str]
+
+
+def dn_key(pattern: str, partition: Optional[str]) -> DNKey:
+    return pattern, partition or ''
+
+
+def line_key(line: Line) -> DNKey:
+    partition = line.dirn.routePartitionName
+    return dn_key(line.dirn.pattern, partition and partition.value)
+
+
+# AXL object type of the objects in each index
+INDEX_TYPES = {'users_by_uuid': 'user', 'users_by_id': 'user', 'users_by_extension': 'user',
+               'users_by_number': 'user',
+               'phones_by_uuid': 'phone', 'phones_by_name': 'phone', 'phones_by_owner': 'phone',
+               'phones_by_location': 'phone', 'phones_by_dn': 'phone', 'phones_by_number': 'phone',
+               'locations_by_uuid': 'location', 'locations_by_name': 'location'}
+
+
+class UCMInventory:
+    """
+    Lazily built indexes by uuid, userid, device name, DN + partition and location name with reverse relations
+    """
+
+    def __init__(self, reader: UCMReader, user_fields: Iterable[str] = None, phone_fields: Iterable[str] = None,
+                 number_plan: NumberPlan = None):
+        """
+
+        :param reader: reader to read the objects with
+        :param user_fields: attributes of users to read, see UserApi.list(); None: all
+        :param phone_fields: attributes of phones to read, see PhoneApi.list(); None: all
+        :param number_plan: plan to normalize numbers for the indexes by E.164 number; default: NANP w/o site prefixes
+        """
+        self.reader = reader
+        self.user_fields = user_fields
+        self.phone_fields = phone_fields
+        self.number_plan = number_plan or NumberPlan()
+
+    def refresh(self, incremental: bool = False):
+        """
+        Re-read all objects from UCM and drop all indexes
+        :param incremental: only read the objects changed since the previous refresh (see UCMReader.refresh()) and
+            only drop the indexes on types with changes
+        """
+        if incremental:
+            changed = {axl_type for axl_type, count in self.reader.refresh().items() if count}
+        else:
+            self.reader.user.list(refresh=True, fields=self.user_fields)
+            self.reader.phone.list(refresh=True, fields=self.phone_fields)
+            self.reader.location.list(refresh=True)
+            changed = set(INDEX_TYPES.values())
+        for name, axl_type in INDEX_TYPES.items():
+            if axl_type in changed:
+                self.__dict__.pop(name, None)
+
+    def _users(self) -> list[User]:
+        return self.reader.user.list(fields=self.user_fields)
+
+    def _phones(self) -> list[Phone]:
+        return self.reader.phone.list(fields=self.phone_fields)
+
+    # indexes on a single object type
+
+    @cached_property
+    def users_by_uuid(self) -> dict[str, User]:
+        return {user.uuid: user for user in self._users()}
+
+    @cached_property
+    def users_by_id(self) -> dict[str, User]:
+        return {user.userid: user for user in self._users() if user.userid}
+
+    @cached_property
+    def phones_by_uuid(self) -> dict[str, Phone]:
+        return {phone.uuid: phone for phone in self._phones()}
+
+    @cached_property
+    def phones_by_name(self) -> dict[str, Phone]:
+        return {phone.name: phone for phone in self._phones()}
+
+    @cached_property
+    def locations_by_uuid(self) -> dict[str, Location]:
+        return {location.uuid: location for location in self.reader.location.list()}
+
+    @cached_property
+    def locations_by_name(self) -> dict[str, Location]:
+        return {location.name: location for location in self.reader.location.list()}
+
+    # reverse relations
+
+    @cached_property
+    def phones_by_owner(self) -> dict[str, list[Phone]]:
+        """
+        Phones by userid of the owner
+        """
+        result = defaultdict(list)
+        for phone in self._phones():
+            if phone.ownerUserName and phone.ownerUserName.value:
+                result[phone.ownerUserName.value].append(phone)
+        return dict(result)
+
+    @cached_property
+    def phones_by_location(self) -> dict[str, list[Phone]]:
+        """
+        Phones by location name
+        """
+        result = defaultdict(list)
+        for phone in self._phones():
+            if phone.locationName and phone.locationName.value:
+                result[phone.locationName.value].append(phone)
+        return dict(result)
+
+    @cached_property
+    def users_by_extension(self) -> dict[DNKey, list[User]]:
+        """
+        Users by DN + partition of their primary extension
+        """
+        result = defaultdict(list)
+        for user in self._users():
+            if user.primaryExtension and user.primaryExtension.pattern:
+                result[dn_key(user.primaryExtension.pattern, user.primaryExtension.routePartitionName)].append(user)
+        return dict(result)
+
+    @cached_property
+    def phones_by_dn(self) -> dict[DNKey, list[Phone]]:
+        """
+        Phones by DN + partition of their lines. Reads phone details
+        """
+        result = defaultdict(list)
+        for phone in self.reader.phone.details(self._phones()):
+            for line in phone.lines.line if phone.lines else []:
+                result[line_key(line)].append(phone)
+        log.debug(f'indexed {len(result)} DNs')
+        return dict(result)
+
+    @cached_property
+    def users_by_number(self) -> dict[str, list[User]]:
+        """
+        Users by E.164 representation of their telephone number and primary extension
+        """
+        return index_numbers(self._users(),
+                             lambda user: (user.telephoneNumber,
+                                           user.primaryExtension and user.primaryExtension.pattern),
+                             self.number_plan)
+
+    @cached_property
+    def phones_by_number(self) -> dict[str, list[Phone]]:
+        """
+        Phones by E.164 representation of the DNs of their lines; extensions are resolved with the site prefix of the
+        phone's location or the external phone number mask of the line. Reads phone details
+        """
+        result = defaultdict(list)
+        normalize = self.number_plan.normalize
+        for phone in self.reader.phone.details(self._phones()):
+            site = phone.locationName and phone.locationName.value
+            numbers = set()
+            for line in phone.lines.line if phone.lines else []:
+                pattern = line.dirn.pattern
+                e164 = normalize(pattern, site) or normalize(apply_mask(pattern, line.e164Mask), site)
+                if e164 is not None and e164 not in numbers:
+                    numbers.add(e164)
+                    result[e164].append(phone)
+        log.debug(f'indexed {len(result)} numbers')
+        return dict(result)
+
+    # lookups
+
+    def user(self, userid: str) -> Optional[User]:
+        return self.users_by_id.get(userid)
+
+    def phone(self, name: str) -> Optional[Phone]:
+        return self.phones_by_name.get(name)
+
+    def location(self, name: str) -> Optional[Location]:
+        return self.locations_by_name.get(name)
+
+    def phones_of(self, userid: str) -> list[Phone]:
+        """
+        Phones owned by a user
+        """
+        return self.phones_by_owner.get(userid, [])
+
+    def owner(self, phone: Phone) -> Optional[User]:
+        """
+        Owner of a phone
+        """
+        return self.users_by_id.get(phone.ownerUserName and phone.ownerUserName.value)
+
+    def phone_location(self, phone: Phone) -> Optional[Location]:
+        """
+        Location of a phone
+        """
+        return self.locations_by_name.get(phone.locationName and phone.locationName.value)
+
+    def phones_with_dn(self, pattern: str, partition: Optional[str] = None) -> list[Phone]:
+        """
+        Phones with a line on a DN. Reads phone details on first use
+        """
+        return self.phones_by_dn.get(dn_key(pattern, partition), [])
+
+    def dn_owners(self, pattern: str, partition: Optional[str] = None) -> list[User]:
+        """
+        Users owning a DN: users with the DN as primary extension, owners of phones with a line on the DN and end users
+        associated with such a line; in this order w/o duplicates. Reads phone details on first use
+        """
+        key = dn_key(pattern, partition)
+        userids = [user.userid for user in self.users_by_extension.get(key, [])]
+        for phone in self.phones_by_dn.get(key, []):
+            if phone.ownerUserName and phone.ownerUserName.value:
+                userids.append(phone.ownerUserName.value)
+            for line in phone.lines.line:
+                if line_key(line) == key and line.associatedEndusers:
+                    userids.extend(end_user.userId for end_user in line.associatedEndusers.enduser)
+        return [self.users_by_id[userid] for userid in dict.fromkeys(userids) if userid in self.users_by_id]
+
+    def users_with_number(self, number: str, site: Optional[str] = None) -> list[User]:
+        """
+        Users with a number in any format as telephone number or primary extension
+
+        :param site: site (location) name to resolve an extension
+        """
+        e164 = self.number_plan.normalize(number, site)
+        return self.users_by_number.get(e164, []) if e164 else []
+
+    def phones_with_number(self, number: str, site: Optional[str] = None) -> list[Phone]:
+        """
+        Phones with a line on a number in any format. Reads phone details on first use
+
+        :param site: site (location) name to resolve an extension
+        """
+        e164 = self.number_plan.normalize(number, site)
+        return self.phones_by_number.get(e164, []) if e164 else []
@@ -1,5 +1,6 @@
 from ucm_reader.base import AXLObject, ObjApi
-from typing import Optional, List
+from ucm_reader.pool import AXLSessionPool
+from typing import Optional, List, Iterable
 
 __all__ = ['Location', 'LocationApi']
 
@@ -7,6 +8,7 @@ __all__ = ['Location', 'LocationApi']
 class Location(AXLObject):
     _axl_search = 'name'
     _axl_type = 'location'
+    _axl_table = 'location'
 
     uuid: str
     name: Optional[str]
@@ -18,16 +20,21 @@ class Location(AXLObject):
 
 
 class LocationApi(ObjApi):
-    def __init__(self, zeep_service):
-        super(LocationApi, self).__init__(zeep_service)
-        self._list: Optional[List[Location]] = None
+    def __init__(self, zeep_service, pool: AXLSessionPool = None, **kwargs):
+        super(LocationApi, self).__init__(zeep_service, pool=pool, **kwargs)
 
-    def list(self, refresh=False) -> List[Location]:
+    def list(self, refresh=False, fields: Iterable[str] = None, search: dict[str, str] = None, where: str = None,
+             sharded: bool = False) -> List[Location]:
         """
         Get list of UCM locations. Retrieve the list from UCM on 1st call
         :param refresh: if True then don't return cached list and instead re-read the list from UCM via AXl
+        :param fields: only read these attributes (and uuid) to get smaller responses; other attributes are read with
+            a get on first access. A cached list which has all requested attributes is returned as is
+        :param search: only read locations matching these AXL search criteria ('%' as wildcard), for example
+            {'name': 'SJC%'}; the result is not cached
+        :param where: only read locations matching this SQL predicate on the location table, for example
+            "name like 'SJC%'"; the result is not cached
+        :param sharded: read all locations with concurrent prefix searches instead of a single search
         :return:
         """
-        if refresh or self._list is None:
-            self._list = Location.do_list(obj_api=self)
-        return self._list
+        return self._cached_list(Location, refresh=refresh, fields=fields, search=search, where=where, sharded=sharded)
@@ -0,0 +1,272 @@
+"""
+Simple metrics registry: counters, gauges and latency histograms with labels.
+
+All AXL requests of a :class:`ucm_reader.UCMReader` are recorded in the module level :data:`metrics` registry:
+
+* axl_requests_total{operation,status}: HTTP requests per AXL operation
+* axl_request_bytes_total{operation}, axl_response_bytes_total{operation}: bytes sent/received
+* axl_request_seconds{operation}: HTTP latency histogram
+* axl_operation_seconds{operation}: latency of AXL calls including parsing of the response
+* axl_operation_errors_total{operation,error}: failed AXL calls
+* axl_paged_retries_total{operation}: list calls which had to be repeated in pages
+* axl_retries_total{operation,error}: retried AXL calls by error class (throttled, transient)
+* axl_checkpoint_pages_total{operation}: pages of list calls read from a checkpoint
+* axl_objects_total{type}: objects read by list calls
+* axl_changes_total{type,action}: changes read from the UCM change queue (listChange)
+
+At the end of a run the registry can be written as Prometheus text (.prom) or JSON (any other suffix) with
+:meth:`Metrics.write`.
+"""
+import bisect
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Optional
+
+import requests
+
+__all__ = ['Histogram', 'Metrics', 'metrics', 'instrument_axl']
+
+log = logging.getLogger(__name__)
+
+# default histogram buckets for latencies in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation within the bucket (same as Prometheus' histogram_quantile)
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    # +Inf bucket: best we can say is the highest bound
+                    return lower
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def cumulative(self) -> Iterator[tuple[float, int]]:
+        """
+        (upper bound, cumulative count) for all buckets including +Inf
+        """
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+def label_value(value: Any) -> str:
+    """
+    Label value escaped for the Prometheus text format: backslash, double quote and line feed
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_str(labels: Labels, extra: str = None) -> str:
+    parts = [f'{k}="{label_value(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return parts and f'{{{",".join(parts)}}}' or ''
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[str, dict[Labels, float]] = dict()
+        self.gauges: dict[str, dict[Labels, float]] = dict()
+        self.histograms: dict[str, dict[Labels, Histogram]] = dict()
+
+    @staticmethod
+    def _labels(labels: dict[str, Any]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increment a counter
+        """
+        key = self._labels(labels)
+        with self._lock:
+            counter = self.counters.setdefault(name, dict())
+            counter[key] = counter.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """
+        Set a gauge
+        """
+        key = self._labels(labels)
+        with self._lock:
+            self.gauges.setdefault(name, dict())[key] = value
+
+    def gauge(self, name: str, **labels) -> Optional[float]:
+        with self._lock:
+            return self.gauges.get(name, dict()).get(self._labels(labels))
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record an observation in a histogram
+        """
+        key = self._labels(labels)
+        with self._lock:
+            histogram = self.histograms.setdefault(name, dict())
+            if key not in histogram:
+                histogram[key] = Histogram()
+            histogram[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Context manager recording the duration of the block in a histogram
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        """
+        Value of a counter; sum over all label values not given
+        """
+        labels = self._labels(labels)
+        with self._lock:
+            return sum(v for k, v in self.counters.get(name, dict()).items() if set(labels) <= set(k))
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self.histograms.get(name, dict()).get(self._labels(labels))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def prometheus(self) -> str:
+        """
+        Metrics in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for name, values in sorted(self.counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                lines.extend(f'{name}{label_str(labels)} {value:g}' for labels, value in sorted(values.items()))
+            for name, values in sorted(self.gauges.items()):
+                lines.append(f'# TYPE {name} gauge')
+                lines.extend(f'{name}{label_str(labels)} {value:g}' for labels, value in sorted(values.items()))
+            for name, values in sorted(self.histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(values.items()):
+                    for bound, cumulative in histogram.cumulative():
+                        le = '+Inf' if bound == math.inf else f'{bound:g}'
+                        le = f'le="{le}"'
+                        lines.append(f'{name}_bucket{label_str(labels, le)} {cumulative}')
+                    lines.append(f'{name}_sum{label_str(labels)} {histogram.sum:g}')
+                    lines.append(f'{name}_count{label_str(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Metrics as JSON serializable dictionary
+        """
+        with self._lock:
+            counters = [dict(name=name, labels=dict(labels), value=value)
+                        for name, values in sorted(self.counters.items())
+                        for labels, value in sorted(values.items())]
+            gauges = [dict(name=name, labels=dict(labels), value=value)
+                      for name, values in sorted(self.gauges.items())
+                      for labels, value in sorted(values.items())]
+            histograms = [dict(name=name, labels=dict(labels), count=histogram.count, sum=histogram.sum,
+                               p50=histogram.quantile(0.5), p95=histogram.quantile(0.95),
+                               p99=histogram.quantile(0.99),
+                               buckets={'+Inf' if bound == math.inf else f'{bound:g}': cumulative
+                                        for bound, cumulative in histogram.cumulative()})
+                          for name, values in sorted(self.histograms.items())
+                          for labels, histogram in sorted(values.items())]
+        return dict(counters=counters, gauges=gauges, histograms=histograms)
+
+    def write(self, path: str):
+        """
+        Write metrics to a file: Prometheus text format if the file name ends with .prom, else JSON
+        """
+        with open(path, mode='w') as f:
+            if path.endswith('.prom'):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.as_dict(), f, indent=2)
+        log.info(f'wrote metrics to {path}')
+
+    def summary(self, name: str) -> list[str]:
+        """
+        Human readable summary of a histogram: one line per label set, highest total time first
+        """
+        with self._lock:
+            values = sorted(self.histograms.get(name, dict()).items(), key=lambda kv: kv[1].sum, reverse=True)
+        return [f'{label_str(labels) or name}: {h.count} calls, total {h.sum:.3f}s, '
+                f'p50 {h.quantile(0.5) * 1000:.1f}ms, p95 {h.quantile(0.95) * 1000:.1f}ms'
+                for labels, h in values]
+
+
+#: default registry
+metrics = Metrics()
+
+# SOAPAction of AXL requests, for example: "CUCM:DB ver=12.5 listPhone"
+SOAP_ACTION = re.compile(r'"?CUCM:DB ver=\S+ (\w+)"?')
+
+
+def instrument_axl(zeep_service, registry: Metrics = None):
+    """
+    Record all HTTP requests sent through the session of a zeep service (for example AXLHelper.service). The AXL
+    operation is taken from the SOAPAction header of the request, so that this also covers calls which don't go
+    through ucm_reader like AXLHelper.sql_query()
+    """
+    registry = registry or metrics
+    # noinspection PyProtectedMember
+    session: requests.Session = zeep_service._client.transport.session
+
+    def response_hook(response: requests.Response, *args, **kwargs):
+        request = response.request
+        m = SOAP_ACTION.match(request.headers.get('SOAPAction', ''))
+        operation = m and m.group(1) or 'unknown'
+        registry.inc('axl_requests_total', operation=operation, status=response.status_code)
+        registry.inc('axl_request_bytes_total', len(request.body or b''), operation=operation)
+        registry.inc('axl_response_bytes_total', len(response.content), operation=operation)
+        registry.observe('axl_request_seconds', response.elapsed.total_seconds(), operation=operation)
+
+    # make sure to instrument each session only once for a registry
+    instrumented = session.__dict__.setdefault('_metrics_registries', [])
+    if registry not in instrumented:
+        instrumented.append(registry)
+        session.hooks['response'].append(response_hook)
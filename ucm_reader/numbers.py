@@ -0,0 +1,169 @@
+"""
+Normalization of phone numbers to E.164.
+
+Numbers in UCM come in many formats: '+14085551234' as telephone number of a user, '\\+14085551234' as DN pattern,
+'4085551234' or '14085551234' in NANP dial plans, '0049 6100 773976' or '06100 773976' elsewhere, or just an
+extension like '1234'. :class:`NumberPlan` canonicalizes all of these to '+<country code><national number>' so that
+numbers can be compared and indexed as strings:
+
+    plan = NumberPlan(country_code='1', site_prefixes={'SJC': '+1408555'})
+    plan.normalize('(408) 555-1234')            # '+14085551234'
+    plan.normalize('1234', site='SJC')          # '+14085551234'
+
+Country codes are prefix free; they are looked up in a prebuilt index (:data:`COUNTRY_CODES`) with at most three
+dictionary lookups. :func:`index_numbers` builds an index canonical number -> objects in a single pass.
+"""
+import re
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import Optional, TypeVar
+
+__all__ = ['COUNTRY_CODES', 'country_code', 'apply_mask', 'NumberPlan', 'index_numbers']
+
+# ITU-T E.164 country codes
+COUNTRY_CODES = frozenset(
+    '1 7 20 27 30 31 32 33 34 36 39 40 41 43 44 45 46 47 48 49 51 52 53 54 55 56 57 58 60 61 62 63 64 65 66 81 82 84 '
+    '86 90 91 92 93 94 95 98 '
+    '211 212 213 216 218 220 221 222 223 224 225 226 227 228 229 230 231 232 233 234 235 236 237 238 239 240 241 242 '
+    '243 244 245 246 247 248 249 250 251 252 253 254 255 256 257 258 260 261 262 263 264 265 266 267 268 269 290 291 '
+    '297 298 299 350 351 352 353 354 355 356 357 358 359 370 371 372 373 374 375 376 377 378 379 380 381 382 383 385 '
+    '386 387 389 420 421 423 500 501 502 503 504 505 506 507 508 509 590 591 592 593 594 595 596 597 598 599 670 672 '
+    '673 674 675 676 677 678 679 680 681 682 683 685 686 687 688 689 690 691 692 800 808 850 852 853 855 856 870 878 '
+    '880 881 882 883 886 888 960 961 962 963 964 965 966 967 968 970 971 972 973 974 975 976 977 979 992 993 994 995 '
+    '996 998'.split())
+
+# international call prefix by country code; default: '00'
+INTERNATIONAL_PREFIX = {'1': '011', '7': '810', '61': '0011', '81': '010'}
+
+# national (trunk) prefix by country code; default: '0'
+NATIONAL_PREFIX = {'1': '1', '7': '8', '39': ''}
+
+# minimum and maximum number of digits of an E.164 number w/o '+'
+MIN_DIGITS = 7
+MAX_DIGITS = 15
+
+# characters used to format numbers; UCM escapes the '+' in patterns
+SEPARATORS = re.compile(r'[\s\-./()\\]')
+
+T = TypeVar('T')
+
+
+def country_code(digits: str) -> Optional[str]:
+    """
+    Country code of an E.164 number w/o '+'
+
+    :return: None if the number doesn't start with a valid country code
+    """
+    for length in (1, 2, 3):
+        if digits[:length] in COUNTRY_CODES:
+            return digits[:length]
+    return None
+
+
+def apply_mask(pattern: str, mask: Optional[str]) -> Optional[str]:
+    """
+    Apply an external phone number mask of a line to the DN pattern: the trailing 'X' of the mask are replaced by the
+    trailing digits of the pattern, for example '+14085551XXX' and '1234' -> '+14085551234'
+
+    :return: None if there is no mask or the pattern has less digits than the mask has 'X'
+    """
+    if not mask:
+        return None
+    stem = mask.rstrip('X')
+    wildcards = len(mask) - len(stem)
+    if not wildcards:
+        return mask
+    if len(pattern) < wildcards:
+        return None
+    return stem + pattern[-wildcards:]
+
+
+class NumberPlan:
+    """
+    Rules to canonicalize numbers of a UCM cluster to E.164
+    """
+
+    def __init__(self, country_code: str = '1', international_prefix: str = None, national_prefix: str = None,
+                 site_prefixes: dict[str, str] = None, max_extension_length: int = 6):
+        """
+
+        :param country_code: country code for numbers in national format
+        :param international_prefix: prefix to dial international numbers; default: depends on the country code, for
+            example '011' for NANP and '00' for most other countries
+        :param national_prefix: trunk prefix of numbers in national format; default: depends on the country code,
+            for example '1' for NANP and '0' for most other countries
+        :param site_prefixes: E.164 prefix for the extensions of a site by site (location) name, for example
+            {'SJC': '+1408555'}
+        :param max_extension_length: maximum number of digits of an extension
+        """
+        if country_code not in COUNTRY_CODES:
+            raise ValueError(f'invalid country code: {country_code}')
+        self.country_code = country_code
+        self.international_prefix = INTERNATIONAL_PREFIX.get(country_code, '00') \
+            if international_prefix is None else international_prefix
+        self.national_prefix = NATIONAL_PREFIX.get(country_code, '0') if national_prefix is None else national_prefix
+        self.site_prefixes = {site: prefix.lstrip('+') for site, prefix in (site_prefixes or dict()).items()}
+        self.max_extension_length = max_extension_length
+
+    def normalize(self, number: Optional[str], site: Optional[str] = None) -> Optional[str]:
+        """
+        Canonical E.164 representation of a number
+
+        :param number: number in any format; a leading '\\' (escaped '+' in UCM patterns) is ignored
+        :param site: site (location) name to resolve extensions with site_prefixes
+        :return: '+' followed by digits; None if the number can't be normalized (empty, not a number, extension w/o
+            site prefix, invalid length or country code)
+        """
+        if not number:
+            return None
+        digits = SEPARATORS.sub('', number)
+        if digits.startswith('+'):
+            digits = digits[1:]
+        elif self.international_prefix and digits.startswith(self.international_prefix):
+            digits = digits[len(self.international_prefix):]
+        elif len(digits) <= self.max_extension_length:
+            prefix = self.site_prefixes.get(site)
+            if prefix is None:
+                return None
+            digits = prefix + digits
+        elif self.country_code == '1':
+            # NANP: 10D or 1 + 10D
+            if len(digits) == 10:
+                digits = '1' + digits
+            elif not (len(digits) == 11 and digits.startswith('1')):
+                return None
+        elif self.national_prefix and digits.startswith(self.national_prefix):
+            digits = self.country_code + digits[len(self.national_prefix):]
+        elif not self.national_prefix:
+            digits = self.country_code + digits
+        else:
+            return None
+        if not digits.isdigit() or not MIN_DIGITS <= len(digits) <= MAX_DIGITS or country_code(digits) is None:
+            return None
+        return f'+{digits}'
+
+    def normalize_all(self, numbers: Iterable[Optional[str]], site: Optional[str] = None) -> list[Optional[str]]:
+        """
+        Canonical E.164 representation of numbers, see normalize()
+        """
+        normalize = self.normalize
+        return [normalize(number, site) for number in numbers]
+
+
+def index_numbers(objects: Iterable[T], numbers: Callable[[T], Iterable[Optional[str]]],
+                  plan: NumberPlan) -> dict[str, list[T]]:
+    """
+    Index objects by the canonical E.164 representation of their numbers in a single pass
+
+    :param objects: objects to index
+    :param numbers: numbers of an object; numbers which can't be normalized are skipped
+    :param plan: plan to normalize the numbers
+    :return: objects by E.164 number; each object at most once per number
+    """
+    result = defaultdict(list)
+    normalize = plan.normalize
+    for obj in objects:
+        for e164 in dict.fromkeys(normalize(number) for number in numbers(obj)):
+            if e164 is not None:
+                result[e164].append(obj)
+    return dict(result)
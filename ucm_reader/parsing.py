@@ -0,0 +1,108 @@
+"""
+Parsing of AXL list responses in worker processes.
+
+zeep deserializes a list response into zeep objects which then have to be serialized to dictionaries before the
+pydantic models can be created; all of this is CPU bound and runs under the GIL, so concurrent page reads end up
+waiting for a single core. With a :class:`ParsePool` the raw SOAP response of a list call is handed to a process
+pool instead. The workers parse the XML with lxml and only extract the requested tags; each object is returned as a
+tuple of values in the order of the tags:
+
+* references (StringAndUUID) as dictionaries {'_value_1': value, 'uuid': uuid} like zeep.helpers.serialize_object()
+* other structured tags as (nested) dictionaries of the text of the child elements
+* everything else as text
+
+Only the creation of the pydantic models remains in the parent process. Small responses are parsed in the calling
+thread b/c the round trip to a worker would take longer than parsing.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from lxml import etree
+
+__all__ = ['parse_list_response', 'ParsePool']
+
+log = logging.getLogger(__name__)
+
+# responses smaller than this are parsed in the calling thread
+PARSE_MIN_BYTES = 256 * 1024
+
+
+def localname(element: etree._Element) -> str:
+    return etree.QName(element).localname
+
+
+def element_value(element: etree._Element) -> Any:
+    if len(element):
+        return {localname(child): element_value(child) for child in element}
+    return element.text
+
+
+def parse_list_response(content: bytes, tags: tuple[str, ...], ref_tags: frozenset[str],
+                        model_tags: frozenset[str]) -> list[tuple]:
+    """
+    Parse the SOAP response of an AXL list call
+
+    :param content: SOAP envelope
+    :param tags: tags to extract
+    :param ref_tags: tags which are references (StringAndUUID)
+    :param model_tags: other structured tags
+    :return: one tuple of values per object
+    """
+    root = etree.fromstring(content, parser=etree.XMLParser(huge_tree=True, remove_blank_text=True))
+    result = next((e for e in root.iter() if isinstance(e.tag, str) and localname(e) == 'return'), None)
+    if result is None:
+        return []
+    rows = []
+    for obj in result:
+        children = {localname(child): child for child in obj}
+        row = []
+        for tag in tags:
+            element = children.get(tag)
+            if tag in ref_tags:
+                row.append({'_value_1': element.text, 'uuid': element.get('uuid')} if element is not None
+                           else {'_value_1': None, 'uuid': None})
+            elif element is None:
+                # XML attributes like uuid
+                row.append(obj.get(tag))
+            elif tag in model_tags:
+                row.append(element_value(element) if len(element) else None)
+            else:
+                row.append(element.text)
+        rows.append(tuple(row))
+    return rows
+
+
+class ParsePool:
+    """
+    Process pool for parsing AXL list responses
+    """
+
+    def __init__(self, processes: Optional[int] = None, min_bytes: int = PARSE_MIN_BYTES):
+        """
+
+        :param processes: number of worker processes; default: number of CPUs
+        :param min_bytes: responses smaller than this are parsed in the calling thread
+        """
+        self.min_bytes = min_bytes
+        # spawn: forking a process with running threads (session pool, executors) isn't safe
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def parse(self, content: bytes, tags: tuple[str, ...], ref_tags: frozenset[str],
+              model_tags: frozenset[str]) -> list[tuple]:
+        """
+        Parse the SOAP response of an AXL list call, see :func:`parse_list_response`
+        """
+        if len(content) < self.min_bytes:
+            return parse_list_response(content, tags, ref_tags, model_tags)
+        return self._executor.submit(parse_list_response, content, tags, ref_tags, model_tags).result()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
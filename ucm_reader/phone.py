@@ -1,8 +1,9 @@
-from ucm_reader.base import AXLObject, StringAndUUID, ObjApi, GetRequired
+from ucm_reader.base import AXLObject, StringAndUUID, ObjApi, GetRequired, DETAILS_BATCH_SIZE
+from ucm_reader.pool import AXLSessionPool
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Iterable, Iterator
 
-__all__ = ['CurrentConfig', 'Phone', 'PhoneApi']
+__all__ = ['CurrentConfig', 'AssociatedEndUser', 'DN', 'Line', 'SpeedDial', 'Phone', 'PhoneApi']
 
 
 # noinspection SpellCheckingInspection
@@ -118,6 +119,9 @@ class SpeedDialContainer(BaseModel):
 class Phone(AXLObject):
     _axl_search = 'name'
     _axl_type = 'phone'
+    _axl_table = 'device'
+    # the device table also holds gateways, CTI route points, ...
+    _axl_where = 'tkclass = 1'
 
     name: Optional[str]
     description: Optional[str]
@@ -247,18 +251,46 @@ class Phone(AXLObject):
     busyLampFields: Any = GetRequired
     blfDirectedCallParks: Any = GetRequired
 
+    def associated_users(self) -> List[str]:
+        """
+        User ids of end users associated with any line of the phone, in line order. Requires a get
+        """
+        result = []
+        for line in self.lines.line if self.lines else []:
+            for end_user in line.associatedEndusers.enduser if line.associatedEndusers else []:
+                if end_user.userId not in result:
+                    result.append(end_user.userId)
+        return result
+
 
 class PhoneApi(ObjApi):
-    def __init__(self, zeep_service):
-        super(PhoneApi, self).__init__(zeep_service)
-        self._list: Optional[List[Phone]] = None
+    def __init__(self, zeep_service, pool: AXLSessionPool = None, **kwargs):
+        super(PhoneApi, self).__init__(zeep_service, pool=pool, **kwargs)
 
-    def list(self, refresh=False) -> List[Phone]:
+    def list(self, refresh=False, fields: Iterable[str] = None, search: dict[str, str] = None, where: str = None,
+             sharded: bool = False) -> List[Phone]:
         """
         Get list of UCM phones. Retrieve the list from UCM on 1st call
         :param refresh: if True then don't return cached list and instead re-read the list from UCM via AXl
+        :param fields: only read these attributes (and uuid) to get smaller responses; other attributes are read with
+            a get on first access. A cached list which has all requested attributes is returned as is
+        :param search: only read phones matching these AXL search criteria ('%' as wildcard), for example
+            {'devicePoolName': 'DP_SJC'}; the result is not cached
+        :param where: only read phones matching this SQL predicate on the device table, for example
+            "description like '%lobby%'"; the result is not cached
+        :param sharded: read all phones with concurrent prefix searches instead of a single search
         :return:
         """
-        if refresh or self._list is None:
-            self._list = Phone.do_list(obj_api=self)
-        return self._list
+        return self._cached_list(Phone, refresh=refresh, fields=fields, search=search, where=where, sharded=sharded)
+
+    def details(self, phones: Iterable[Phone] = None, batch_size: int = DETAILS_BATCH_SIZE,
+                max_workers: int = None) -> Iterator[Phone]:
+        """
+        Stream UCM phones with lines, speed dials and BLFs. Details are read with concurrent getPhone calls in batches
+        :param phones: phones to read details for; default: all phones (see list())
+        :param batch_size: number of phones per batch
+        :param max_workers: number of concurrent getPhone calls; default: size of the session pool
+        :return: generator yielding phones
+        """
+        phones = self.list() if phones is None else phones
+        return self.with_details(phones, batch_size=batch_size, max_workers=max_workers)
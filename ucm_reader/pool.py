@@ -0,0 +1,164 @@
+"""
+Pool of AXL sessions.
+
+A single requests session serializes all AXL requests on one connection. :class:`AXLSessionPool` holds a number of
+zeep service proxies which all share the (expensive to parse) WSDL of a template service but each have their own
+requests session with one persistent connection. Threads take a service from the pool for the duration of a request
+so that concurrent reads run in parallel and each request reuses an established (TLS) connection.
+
+The number of requests in flight is additionally bounded by an adaptive limit (see :mod:`ucm_reader.concurrency`):
+UCM throttling (HTTP 503/429 or AXL throttle faults) lowers the limit, requests completing at normal latency raise it
+up to the size of the pool.
+"""
+import copy
+import logging
+import queue
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+import zeep.exceptions
+import zeep.proxy
+from requests.adapters import HTTPAdapter
+
+from ucm_reader.concurrency import AdaptiveLimit
+
+__all__ = ['is_throttled', 'AXLSessionPool']
+
+log = logging.getLogger(__name__)
+
+# faults UCM returns when the AXL throttle kicks in
+THROTTLE_FAULT = re.compile(r'busy|throttl|exceeded allowed rate|too many requests|maximum axl memory', re.IGNORECASE)
+
+
+def is_throttled(e: Exception) -> bool:
+    """
+    Check whether an exception raised by an AXL call is caused by UCM throttling
+    """
+    if isinstance(e, zeep.exceptions.TransportError):
+        return e.status_code in (429, 503)
+    if isinstance(e, zeep.exceptions.Fault):
+        return bool(THROTTLE_FAULT.search(e.message or ''))
+    return False
+
+
+class AXLSessionPool:
+    """
+    Thread-safe pool of AXL service proxies
+    """
+
+    def __init__(self, zeep_service: zeep.proxy.ServiceProxy, size: int = 4, keep_alive: bool = True,
+                 gzip: bool = True, timeout: Optional[float] = None, adaptive: bool = True):
+        """
+
+        :param zeep_service: template service, for example AXLHelper.service. Authentication, certificate
+            verification, headers and hooks (see :func:`ucm_reader.metrics.instrument_axl`) of the template's session
+            are copied to the pooled sessions. The pool takes ownership of the template session and closes it in
+            :meth:`close`
+        :param size: number of sessions; this is the maximum number of concurrent AXL requests
+        :param keep_alive: keep connections open between requests. If False each request opens a new connection
+        :param gzip: ask UCM for gzip compressed responses
+        :param timeout: timeout for acquiring a session; None: wait forever
+        :param adaptive: adapt the number of concurrent requests to UCM throttling; else always allow size requests
+        """
+        if size < 1:
+            raise ValueError('pool size has to be at least 1')
+        self.template = zeep_service
+        self.size = size
+        self.keep_alive = keep_alive
+        self.gzip = gzip
+        self.timeout = timeout
+        #: limit for the number of requests in flight
+        self.limit = AdaptiveLimit('axl', initial=size, minimum=1 if adaptive else size, maximum=size)
+        # LIFO: prefer the most recently used session; its connection is the least likely to have timed out
+        self._idle: queue.LifoQueue[zeep.proxy.ServiceProxy] = queue.LifoQueue()
+        self._sessions: list[requests.Session] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._service())
+
+    def _session(self) -> requests.Session:
+        """
+        New requests session with the settings of the template session and a single persistent connection per host
+        """
+        # noinspection PyProtectedMember
+        template: requests.Session = self.template._client.transport.session
+        session = requests.Session()
+        session.auth = template.auth
+        session.verify = template.verify
+        session.cert = template.cert
+        session.proxies = template.proxies.copy()
+        session.trust_env = template.trust_env
+        session.headers.update(template.headers)
+        session.hooks = {event: list(hooks) for event, hooks in template.hooks.items()}
+        if '_metrics_registries' in template.__dict__:
+            session.__dict__['_metrics_registries'] = list(template.__dict__['_metrics_registries'])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept-Encoding'] = 'gzip, deflate' if self.gzip else 'identity'
+        session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+        self._sessions.append(session)
+        return session
+
+    def _service(self) -> zeep.proxy.ServiceProxy:
+        """
+        New service proxy sharing WSDL, settings and plugins of the template but with its own session
+        """
+        # noinspection PyProtectedMember
+        template_client = self.template._client
+        client = copy.copy(template_client)
+        client.transport = copy.copy(template_client.transport)
+        client.transport.session = self._session()
+        # noinspection PyProtectedMember
+        return zeep.proxy.ServiceProxy(client, self.template._binding, **self.template._binding_options)
+
+    @contextmanager
+    def service(self) -> Iterator[zeep.proxy.ServiceProxy]:
+        """
+        Take a service from the pool for the duration of the context
+        """
+        if self._closed:
+            raise RuntimeError('AXL session pool is closed')
+        with self.limit.slot(timeout=self.timeout):
+            try:
+                service = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f'no AXL session available after {self.timeout}s')
+            start = time.perf_counter()
+            try:
+                yield service
+            except Exception as e:
+                if is_throttled(e):
+                    self.limit.on_throttle()
+                    log.debug(f'AXL request throttled, limit: {self.limit.limit}')
+                raise
+            else:
+                self.limit.on_success(time.perf_counter() - start)
+            finally:
+                self._idle.put(service)
+
+    def close(self):
+        """
+        Close all pooled sessions and the template session
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for session in self._sessions:
+            session.close()
+        # noinspection PyProtectedMember
+        self.template._client.transport.session.close()
+        log.debug(f'closed AXL session pool with {self.size} sessions')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
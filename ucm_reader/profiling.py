@@ -0,0 +1,258 @@
+"""
+Opt-in profiling of runs: phase spans and an optional sampling profiler.
+
+Spans mark the phases of a run (fetch, parse, serialize, validate, transform, write, ...). Spans nest; for each stack of
+span names the exclusive time is recorded. Within an AXL call 'fetch' is the time spent on SOAP I/O and 'parse' (nested)
+is the time zeep needs to deserialize the response.
+
+The optional sampling profiler takes a snapshot of the Python stacks of all threads in a fixed interval. Each sample is
+prefixed with the span stack active in the sampled thread.
+
+Both profiles are written in the collapsed stack format ("frame;frame;frame value" per line) which can be rendered with
+flamegraph.pl or speedscope:
+
+* <path>: span stacks with exclusive time in microseconds
+* <path without suffix>.samples<suffix>: sampled stacks with number of samples
+
+Profiling is enabled with the --profile PATH (and --profile-interval MS for sampling) command line arguments of the
+scripts or with the PROFILE_PATH (and PROFILE_INTERVAL) environment variables.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+
+__all__ = ['Profiler', 'profiler', 'add_profile_arguments', 'PhasePlugin', 'instrument_profiling']
+
+log = logging.getLogger(__name__)
+
+
+class SpanFrame:
+    __slots__ = ('name', 'start', 'child_time')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.child_time = 0.0
+
+
+class Profiler:
+    """
+    Records phase spans and (optionally) samples stacks of all threads
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.interval: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # span stacks of threads with open spans by thread id; read by the sampler
+        self._stacks: dict[int, list[SpanFrame]] = dict()
+        #: exclusive time in seconds per span stack
+        self.spans: dict[tuple[str, ...], float] = defaultdict(float)
+        #: number of samples per folded stack
+        self.samples: dict[str, int] = defaultdict(int)
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, path: str, interval: float = None):
+        """
+        Start profiling
+
+        :param path: path of the span profile to write when stopping
+        :param interval: sampling interval in seconds; if not set then only spans are recorded
+        """
+        self.path = path
+        self.interval = interval
+        self.spans.clear()
+        self.samples.clear()
+        self.enabled = True
+        if interval:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+            self._sampler.start()
+        log.info(f'profiling enabled, writing to {path}')
+
+    def configure(self, args: Namespace = None):
+        """
+        Start profiling if requested by command line arguments (see :func:`add_profile_arguments`) or environment
+        variables PROFILE_PATH and PROFILE_INTERVAL (sampling interval in ms)
+        """
+        path = args and args.profile or os.getenv('PROFILE_PATH')
+        interval = args and args.profile_interval or os.getenv('PROFILE_INTERVAL')
+        if path:
+            self.start(path=path, interval=interval and float(interval) / 1000)
+
+    def stop(self):
+        """
+        Stop profiling and write profiles
+        """
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        self.write(self.path)
+        for line in self.summary():
+            log.info(line)
+
+    def _stack(self) -> list[SpanFrame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self._stacks[threading.get_ident()] = stack
+        return stack
+
+    def _drop_stack(self):
+        # no open spans in the current thread (anymore)
+        self._local.stack = None
+        with self._lock:
+            self._stacks.pop(threading.get_ident(), None)
+
+    def begin(self, name: str) -> Optional[SpanFrame]:
+        """
+        Open a span in the current thread
+        """
+        if not self.enabled:
+            return None
+        frame = SpanFrame(name)
+        self._stack().append(frame)
+        return frame
+
+    def begin_nested(self, name: str) -> Optional[SpanFrame]:
+        """
+        Open a span within the innermost open span of the current thread; the span is closed together with that span.
+        Outside of a span nothing is recorded
+        """
+        if not self.enabled or not getattr(self._local, 'stack', None):
+            return None
+        return self.begin(name)
+
+    def _close(self, stack: list[SpanFrame]):
+        key = tuple(frame.name for frame in stack)
+        frame = stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        if stack:
+            stack[-1].child_time += elapsed
+        with self._lock:
+            self.spans[key] += elapsed - frame.child_time
+
+    def end(self, frame: SpanFrame = None):
+        """
+        Close a span of the current thread. Spans opened within that span and not closed yet are closed as well
+
+        :param frame: span to close; default: innermost span
+        """
+        stack = getattr(self._local, 'stack', None)
+        if not stack or frame is not None and frame not in stack:
+            return
+        if frame is not None:
+            while stack[-1] is not frame:
+                self._close(stack)
+        self._close(stack)
+        if not stack:
+            self._drop_stack()
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Context manager for a span
+        """
+        if not self.enabled:
+            yield
+            return
+        frame = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(frame)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                span_stacks = {ident: [frame.name for frame in stack] for ident, stack in self._stacks.items()}
+            # noinspection PyProtectedMember
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                frames.reverse()
+                folded = ';'.join(span_stacks.get(ident, []) + frames)
+                with self._lock:
+                    self.samples[folded] += 1
+
+    def write(self, path: str):
+        with open(path, mode='w') as f:
+            for key, seconds in sorted(self.spans.items()):
+                f.write(f'{";".join(key)} {round(seconds * 1000000)}\n')
+        if self.samples:
+            root, ext = os.path.splitext(path)
+            samples_path = f'{root}.samples{ext}'
+            with open(samples_path, mode='w') as f:
+                for folded, count in sorted(self.samples.items()):
+                    f.write(f'{folded} {count}\n')
+            log.info(f'wrote sampled stacks to {samples_path}')
+        log.info(f'wrote span profile to {path}')
+
+    def summary(self) -> list[str]:
+        """
+        Exclusive time per span name, highest first
+        """
+        totals = defaultdict(float)
+        for key, seconds in self.spans.items():
+            totals[key[-1]] += seconds
+        return [f'{name}: {seconds:.3f}s' for name, seconds in sorted(totals.items(), key=lambda kv: -kv[1])]
+
+
+#: default profiler
+profiler = Profiler()
+
+
+class PhasePlugin:
+    """
+    zeep plugin opening a 'parse' span when the response of a SOAP request has been received. The span is nested in
+    the span around the call ('fetch' in ObjApi.call()) and closed together with it; calls outside of a span are not
+    recorded. Same interface as zeep.Plugin; not derived from it to keep zeep out of the imports of this module
+    """
+
+    def egress(self, envelope, http_headers, operation, binding_options):
+        return envelope, http_headers
+
+    def ingress(self, envelope, http_headers, operation):
+        profiler.begin_nested('parse')
+        return envelope, http_headers
+
+
+def instrument_profiling(zeep_service):
+    """
+    Add the :class:`PhasePlugin` to the client of a zeep service (for example AXLHelper.service) so that SOAP I/O
+    and parsing of responses can be told apart
+    """
+    # noinspection PyProtectedMember
+    plugins = zeep_service._client.plugins
+    if not any(isinstance(plugin, PhasePlugin) for plugin in plugins):
+        plugins.append(PhasePlugin())
+
+
+def add_profile_arguments(parser: ArgumentParser):
+    """
+    Add the command line arguments for profiling to an argument parser
+    """
+    parser.add_argument('--profile', type=str, metavar='PATH',
+                        help='record a profile of the run and write it to PATH (collapsed stack format)')
+    parser.add_argument('--profile-interval', type=float, metavar='MS',
+                        help='also sample the Python stacks every MS milliseconds')
@@ -0,0 +1,99 @@
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Union
+
+import urllib3
+
+from ucm_reader.base import ObjApi, bind_address
+from ucm_reader.changes import Change, ChangeFeed
+from ucm_reader.checkpoint import PageCheckpoint
+from ucm_reader.locations import LocationApi
+from ucm_reader.metrics import instrument_axl
+from ucm_reader.parsing import ParsePool
+from ucm_reader.phone import PhoneApi
+from ucm_reader.pool import AXLSessionPool
+from ucm_reader.profiling import instrument_profiling
+from ucm_reader.retry import RetryPolicy
+from ucm_reader.user import UserApi
+from ucm_reader.wsdl import axl_helper
+
+__all__ = ['UCMReader']
+
+log = logging.getLogger(__name__)
+
+
+class UCMReader:
+    def __init__(self, host: str, user: str, password: str, verify=False, address: str = None, pool_size: int = 4,
+                 keep_alive: bool = True, gzip: bool = True, adaptive: bool = True, retry: RetryPolicy = None,
+                 checkpoint: Union[str, Path] = None, parse_processes: int = 0, track_changes: bool = False):
+        """
+
+        :param host: UCM host for AXL requests
+        :param user: AXL user
+        :param password: AXL password
+        :param verify: verify the UCM certificate
+        :param address: URL of the AXL service; default: the AXL service on host. Can be used to point the reader to
+            a local FakeAXLServer
+        :param pool_size: number of AXL sessions; maximum number of concurrent AXL requests
+        :param keep_alive: keep connections to UCM open between requests
+        :param gzip: ask UCM for gzip compressed responses
+        :param adaptive: lower the number of concurrent requests when UCM throttles AXL requests
+        :param retry: policy for retrying failed AXL operations; default: ucm_reader.retry.DEFAULT_RETRY
+        :param checkpoint: directory for page level checkpoints of list operations; None: no checkpoints
+        :param parse_processes: number of worker processes for parsing responses of list operations; 0: parse with
+            zeep in the calling thread
+        :param track_changes: follow the UCM change queue from now on so that refresh() only needs to read the
+            changed objects
+        """
+        if not verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        self._axl = axl_helper(ucm_host=host, auth=(user, password), verify=verify)
+        if address:
+            self._axl.service = bind_address(self._axl.service, address)
+        instrument_axl(self._axl.service)
+        instrument_profiling(self._axl.service)
+        # all APIs share one pool of sessions
+        self._pool = AXLSessionPool(self._axl.service, size=pool_size, keep_alive=keep_alive, gzip=gzip,
+                                   adaptive=adaptive)
+        checkpoint = checkpoint and PageCheckpoint(checkpoint)
+        self._parser = ParsePool(processes=parse_processes) if parse_processes else None
+        options = dict(pool=self._pool, retry=retry, checkpoint=checkpoint, parser=self._parser)
+        self.user = UserApi(self._axl.service, **options)
+        self.phone = PhoneApi(self._axl.service, **options)
+        self.location = LocationApi(self._axl.service, **options)
+        # APIs by AXL object type
+        self._apis: dict[str, ObjApi] = {'user': self.user, 'phone': self.phone, 'location': self.location}
+        self._changes = None
+        if track_changes:
+            # position in the change queue has to be established before reading any lists
+            self._changes = ChangeFeed(self.user.call, types=[axl_type.capitalize() for axl_type in self._apis])
+            self._changes.start()
+
+    def refresh(self) -> dict[str, int]:
+        """
+        Bring all cached lists up to date. With change tracking the lists are patched in place with the changes since
+        the previous refresh; otherwise (or if the position in the change queue has been lost) all cached lists are
+        read again
+        :return: number of changed objects by AXL object type ('user', 'phone', 'location'); for lists which have
+            been read again: the number of objects
+        """
+        changes = self._changes.poll() if self._changes is not None else None
+        if changes is None:
+            return {axl_type: api.reload() for axl_type, api in self._apis.items()}
+        by_type: dict[str, list[Change]] = defaultdict(list)
+        for change in changes:
+            by_type[change.type.lower()].append(change)
+        return {axl_type: api.apply_changes(by_type[axl_type]) if by_type[axl_type] else 0
+                for axl_type, api in self._apis.items()}
+
+    def close(self):
+        self._pool.close()
+        if self._parser is not None:
+            self._parser.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,211 @@
+"""
+Record and replay AXL SOAP exchanges.
+
+Tests of the read path shouldn't need a UCM. A :class:`RecordingProxy` sits between a client (``AXLHelper``,
+:class:`ucm_reader.UCMReader`) and a real UCM (or a :class:`ucm_reader.fake_axl.FakeAXLServer`), forwards each request
+and stores the exchange in a :class:`Cassette`; this is done once:
+
+    with Cassette('test/fixtures/axl') as cassette, \\
+            RecordingProxy('https://ucm-pub:8443/axl/', cassette) as proxy:
+        with UCMReader(host='ucm-pub', user=user, password=password, address=proxy.url) as ucm:
+            ucm.user.list()
+
+Afterwards ``FakeAXLServer(cassette=Cassette('test/fixtures/axl'))`` answers the same requests with the recorded
+responses (including faults), deterministically and w/o network access. Exchanges are keyed by the operation and a
+digest of the canonical (C14N) XML of the operation element (:func:`request_key`); requests which haven't been
+recorded are answered with a SOAP fault. Only responses and SOAP faults are recorded, no transient errors.
+
+A cassette is a directory with one ``<key>.xml`` file per response and ``index.json`` with the HTTP status of each
+response.
+"""
+import hashlib
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Union
+
+import requests
+from lxml import etree
+
+__all__ = ['request_key', 'Cassette', 'RecordingProxy']
+
+log = logging.getLogger(__name__)
+
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+# request headers forwarded to the upstream server
+FORWARDED_HEADERS = ('Authorization', 'SOAPAction', 'Content-Type', 'Cookie')
+
+
+def request_key(body: bytes) -> str:
+    """
+    Key of a SOAP request: name of the operation and a digest of the canonical XML of the operation element, for
+    example 'listUser-5c1a0e2d94b1f7c3'
+    """
+    request = etree.fromstring(body, parser=etree.XMLParser(huge_tree=True))
+    operation = next(iter(request.find(f'{{{SOAP_ENV}}}Body')))
+    digest = hashlib.sha1(etree.tostring(operation, method='c14n', exclusive=True)).hexdigest()[:16]
+    return f'{etree.QName(operation).localname}-{digest}'
+
+
+class Cassette:
+    """
+    Recorded SOAP exchanges in a directory
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+
+        :param directory: directory with the recorded responses; created when the first exchange is recorded
+        """
+        self.directory = Path(directory)
+        index = self.directory / 'index.json'
+        #: HTTP status by request key
+        self.index: dict[str, int] = json.loads(index.read_text()) if index.exists() else dict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def record(self, request: bytes, status: int, response: bytes) -> str:
+        """
+        Record one exchange; an existing exchange with the same key is replaced
+
+        :return: request key
+        """
+        key = request_key(request)
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f'{key}.xml').write_bytes(response)
+            self.index[key] = status
+            self._dirty = True
+        return key
+
+    def lookup(self, request: bytes) -> Optional[tuple[int, bytes]]:
+        """
+        Recorded response for a request
+
+        :return: HTTP status and response body; None if the request hasn't been recorded
+        """
+        key = request_key(request)
+        status = self.index.get(key)
+        if status is None:
+            return None
+        return status, (self.directory / f'{key}.xml').read_bytes()
+
+    def save(self):
+        """
+        Write the index of the recorded exchanges
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / 'index.json').write_text(json.dumps(self.index, indent=1, sort_keys=True))
+            self._dirty = False
+        log.debug(f'saved {len(self.index)} exchanges in {self.directory}')
+
+
+class RecordingProxy:
+    """
+    Local HTTP server forwarding AXL requests to an upstream server and recording the exchanges in a cassette
+    """
+
+    def __init__(self, upstream: str, cassette: Cassette, *, verify: bool = False, host: str = '127.0.0.1',
+                 port: int = 0):
+        """
+
+        :param upstream: URL of the AXL service, for example 'https://ucm-pub:8443/axl/'
+        :param cassette: cassette to record the exchanges in
+        :param verify: verify the TLS certificate of the upstream server
+        :param host: address to listen on
+        :param port: port to listen on; 0: pick a free port
+        """
+        self.upstream = upstream
+        self.cassette = cassette
+        self._session = requests.Session()
+        self._session.verify = verify
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/axl/'
+
+    def start(self) -> 'RecordingProxy':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name='RecordingProxy', daemon=True)
+            self._thread.start()
+            log.debug(f'recording proxy for {self.upstream} listening on {self.url}')
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        self._session.close()
+        self.cassette.save()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def bind(self, axl):
+        """
+        Point an existing AXLHelper to this proxy
+        """
+        from ucm_reader.base import bind_address
+        axl.service = bind_address(axl.service, self.url)
+        return axl
+
+    def forward(self, body: bytes, headers: dict[str, str]) -> tuple[int, bytes]:
+        """
+        Forward one request to the upstream server and record the exchange
+
+        :return: HTTP status and (decoded) response body
+        """
+        response = self._session.post(self.upstream, data=body, headers=headers)
+        # throttling (503) and other transient errors are not recorded: replaying them would fail every retry
+        if response.status_code in (200, 500) and response.content:
+            self.cassette.record(body, response.status_code, response.content)
+        return response.status_code, response.content
+
+    def _handler_class(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                headers = {name: value for name in FORWARDED_HEADERS if (value := self.headers.get(name)) is not None}
+                status, response = proxy.forward(body, headers)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, fmt, *args):
+                log.debug(fmt % args)
+
+        return Handler
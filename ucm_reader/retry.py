@@ -0,0 +1,137 @@
+"""
+Retry policy for AXL operations.
+
+Reading a large cluster takes thousands of AXL requests; under publisher load some of them fail transiently (timeouts,
+connection resets, 502/503/504, AXL throttling). :class:`RetryPolicy` repeats failed operations with jittered
+exponential backoff ("full jitter": sleep a random time between 0 and min(cap, base * 2 ** attempt)) so that the
+retries of concurrent threads don't hit UCM at the same time.
+
+Errors are classified by :func:`classify`:
+
+* ``throttled``: UCM rejected the request before executing it; always safe to retry
+* ``transient``: timeouts, connection errors, 5xx responses w/o SOAP fault; only retried for idempotent operations
+  (list*, get*, executeSQLQuery, ...) b/c the request might have been executed
+* ``permanent``: everything else (SOAP faults like 'Item not valid'); never retried
+"""
+import logging
+import random
+import re
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+import requests
+import zeep.exceptions
+
+from ucm_reader.metrics import metrics
+from ucm_reader.pool import is_throttled
+
+__all__ = ['THROTTLED', 'TRANSIENT', 'PERMANENT', 'classify', 'is_idempotent', 'RetryPolicy', 'DEFAULT_RETRY',
+           'sql_query']
+
+log = logging.getLogger(__name__)
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# faults which indicate a transient problem on the UCM side
+TRANSIENT_FAULT = re.compile(r'timed? ?out|temporarily|try again|connection (reset|refused)', re.IGNORECASE)
+
+# operations w/o side effects
+IDEMPOTENT_OPERATION = re.compile(r'(list|get)[A-Z]|executeSQLQuery$')
+
+T = TypeVar('T')
+
+
+def classify(e: Exception) -> str:
+    """
+    Classify an exception raised by an AXL call
+
+    :return: THROTTLED, TRANSIENT or PERMANENT
+    """
+    if is_throttled(e):
+        return THROTTLED
+    if isinstance(e, (requests.ConnectionError, requests.Timeout, TimeoutError)):
+        return TRANSIENT
+    if isinstance(e, zeep.exceptions.TransportError):
+        return TRANSIENT if e.status_code >= 500 else PERMANENT
+    if isinstance(e, zeep.exceptions.Fault) and TRANSIENT_FAULT.search(e.message or ''):
+        return TRANSIENT
+    return PERMANENT
+
+
+def is_idempotent(operation: str) -> bool:
+    """
+    Check whether an AXL operation can be repeated w/o side effects
+    """
+    return IDEMPOTENT_OPERATION.match(operation) is not None
+
+
+class RetryPolicy:
+    """
+    Retry failed AXL operations with jittered exponential backoff
+    """
+
+    def __init__(self, attempts: int = 5, base: float = 0.5, cap: float = 30.0, rng: random.Random = None):
+        """
+
+        :param attempts: maximum number of attempts per operation (1: no retries)
+        :param base: backoff before the first retry (upper bound of the jitter interval)
+        :param cap: maximum backoff in seconds
+        :param rng: random number generator for the jitter
+        """
+        if attempts < 1:
+            raise ValueError('at least one attempt is required')
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Time to sleep before the next attempt
+
+        :param attempt: number of the failed attempt; 0 for the first attempt
+        """
+        return self._rng.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def should_retry(self, operation: str, e: Exception) -> bool:
+        kind = classify(e)
+        return kind == THROTTLED or kind == TRANSIENT and is_idempotent(operation)
+
+    def call(self, operation: str, f: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Call f(*args, **kwargs) and repeat the call on retryable errors
+
+        :param operation: name of the AXL operation; used to check idempotency and as metrics label
+        :return: result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            try:
+                return f(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.attempts or not self.should_retry(operation, e):
+                    raise
+                sleep = self.backoff(attempt - 1)
+                metrics.inc('axl_retries_total', operation=operation, error=classify(e))
+                log.warning(f'{operation} failed ({e.__class__.__name__}: {e}), attempt {attempt}/{self.attempts}, '
+                            f'retrying in {sleep:.2f}s')
+                time.sleep(sleep)
+
+
+#: policy used if no other policy is configured
+DEFAULT_RETRY = RetryPolicy()
+
+
+def sql_query(axl, sql: str, retry: RetryPolicy = None) -> list[dict[str, str]]:
+    """
+    AXLHelper.sql_query() with retries
+
+    :param axl: AXLHelper instance
+    :param sql: SQL statement
+    :param retry: retry policy; default: DEFAULT_RETRY
+    """
+    return (retry or DEFAULT_RETRY).call('executeSQLQuery', axl.sql_query, sql)
@@ -1,6 +1,7 @@
 from ucm_reader.base import AXLObject, StringAndUUID, ObjApi, GetRequired
+from ucm_reader.pool import AXLSessionPool
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Iterable
 
 __all__ = ['User', 'UserApi']
 
@@ -14,6 +15,7 @@ class PrimaryExtension(BaseModel):
 class User(AXLObject):
     _axl_search = 'userid'
     _axl_type = 'user'
+    _axl_table = 'enduser'
 
     firstName: Optional[str]
     middleName: Optional[str]
@@ -54,16 +56,21 @@ class User(AXLObject):
 
 
 class UserApi(ObjApi):
-    def __init__(self, zeep_service):
-        super(UserApi, self).__init__(zeep_service)
-        self._list: Optional[List[User]] = None
+    def __init__(self, zeep_service, pool: AXLSessionPool = None, **kwargs):
+        super(UserApi, self).__init__(zeep_service, pool=pool, **kwargs)
 
-    def list(self, refresh=False) -> List[User]:
+    def list(self, refresh=False, fields: Iterable[str] = None, search: dict[str, str] = None, where: str = None,
+             sharded: bool = False) -> List[User]:
         """
         Get list of UCM users. Retrieve the list from UCM on 1st call
         :param refresh: if True then don't return cached list and instead re-read the list from UCM via AXl
+        :param fields: only read these attributes (and uuid) to get smaller responses; other attributes are read with
+            a get on first access. A cached list which has all requested attributes is returned as is
+        :param search: only read users matching these AXL search criteria ('%' as wildcard), for example
+            {'userid': 'a%'} or {'department': 'Sales'}; the result is not cached
+        :param where: only read users matching this SQL predicate on the enduser table, for example
+            "telephonenumber like '+1408%'"; the result is not cached
+        :param sharded: read all users with concurrent prefix searches instead of a single search
         :return:
         """
-        if refresh or self._list is None:
-            self._list = User.do_list(obj_api=self)
-        return self._list
+        return self._cached_list(User, refresh=refresh, fields=fields, search=search, where=where, sharded=sharded)
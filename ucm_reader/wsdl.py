@@ -0,0 +1,253 @@
+"""
+Cache for parsed AXL WSDL documents.
+
+Parsing the AXL WSDL/XSD is the biggest part of the startup time of every AXLHelper. :class:`WSDLCache` keeps parsed
+WSDL documents in memory (so that multiple AXLHelper instances for the same AXL version share one document) and
+pickled on disk so that subsequent runs don't need to parse the schema at all.
+
+The disk cache lives in ~/.cache/migrationapi/wsdl; the location can be changed with the WSDL_CACHE_DIR environment
+variable. An empty WSDL_CACHE_DIR disables the disk cache. Cache entries are keyed by WSDL path, size and modification
+time of the WSDL and schema files, zeep version and parser settings and hence get invalidated automatically.
+
+Usage::
+
+    axl = axl_helper(ucm_host=host, auth=(user, password), verify=False)
+"""
+import gc
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import zeep
+import zeep.client
+from lxml import etree
+from ucmaxl import AXLHelper
+from zeep.settings import Settings
+from zeep.transports import Transport
+from zeep.wsdl import Document
+
+__all__ = ['WSDLCache', 'wsdl_cache', 'axl_helper']
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'migrationapi', 'wsdl')
+
+# types of dictionary views; some zeep types hold views on dictionaries which are only used during parsing
+DICT_VIEWS = (type({}.values()), type(OrderedDict().values()), type({}.keys()), type({}.items()))
+
+
+def value_class(xsd_type):
+    # noinspection PyProtectedMember
+    return xsd_type._value_class
+
+
+class DocumentPickler(pickle.Pickler):
+    """
+    Pickler for zeep WSDL documents. zeep creates classes on the fly while parsing schemas; these and the lxml objects
+    referenced by the document need special treatment. Transport and settings are not pickled but are provided when
+    loading the document
+    """
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Transport):
+            return 'transport'
+        if isinstance(obj, Settings):
+            return 'settings'
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type):
+            module = obj.__dict__.get('__module__')
+            if module == 'zeep.xsd.dynamic_types':
+                attributes = {k: v for k, v in obj.__dict__.items() if k in ('__module__', '_xsd_name')}
+                return type, (obj.__name__, obj.__bases__, attributes)
+            if module == 'zeep.objects':
+                # value class of a complex type: recreated by the type
+                return value_class, (obj.__dict__['_xsd_type'],)
+        elif isinstance(obj, etree.QName):
+            return etree.QName, (obj.text,)
+        elif isinstance(obj, etree._Element):
+            return etree.fromstring, (etree.tostring(obj),)
+        elif isinstance(obj, DICT_VIEWS):
+            return list, (list(obj),)
+        return NotImplemented
+
+
+class DocumentUnpickler(pickle.Unpickler):
+    def __init__(self, file, transport: Transport, settings: Settings):
+        super().__init__(file)
+        self.transport = transport
+        self.settings = settings
+
+    def persistent_load(self, pid):
+        if pid == 'transport':
+            return self.transport
+        if pid == 'settings':
+            return self.settings
+        raise pickle.UnpicklingError(f'unsupported persistent id: {pid}')
+
+
+@contextmanager
+def gc_disabled():
+    """
+    Parsing and unpickling create a huge number of objects; w/o cyclic garbage collection this is about twice as fast
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class WSDLCache:
+    """
+    In-memory and on-disk cache of parsed WSDL documents
+    """
+
+    def __init__(self, directory: Optional[str] = DEFAULT_CACHE_DIR):
+        """
+
+        :param directory: directory for pickled documents; None: no disk cache
+        """
+        self.directory = directory
+        self._documents: dict[str, Document] = dict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'WSDLCache':
+        return cls(directory=os.getenv('WSDL_CACHE_DIR', DEFAULT_CACHE_DIR) or None)
+
+    @staticmethod
+    def key(location: str, settings: Settings) -> Optional[str]:
+        """
+        Cache key for a WSDL file. None for WSDLs which are not local files
+        """
+        if not os.path.isfile(location):
+            return None
+        location = os.path.realpath(location)
+        # the WSDL imports schema files from the same directory
+        files = ','.join(f'{entry.name}:{entry.stat().st_size}:{entry.stat().st_mtime_ns}'
+                         for entry in sorted(os.scandir(os.path.dirname(location)), key=lambda e: e.name)
+                         if entry.is_file())
+        key = (f'{location}:{files}:{zeep.__version__}:{sys.version_info[:2]}:'
+               f'{settings.strict}:{settings.xml_huge_tree}:{settings.forbid_dtd}:{settings.forbid_entities}:'
+               f'{settings.forbid_external}:{settings.xsd_ignore_sequence_order}')
+        # AXL WSDL are located in a directory named after the AXL version: schema/12.5/AXLAPI.wsdl
+        version = os.path.basename(os.path.dirname(location))
+        return f'{version}-{hashlib.sha256(key.encode()).hexdigest()[:16]}'
+
+    def document(self, location: str, transport: Transport, settings: Settings) -> Document:
+        """
+        Get the parsed WSDL document for a WSDL location
+        """
+        key = self.key(location, settings)
+        if key is None:
+            return Document(location, transport, settings=settings)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is None:
+                document = self._load(key, transport, settings)
+                if document is None:
+                    start = time.perf_counter()
+                    with gc_disabled():
+                        document = Document(location, transport, settings=settings)
+                    log.debug(f'parsed {location} in {time.perf_counter() - start:.3f}s')
+                    self._store(key, document)
+                self._documents[key] = document
+        return document
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pickle')
+
+    def _load(self, key: str, transport: Transport, settings: Settings) -> Optional[Document]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, mode='rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        start = time.perf_counter()
+        try:
+            with gc_disabled():
+                document = DocumentUnpickler(io.BytesIO(data), transport=transport, settings=settings).load()
+        except Exception as e:
+            log.warning(f'failed to load cached WSDL from {path}: {e}')
+            return None
+        log.debug(f'loaded cached WSDL from {path} in {time.perf_counter() - start:.3f}s')
+        return document
+
+    def _store(self, key: str, document: Document):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            buffer = io.BytesIO()
+            DocumentPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(document)
+            # write to temporary file and rename so that concurrent runs never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, mode='wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log.warning(f'failed to write WSDL cache {path}: {e}')
+            return
+        log.debug(f'wrote WSDL cache {path}')
+
+    def clear(self):
+        """
+        Clear the in-memory cache
+        """
+        with self._lock:
+            self._documents.clear()
+
+    @contextmanager
+    def patch(self):
+        """
+        Context manager: all zeep clients created in the context get their WSDL document from the cache
+        """
+        cache = self
+
+        class CachedDocument(Document):
+            # noinspection PyMissingConstructor
+            def __new__(cls, location, transport, *args, settings=None, **kwargs):
+                if isinstance(location, Document):
+                    return location
+                return cache.document(location, transport, settings or Settings())
+
+        # zeep.client.Client creates the document using the name 'Document' in zeep.client
+        with patch_lock:
+            zeep.client.Document = CachedDocument
+            try:
+                yield self
+            finally:
+                zeep.client.Document = Document
+
+
+patch_lock = threading.Lock()
+
+#: default cache
+wsdl_cache = WSDLCache.from_env()
+
+
+def axl_helper(*args, cache: WSDLCache = None, **kwargs) -> AXLHelper:
+    """
+    Create an AXLHelper using cached WSDL documents. All parameters are passed to AXLHelper
+
+    :param cache: WSDL cache to use; default: :data:`wsdl_cache`
+    """
+    with (cache or wsdl_cache).patch():
+        return AXLHelper(*args, **kwargs)